@@ -0,0 +1,224 @@
+"""
+Local account balances and positions, kept current from the exchange's user-data stream.
+
+AccountState loads one REST snapshot, then applies the stream's updates and the traders'
+own fills, and re-reads the snapshot every reconcile_interval seconds and after every
+reconnect. Sells read the quantity from here instead of a signed fetch_balance /
+get_position round-trip.
+
+Updates are ("set", key, qty, time_ms) for absolute values (Binance outboundAccountPosition,
+Alpaca position_qty) and ("adjust", key, delta, time_ms[, order_id]) for changes. An
+adjustment older than the last absolute value of its key is already included in it and is
+skipped; traders stamp their own fills with the time the order was sent, so a stream value
+from after that wins. Adjustments carrying an order id count once per key, whether the
+stream or the order ack reports them first.
+
+Keys are whatever the trader sizes orders by: assets for Binance ("BTC", "USDC"),
+symbols for Alpaca ("AAPL", "BTCUSD") plus "USD" for cash.
+"""
+import asyncio, json, random, time
+from datetime import datetime
+import websockets
+import logs, RequestScheduler
+
+log = logs.get(__name__)
+
+
+class AccountState:
+    def __init__(self, source, reconcile_interval=300.0, backoff_initial=1.0, backoff_max=60.0):
+        self.source = source
+        self.reconcile_interval = reconcile_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.balances = {}
+        self.stamps = {}  # key -> time_ms of the last absolute value
+        self.applied = set()  # (order id, key) pairs already counted
+        self.ready = False
+        self.loaded_at = None  # monotonic time of the last snapshot
+        self.tasks = []
+
+    def balance(self, key):
+        return self.balances.get(key, 0.0)
+
+    def apply(self, update):
+        kind, key, value, time_ms = update[:4]
+        if kind == "set":
+            self.balances[key] = value
+            self.stamps[key] = max(self.stamps.get(key, 0), time_ms or 0)
+        else:
+            self.adjust(key, value, time_ms, update[4] if len(update) > 4 else None)
+
+    def adjust(self, key, delta, time_ms=None, order_id=None):
+        if time_ms is not None and self.stamps.get(key, 0) >= time_ms:
+            return  # an absolute update at or after this change already includes it
+        if order_id is not None:
+            if (order_id, key) in self.applied:
+                return
+            self.applied.add((order_id, key))
+        self.balances[key] = self.balances.get(key, 0.0) + delta
+
+    def on_fill(self, base, quote, side, qty, price, time_ms=None, order_id=None, fee=0.0, fee_key=None):
+        """
+        Applies one of our own fills right away; the stream's absolute values supersede it.
+        time_ms: when the order was sent (an absolute value stamped later already includes the fill).
+        """
+        sign = 1 if side == "buy" else -1
+        self.adjust(base, sign * qty, time_ms, order_id)
+        if quote and price:
+            self.adjust(quote, -sign * qty * price, time_ms, order_id)
+        if fee and fee_key:
+            self.adjust(fee_key, -fee, time_ms, (order_id, "fee"))
+
+    async def load(self):
+        """Replaces the local state with a REST snapshot."""
+        snapshot = await self.source.snapshot()
+        now_ms = int(time.time() * 1000)
+        self.balances = dict(snapshot)
+        self.stamps = {key: now_ms for key in snapshot}
+        self.ready = True
+        self.loaded_at = time.monotonic()
+
+    async def start(self):
+        await self.load()
+        loop = asyncio.get_running_loop()
+        self.tasks = [loop.create_task(self._stream()), loop.create_task(self._reconcile())]
+        if self.source.keepalive_interval:
+            self.tasks.append(loop.create_task(self._keepalive()))
+        log.info("👛 Account state loaded: %d balance(s)", len(self.balances))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _stream(self):
+        attempt = 0
+        reconnecting = False
+        while True:
+            try:
+                url = await self.source.url()
+                async with websockets.connect(url) as ws:
+                    await self.source.handshake(ws)
+                    log.info("✅ Connected to the %s account stream", self.source.name)
+                    if reconnecting:
+                        await self.load()  # events sent while we were away are lost
+                    async for message in ws:
+                        attempt = 0
+                        for update in self.source.parse(json.loads(message)):
+                            self.apply(update)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("❌ %s account stream error: %r", self.source.name, e)
+            delay = min(self.backoff_max, self.backoff_initial * 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            reconnecting = True
+            await asyncio.sleep(delay)
+
+    async def _reconcile(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                before = dict(self.balances)
+                await self.load()
+                drift = {key: self.balances.get(key, 0.0) - value for key, value in before.items()
+                         if abs(self.balances.get(key, 0.0) - value) > 1e-12}
+                if drift:
+                    log.warning("⚠️ Account reconciliation corrected %s", drift, extra={"drift": drift})
+            except Exception as e:
+                log.warning("⚠️ Account reconciliation failed: %r", e)
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(self.source.keepalive_interval)
+            try:
+                await self.source.keepalive()
+            except Exception as e:
+                log.warning("⚠️ Account stream keepalive failed: %r", e)
+
+
+class BinanceAccountSource:
+    """Binance.US user-data stream (listenKey over REST, outboundAccountPosition events); keys are assets."""
+    name = "binance"
+    keepalive_interval = 30 * 60  # listen keys expire after 60 minutes without a keepalive
+
+    def __init__(self, exchange, api_key, rest_url="https://api.binance.us", ws_url="wss://stream.binance.us:9443"):
+        self.exchange = exchange  # ccxt client, for the balance snapshot
+        self.api_key = api_key
+        self.rest_url = rest_url
+        self.ws_url = ws_url
+        self.listen_key = None
+
+    async def snapshot(self):
+        balance = await self.exchange.fetch_balance()
+        return {asset: float(qty) for asset, qty in balance["free"].items() if qty}
+
+    async def url(self):
+        response = await RequestScheduler.shared().request_async("POST", f"{self.rest_url}/api/v3/userDataStream",
+                                                                 headers={"X-MBX-APIKEY": self.api_key}, timeout=10)
+        response.raise_for_status()
+        self.listen_key = response.json()["listenKey"]
+        return f"{self.ws_url}/ws/{self.listen_key}"
+
+    async def keepalive(self):
+        if self.listen_key:
+            response = await RequestScheduler.shared().request_async("PUT", f"{self.rest_url}/api/v3/userDataStream", params={"listenKey": self.listen_key},
+                                                                     headers={"X-MBX-APIKEY": self.api_key}, timeout=10)
+            response.raise_for_status()
+
+    async def handshake(self, ws):
+        pass
+
+    def parse(self, message):
+        if message.get("e") == "outboundAccountPosition":
+            return [("set", entry["a"], float(entry["f"]), message["u"]) for entry in message["B"]]
+        if message.get("e") == "balanceUpdate":  # deposits / withdrawals; an account position follows
+            return [("adjust", message["a"], float(message["d"]), message["T"])]
+        return []
+
+
+class AlpacaAccountSource:
+    """Alpaca trade_updates stream; keys are position symbols plus "USD" for cash."""
+    name = "alpaca"
+    keepalive_interval = None
+
+    def __init__(self, trader, ws_url=None):
+        self.trader = trader  # AlpacaTrader, for its REST client and executor
+        self.ws_url = ws_url or trader.base_url.replace("https://", "wss://") + "/stream"
+
+    async def snapshot(self):
+        account = await self.trader.call(self.trader.api.get_account)
+        positions = await self.trader.call(self.trader.api.list_positions)
+        balances = {position.symbol.replace("/", ""): float(position.qty) for position in positions}
+        balances["USD"] = float(account.cash)
+        return balances
+
+    async def url(self):
+        return self.ws_url
+
+    async def handshake(self, ws):
+        await ws.send(json.dumps({"action": "auth", "key": self.trader.api_key, "secret": self.trader.api_secret}))
+        log.info("Account stream auth: %s", await ws.recv())
+        await ws.send(json.dumps({"action": "listen", "data": {"streams": ["trade_updates"]}}))
+
+    def parse(self, message):
+        if message.get("stream") != "trade_updates":
+            return []
+        data = message["data"]
+        if data.get("event") not in ("fill", "partial_fill"):
+            return []
+        order = data["order"]
+        time_ms = self.timestamp_ms(data.get("timestamp"))
+        updates = [("set", order["symbol"].replace("/", ""), float(data["position_qty"]), time_ms)]
+        if data["event"] == "fill" and order.get("filled_avg_price"):  # cash once per order, for the whole fill
+            sign = 1 if order["side"] == "buy" else -1
+            updates.append(("adjust", "USD", -sign * float(order["filled_qty"]) * float(order["filled_avg_price"]), None, order["id"]))
+        return updates
+
+    @staticmethod
+    def timestamp_ms(t):
+        if not t:
+            return None
+        seconds, _, fraction = t.rstrip("Z").split("+")[0].partition(".")
+        return int(datetime.fromisoformat(seconds + "+00:00").timestamp()) * 1000 + int((fraction + "000")[:3])
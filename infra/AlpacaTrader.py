@@ -1,12 +1,23 @@
 import alpaca_trade_api as tradeapi
 import yaml
-import comms
+import comms, orders, logs
+import AccountState, MarketMetadata, RequestScheduler
+import asyncio, time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pytz
 
+log = logs.get(__name__)
+
 class AlpacaTrader:
-    def __init__(self, config_path="infra/config.yaml"):
-        """Initialize Alpaca API with credentials from a config file."""
+    def __init__(self, config_path="infra/config.yaml", quotes=None):
+        """
+        Initialize Alpaca API with credentials from a config file.
+        quotes: optional QuoteCache fed by the trade stream; buys only call get_latest_trade when it is stale.
+        Orders are quantized to the asset's increments from MarketMetadata and rejected locally when they break one.
+        Positions come from an AccountState fed by the trade_updates stream once start() has loaded it;
+        trading_config.account_reconcile (seconds, 0 = off) sets how often it re-reads the REST snapshot.
+        """
         with open(config_path, "r") as file:
             config = yaml.safe_load(file)
 
@@ -14,74 +25,182 @@ class AlpacaTrader:
         self.api_secret = config["alpaca"]["secret"]
         self.base_url = "https://paper-api.alpaca.markets"  # Paper trading endpoint
 
-        # Initialize Alpaca API
+        # Initialize Alpaca API (its requests.Session keeps connections alive between calls)
         self.api = tradeapi.REST(self.api_key, self.api_secret, self.base_url, api_version="v2")
 
-    def get_cash_balance(self):
+        # The Alpaca client is blocking, so every call runs on this executor instead of the event loop
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="alpaca")
+        self.quotes = quotes
+
+        reconcile = config.get("trading_config", {}).get("account_reconcile", 300)
+        self.account = AccountState.AccountState(AccountState.AlpacaAccountSource(self), reconcile) if reconcile else None
+        self.markets = MarketMetadata.MarketMetadata(MarketMetadata.AlpacaMarketSource(self))
+
+    def call(self, fn, *args, **kwargs):
+        """Runs a blocking Alpaca API call on the trader's executor and returns an awaitable."""
+        return asyncio.get_running_loop().run_in_executor(self.executor, lambda: self.limited(fn, *args, **kwargs))
+
+    def limited(self, fn, *args, **kwargs):
+        """Waits for the shared Alpaca request limit in the order lane, then calls."""
+        RequestScheduler.shared().acquire("alpaca", 1, RequestScheduler.ORDERS)
+        return fn(*args, **kwargs)
+
+    async def start(self):
+        """Loads the asset rules and the account snapshot and starts the trade_updates stream; without it positions come from REST."""
+        try:
+            await self.markets.load()
+        except Exception as e:
+            log.warning("⚠️ Asset rules unavailable, orders are only rounded: %r", e)
+        if self.account:
+            try:
+                await self.account.start()
+            except Exception as e:
+                log.warning("⚠️ Account stream unavailable, sizing sells from REST: %r", e)
+
+    async def close(self):
+        if self.account:
+            await self.account.stop()
+        self.executor.shutdown(wait=False)
+
+    async def get_cash_balance(self):
         """Fetch account balance in USD."""
-        account = self.api.get_account()
-        cash_balance = float(account.cash)
-        print(f"Available USD balance: {cash_balance}")
+        if self.account and self.account.ready:
+            cash_balance = self.account.balance("USD")
+        else:
+            account = await self.call(self.api.get_account)
+            cash_balance = float(account.cash)
+        log.info("Available USD balance: %s", cash_balance)
         return cash_balance
 
-    def place_buy_order(self, symbol, cash_qty, order_type="market", time_in_force="gtc"):
-        """Places a market buy order for the given symbol using a dollar amount."""
+    async def place_buy_order(self, symbol, cash_qty, order_type="market", time_in_force="gtc"):
+        """Places a market buy order for the given symbol using a dollar amount. Returns an OrderAck."""
+        started = time.perf_counter()
+        timings = {}
+
         try:
-            # Get the latest market price
-            barset = self.api.get_latest_trade(symbol)
-            current_price = float(barset.price)
+            # Get the latest market price, from the stream when it is fresh
+            current_price = self.quotes.price(symbol, "buy") if self.quotes else None
+            if current_price is None:
+                barset = await self.call(self.api.get_latest_trade, symbol)
+                current_price = float(barset.price)
+            timings["quote_ms"] = orders.elapsed_ms(started)
 
-            qty = round(cash_qty / current_price, 6)  # Adjust precision for stock/crypto
+            qty, reason = await self.quantize(symbol, cash_qty / current_price, current_price, "buy")
+            if reason:
+                return self.reject(symbol, "buy", reason, timings, started)
 
-            order = self.api.submit_order(
+            submitted = time.perf_counter()
+            sent_ms = int(time.time() * 1000)
+            order = await self.call(self.api.submit_order,
                 symbol=symbol,
                 qty=qty,
                 side="buy",
                 type=order_type,
                 time_in_force=time_in_force
             )
+            timings["submit_ms"] = orders.elapsed_ms(submitted)
+            timings["total_ms"] = orders.elapsed_ms(started)
+            self.record_fill(symbol, "buy", order, qty, current_price, sent_ms)
 
             timestamp_str = datetime.now(pytz.timezone('America/Los_Angeles')).strftime('%Y-%m-%d %I:%M:%S %p PDT')
-            print(f"✅ Buy order placed successfully at ~{current_price} for {qty} {symbol} @ {timestamp_str}")
+            log.info("✅ Buy order placed successfully at ~%s for %s %s @ %s", current_price, qty, symbol, timestamp_str, extra={"symbol": symbol, "order_id": order.id})
             comms.buy_order_success(symbol, qty, current_price, timestamp_str)
+            return orders.ack(symbol, "buy", True, order.id, qty, current_price, timestamp_str, timings=timings)
 
         except Exception as e:
             reason = f"Error placing buy order: {e}"
-            print(reason)
+            log.error(reason)
             comms.buy_order_fail(symbol, reason)
+            timings["total_ms"] = orders.elapsed_ms(started)
+            return orders.ack(symbol, "buy", False, error=reason, timings=timings)
+
+    async def place_sell_order(self, symbol):
+        """Places a market sell order for the full position of the given symbol. Returns an OrderAck."""
+        started = time.perf_counter()
+        timings = {}
 
-    def place_sell_order(self, symbol):
-        """Places a market sell order for the full position of the given symbol."""
         try:
-            position = self.api.get_position(symbol)
-            qty = float(position.qty)
+            if self.account and self.account.ready:  # streamed state; no pre-trade REST call
+                qty = self.account.balance(symbol.replace("/", ""))
+                current_price = self.quotes.price(symbol, "sell") if self.quotes else None
+            else:
+                position = await self.call(self.api.get_position, symbol)
+                qty = float(position.qty)
+                current_price = float(position.current_price)
+            timings["position_ms"] = orders.elapsed_ms(started)
 
             if qty > 0:
-                order = self.api.submit_order(
+                qty, reason = await self.quantize(symbol, qty, current_price, "sell")
+                if reason:
+                    return self.reject(symbol, "sell", reason, timings, started, flat=await self.dust(symbol, qty, current_price))
+
+                submitted = time.perf_counter()
+                sent_ms = int(time.time() * 1000)
+                order = await self.call(self.api.submit_order,
                     symbol=symbol,
                     qty=qty,
                     side="sell",
                     type="market",
                     time_in_force="gtc"
                 )
+                timings["submit_ms"] = orders.elapsed_ms(submitted)
+                timings["total_ms"] = orders.elapsed_ms(started)
+                self.record_fill(symbol, "sell", order, qty, current_price, sent_ms)
 
-                current_price = float(position.current_price)
                 timestamp_str = datetime.now(pytz.timezone('America/Los_Angeles')).strftime('%Y-%m-%d %I:%M:%S %p PDT')
-                print(f"✅ Sell order placed successfully at ~{current_price} for {qty} {symbol} @ {timestamp_str}")
+                log.info("✅ Sell order placed successfully at ~%s for %s %s @ %s", current_price, qty, symbol, timestamp_str, extra={"symbol": symbol, "order_id": order.id})
                 comms.sell_order_success(symbol, qty, current_price, timestamp_str)
+                return orders.ack(symbol, "sell", True, order.id, qty, current_price, timestamp_str, timings=timings)
             else:
                 reason = f"No {symbol} position found. Holding 0 {symbol}."
-                print(reason)
+                log.warning(reason)
                 comms.sell_order_fail(symbol, reason)
+                flat = True
 
         except Exception as e:
-            if "position does not exist" in str(e):
+            flat = "position does not exist" in str(e)
+            if flat:
                 reason = f"No {symbol} position found. Holding 0 {symbol}."
             else:
                 reason = f"Error placing sell order: {e}"
-            print(reason)
+            log.error(reason)
             comms.sell_order_fail(symbol, reason)
 
+        timings["total_ms"] = orders.elapsed_ms(started)
+        return orders.ack(symbol, "sell", False, error=reason, timings=timings, flat=flat)
+
+    async def quantize(self, symbol, qty, price, side):
+        """Returns the exact quantity for the asset's increments and the reason the order would be rejected, if it would."""
+        try:
+            market = await self.markets.market(symbol)
+        except Exception as e:
+            log.warning("⚠️ No asset rules for %s: %r", symbol, e)
+            market = None
+        if market is None:
+            return round(qty, 6), None
+        qty, _, reason = market.order(qty, price, side)
+        return float(qty), reason
+
+    async def dust(self, symbol, qty, price):
+        """True when the position is below the asset's minimums: it can never be sold, so the position is over."""
+        market = await self.markets.market(symbol)
+        return market is not None and market.dust(qty, price)
+
+    def reject(self, symbol, side, reason, timings, started, flat=False):
+        """An order that breaks an asset rule; it never reaches Alpaca."""
+        reason = f"{side.capitalize()} order rejected locally: {reason}"
+        log.warning(reason, extra={"symbol": symbol})
+        timings["total_ms"] = orders.elapsed_ms(started)
+        return orders.ack(symbol, side, False, error=reason, timings=timings, flat=flat)
+
+    def record_fill(self, symbol, side, order, qty, price, sent_ms):
+        """Applies our order to the account state until trade_updates reports the actual fill."""
+        if self.account:
+            self.account.on_fill(symbol.replace("/", ""), "USD", side, qty, price, sent_ms, order.id)
+
 if __name__ == "__main__":
-    trader = AlpacaTrader()
-    trader.place_sell_order('BTCUSDC')
\ No newline at end of file
+    async def main():
+        trader = AlpacaTrader()
+        await trader.place_sell_order('BTCUSDC')
+        await trader.close()
+    asyncio.run(main())
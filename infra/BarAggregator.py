@@ -0,0 +1,220 @@
+"""
+Builds OHLCV bars from raw trade ticks in constant memory.
+
+An interval string picks the bar type:
+    "1s", "5s", "15s", "1m", "1h"   time bars (bar timestamp = bucket start)
+    "100v"                          volume bars: close when cumulative volume crosses a multiple of 100
+    "500t"                          tick bars: close every 500 trades
+
+add() handles one tick with a few float updates and no allocation until a bar closes;
+add_arrays() runs the same rules as NumPy passes for batches (replays, bulk loads).
+Only the open bar is kept, whatever the stream length.
+"""
+import numpy as np
+import BarStore
+
+UNITS = {"s": ("time", 1000), "m": ("time", 60_000), "h": ("time", 3_600_000), "v": ("volume", 1), "t": ("tick", 1)}
+
+def parse_interval(interval):
+    """'5s' -> ("time", 5000); '100v' -> ("volume", 100.0); '500t' -> ("tick", 500)."""
+    kind, scale = UNITS[interval[-1]]
+    amount = float(interval[:-1]) if kind == "volume" else int(interval[:-1]) * scale
+    if amount <= 0:
+        raise ValueError(f"Bar size must be positive: {interval!r}")
+    return kind, amount
+
+def interval_ms(interval):
+    """Length of a time-bar interval in ms, or None for volume / tick bars."""
+    kind, size = parse_interval(interval)
+    return size if kind == "time" else None
+
+
+class BarAggregator:
+    def __init__(self, symbol, interval="1m"):
+        self.symbol = symbol
+        self.interval = interval
+        self.kind, self.size = parse_interval(interval)
+
+        # open bar
+        self.count = 0
+        self.start = 0  # bucket start (time bars) or first tick time
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = 0.0
+
+        self.level = 0.0  # volume bars: floor(total volume / size) at the last close
+        self.total = 0.0  # volume bars: cumulative volume over the whole stream
+        self.last_emitted = None
+
+    def add(self, timestamp, price, volume):
+        """Adds one trade (epoch ms). Returns the bar it closed, or None."""
+        closed = None
+        if self.kind == "time":
+            bucket = timestamp - timestamp % self.size
+            if self.count and bucket != self.start:
+                closed = self._close()
+            if not self.count:
+                self._begin(bucket, price, volume)
+            else:
+                self._update(price, volume)
+            return closed
+
+        if not self.count:
+            self._begin(timestamp, price, volume)
+        else:
+            self._update(price, volume)
+        if self.kind == "tick":
+            if self.count >= self.size:
+                closed = self._close()
+        else:
+            self.total += volume
+            level = self.total // self.size
+            if level > self.level:
+                self.level = level
+                closed = self._close()
+        return closed
+
+    def add_trades(self, trades):
+        """Adds an iterable of BarStore.Trade (or (symbol, timestamp, price, volume)). Returns the closed bars."""
+        closed = []
+        for _, timestamp, price, volume in trades:
+            bar = self.add(timestamp, price, volume)
+            if bar:
+                closed.append(bar)
+        return closed
+
+    def current(self):
+        """The open bar so far (like an unfinished kline), or None."""
+        if not self.count:
+            return None
+        return BarStore.Bar(self.symbol, self._timestamp(), self.open, self.high, self.low, self.close, self.volume)
+
+    def flush(self, now_ms=None):
+        """
+        Closes the open bar. With now_ms, a time bar is only closed once its interval has
+        ended, so a quiet market does not hold a finished bar back until the next trade.
+        """
+        if not self.count:
+            return None
+        if now_ms is not None and (self.kind != "time" or now_ms < self.start + self.size):
+            return None
+        return self._close()
+
+    def add_arrays(self, timestamps, prices, volumes):
+        """
+        Vectorized add() over a batch of ticks in time order; same bars, same carried state.
+        Returns the closed bars as a dict of arrays (timestamp, open, high, low, close, volume).
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        n = timestamps.size
+        if not n:
+            return self._empty()
+
+        # ends[i]: tick i is the last tick of its bar
+        if self.kind == "time":
+            buckets = timestamps - timestamps % self.size
+            ends = np.r_[buckets[1:] != buckets[:-1], False]
+            joins_open = bool(self.count) and buckets[0] == self.start
+            if self.count and not joins_open:
+                first_closed = self._close()  # the open bar ended before this batch
+            else:
+                first_closed = None
+        else:
+            first_closed = None
+            joins_open = bool(self.count)
+            if self.kind == "tick":
+                # the open bar closes after size - count more ticks, then every `size` ticks
+                ends = np.zeros(n, dtype=bool)
+                ends[self.size - self.count - 1::self.size] = True
+            else:
+                cumulative = np.cumsum(np.r_[self.total, volumes])
+                levels = cumulative // self.size
+                ends = levels[1:] > levels[:-1]
+
+        bar_ids = np.r_[0, np.cumsum(ends[:-1])]
+        starts = np.flatnonzero(np.r_[True, bar_ids[1:] != bar_ids[:-1]])
+        stops = np.r_[starts[1:], n]
+
+        opens = prices[starts].copy()
+        highs = np.maximum.reduceat(prices, starts)
+        lows = np.minimum.reduceat(prices, starts)
+        closes = prices[stops - 1]
+        bar_volumes = np.add.reduceat(volumes, starts)
+        bar_times = buckets[starts] if self.kind == "time" else timestamps[starts].copy()
+        counts = stops - starts
+        if joins_open:  # the first group continues the open bar
+            opens[0] = self.open
+            highs[0] = max(highs[0], self.high)
+            lows[0] = min(lows[0], self.low)
+            bar_volumes[0] += self.volume
+            bar_times[0] = self.start
+            counts[0] += self.count
+
+        closed_groups = len(starts) if ends[-1] else len(starts) - 1
+        if self.kind == "volume":
+            self.total = cumulative[-1]
+            self.level = levels[-1]
+        result = {
+            "timestamp": bar_times[:closed_groups], "open": opens[:closed_groups], "high": highs[:closed_groups],
+            "low": lows[:closed_groups], "close": closes[:closed_groups], "volume": bar_volumes[:closed_groups],
+        }
+        if self.kind != "time" and closed_groups:
+            result["timestamp"] = self._monotonic(result["timestamp"])
+        elif closed_groups:
+            self.last_emitted = int(result["timestamp"][-1])
+
+        # carry the unfinished last group as the open bar
+        if closed_groups < len(starts):
+            self.count = int(counts[-1])
+            self.start = int(bar_times[-1])
+            self.open, self.high, self.low = float(opens[-1]), float(highs[-1]), float(lows[-1])
+            self.close, self.volume = float(closes[-1]), float(bar_volumes[-1])
+        else:
+            self.count = 0
+
+        if first_closed:
+            result = {name: np.r_[getattr(first_closed, name), values] for name, values in result.items()}
+        return result
+
+    # internals
+
+    def _begin(self, start, price, volume):
+        self.count = 1
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.volume = volume
+
+    def _update(self, price, volume):
+        self.count += 1
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += volume
+
+    def _timestamp(self):
+        # volume / tick bars are stamped with their first trade; several can start in the same
+        # millisecond during a burst, so keep bar timestamps strictly increasing
+        if self.kind != "time" and self.last_emitted is not None and self.start <= self.last_emitted:
+            return self.last_emitted + 1
+        return self.start
+
+    def _close(self):
+        bar = BarStore.Bar(self.symbol, self._timestamp(), self.open, self.high, self.low, self.close, self.volume)
+        self.last_emitted = bar.timestamp
+        self.count = 0
+        return bar
+
+    def _monotonic(self, timestamps):
+        floor = -1 if self.last_emitted is None else self.last_emitted
+        # running max of (t_i - i) keeps each stamp > the previous one, like _timestamp() does one by one
+        index = np.arange(timestamps.size)
+        adjusted = np.maximum.accumulate(np.maximum(timestamps - index, floor + 1)) + index
+        self.last_emitted = int(adjusted[-1])
+        return adjusted
+
+    def _empty(self):
+        return {name: np.array([], dtype=np.int64 if name == "timestamp" else np.float64)
+                for name in ("timestamp", "open", "high", "low", "close", "volume")}
@@ -0,0 +1,188 @@
+"""
+Columnar on-disk bar archive read through np.memmap.
+
+Layout (one directory per symbol, one per UTC day, one .npy file per column):
+
+    bar_archive/<symbol>/index.json            day -> rows, first/last timestamp, column dtypes
+    bar_archive/<symbol>/<YYYY-MM-DD>/timestamp.npy   int64 epoch ms (bar open time)
+    bar_archive/<symbol>/<YYYY-MM-DD>/close.npy       float64 or float32, likewise open/high/low/volume
+
+Readers open the column files with mmap_mode="r", so a slice within a day is a zero-copy
+view and nothing is parsed. Converters import the mr_model/hist_data CSVs and the
+data_collection trades tables through the backtest loaders.
+
+Run from the repo root:
+    python infra/BarArchive.py import "mr_model/hist_data/AAPL - 730 Day.csv" data_collection/btc_trades.db
+    python infra/BarArchive.py info
+"""
+import argparse, datetime, json, os
+import numpy as np
+import backtest
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+DAY_MS = 86_400_000
+
+def day_name(ms):
+    return datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+def symbol_from_path(path):
+    """'mr_model/hist_data/AAPL - 730 Day.csv' -> 'AAPL', 'data_collection/btc_trades.db' -> 'btc_trades'."""
+    return os.path.splitext(os.path.basename(path))[0].split(" - ")[0]
+
+
+class BarArchive:
+    def __init__(self, root="bar_archive", dtype=np.float64):
+        """
+        :param dtype: storage type for the price/volume columns written by this instance
+                      (np.float32 halves the size). Timestamps are always int64.
+        """
+        self.root = root
+        self.dtype = np.dtype(dtype)
+        self.indexes = {}
+
+    # index
+
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(self._index_path(name)))
+
+    def index(self, symbol):
+        """{"days": {day: {"rows", "first", "last"}}, "dtypes": {column: dtype}} for a symbol."""
+        if symbol not in self.indexes:
+            path = self._index_path(symbol)
+            if os.path.exists(path):
+                with open(path, "r") as file:
+                    self.indexes[symbol] = json.load(file)
+            else:
+                self.indexes[symbol] = {"days": {}, "dtypes": {}}
+        return self.indexes[symbol]
+
+    def days(self, symbol):
+        return sorted(self.index(symbol)["days"])
+
+    def span(self, symbol):
+        """(first, last) bar timestamps in the archive, or None."""
+        days = self.index(symbol)["days"]
+        if not days:
+            return None
+        return days[min(days)]["first"], days[max(days)]["last"]
+
+    # read
+
+    def day(self, symbol, day):
+        """Column memmaps for one day (zero-copy, read-only)."""
+        folder = os.path.join(self.root, symbol, day)
+        return {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+
+    def read(self, symbol, start=None, end=None):
+        """
+        Bars with start <= timestamp < end (epoch ms; None = open-ended).
+        A range inside one day returns memmap views; longer ranges are concatenated.
+        """
+        days = self.index(symbol)["days"]
+        parts = []
+        for day in sorted(days):
+            entry = days[day]
+            if (start is not None and entry["last"] < start) or (end is not None and entry["first"] >= end):
+                continue
+            columns = self.day(symbol, day)
+            timestamps = columns["timestamp"]
+            lo = np.searchsorted(timestamps, start) if start is not None else 0
+            hi = np.searchsorted(timestamps, end) if end is not None else len(timestamps)
+            parts.append({name: values[lo:hi] for name, values in columns.items()})
+
+        if not parts:
+            dtypes = self.index(symbol)["dtypes"]
+            return {name: np.array([], dtype=dtypes.get(name, np.int64 if name == "timestamp" else self.dtype)) for name in COLUMNS}
+        if len(parts) == 1:
+            return parts[0]
+        return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+    # write
+
+    def write(self, symbol, bars):
+        """
+        Adds bars (dict of arrays with COLUMNS, any time order) to the archive, merging with
+        days already stored. Where a timestamp exists twice, within the batch or against the
+        archive, the newer bar (later in the batch) wins. Returns the number of bars written.
+        """
+        timestamps = np.asarray(bars["timestamp"], dtype=np.int64)
+        if not len(timestamps):
+            return 0
+        order = np.argsort(timestamps, kind="stable")
+        bars = self._keep_last({name: np.asarray(bars[name])[order] for name in COLUMNS})
+        day_keys = bars["timestamp"] // DAY_MS
+        bounds = np.flatnonzero(np.r_[True, day_keys[1:] != day_keys[:-1], True])
+
+        index = self.index(symbol)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            day = day_name(int(day_keys[lo]) * DAY_MS)
+            chunk = {name: values[lo:hi] for name, values in bars.items()}
+            if day in index["days"]:
+                chunk = self._merge({name: np.array(values) for name, values in self.day(symbol, day).items()}, chunk)
+            self._write_day(symbol, day, chunk)
+            index["days"][day] = {"rows": len(chunk["timestamp"]),
+                                  "first": int(chunk["timestamp"][0]), "last": int(chunk["timestamp"][-1])}
+        index["dtypes"] = {name: ("int64" if name == "timestamp" else self.dtype.name) for name in COLUMNS}
+        self._save_index(symbol)
+        return len(bars["timestamp"])
+
+    def import_file(self, path, symbol=None, asset=None):
+        """Converts an OHLCV CSV or a trades table (.db) into the archive. Returns (symbol, rows)."""
+        symbol = symbol or (asset.replace("/", "") if asset else symbol_from_path(path))
+        return symbol, self.write(symbol, backtest.load(path, asset))
+
+    @staticmethod
+    def _merge(old, new):
+        merged = {name: np.concatenate([old[name], new[name]]) for name in COLUMNS}
+        order = np.argsort(merged["timestamp"], kind="stable")
+        return BarArchive._keep_last({name: values[order] for name, values in merged.items()})
+
+    @staticmethod
+    def _keep_last(bars):
+        """Drops all but the last bar of each run of equal timestamps (bars sorted stably by time)."""
+        keep = np.r_[bars["timestamp"][1:] != bars["timestamp"][:-1], True]
+        return {name: values[keep] for name, values in bars.items()}
+
+    def _write_day(self, symbol, day, chunk):
+        folder = os.path.join(self.root, symbol, day)
+        os.makedirs(folder, exist_ok=True)
+        for name in COLUMNS:
+            path = os.path.join(folder, f"{name}.npy")
+            dtype = np.int64 if name == "timestamp" else self.dtype
+            with open(path + ".tmp", "wb") as file:
+                np.save(file, np.ascontiguousarray(chunk[name], dtype=dtype))
+            os.replace(path + ".tmp", path)
+
+    def _index_path(self, symbol):
+        return os.path.join(self.root, symbol, "index.json")
+
+    def _save_index(self, symbol):
+        path = self._index_path(symbol)
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.indexes[symbol], file, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory-mapped columnar bar archive.")
+    parser.add_argument("command", choices=["import", "info"])
+    parser.add_argument("paths", nargs="*", help="OHLCV .csv or trades .db files to import")
+    parser.add_argument("--root", default="bar_archive")
+    parser.add_argument("--symbol", default=None, help="archive symbol (default: from the file name)")
+    parser.add_argument("--asset", default=None, help="only this asset from a trades table")
+    parser.add_argument("--float32", action="store_true", help="store price/volume columns as float32")
+    args = parser.parse_args()
+
+    archive = BarArchive(args.root, np.float32 if args.float32 else np.float64)
+    if args.command == "import":
+        for path in args.paths:
+            symbol, rows = archive.import_file(path, args.symbol, args.asset)
+            print(f"✅ {path} -> {args.root}/{symbol} ({rows} bars)")
+    for symbol in archive.symbols():
+        first, last = archive.span(symbol)
+        rows = sum(entry["rows"] for entry in archive.index(symbol)["days"].values())
+        print(f"{symbol}: {rows} bars over {len(archive.days(symbol))} days, "
+              f"{datetime.datetime.fromtimestamp(first / 1000, datetime.timezone.utc)} -> "
+              f"{datetime.datetime.fromtimestamp(last / 1000, datetime.timezone.utc)}")
@@ -0,0 +1,124 @@
+import collections
+import numpy as np
+
+# One OHLCV bar as passed between the primer, websocket clients and the bot.
+# timestamp is the bar open time in epoch milliseconds.
+Bar = collections.namedtuple("Bar", ["symbol", "timestamp", "open", "high", "low", "close", "volume"])
+
+# One trade print from a tick feed (Binance @trade, Alpaca trades, Kraken trade), timestamp in epoch ms.
+# BarAggregator turns these into Bars.
+Trade = collections.namedtuple("Trade", ["symbol", "timestamp", "price", "volume"])
+
+# Best bid / ask (Binance @bookTicker). timestamp is the local receive time in epoch ms;
+# the exchange does not stamp these. QuoteCache keeps the latest one per symbol.
+Book = collections.namedtuple("Book", ["symbol", "timestamp", "bid", "bid_qty", "ask", "ask_qty"])
+
+COLUMNS = ("open", "high", "low", "close", "volume", "buy_line", "sell_line")
+
+class BarStore:
+    """
+    Fixed-capacity ring buffer of bars stored column by column.
+
+    Every column is preallocated at twice the capacity and each bar is written to both
+    halves, so the most recent N values of any column are always one contiguous slice.
+    That lets closes(n) hand out a zero-copy NumPy view instead of rebuilding a list.
+    """
+
+    def __init__(self, symbol="", capacity=256):
+        self.symbol = symbol
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self.columns = {name: np.full(2 * capacity, np.nan) for name in COLUMNS}
+        self.start = 0  # slot of the oldest bar
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def full(self):
+        return self.size == self.capacity
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamps[self.start + self.size - 1]) if self.size else None
+
+    # writes
+
+    def append(self, bar):
+        """Adds a bar at the end, dropping the oldest one if the buffer is full."""
+        if self.full:
+            self.popleft()
+        self._write((self.start + self.size) % self.capacity, bar)
+        self.size += 1
+
+    def replace_last(self, bar):
+        """Overwrites the last bar in place (kline update within the same interval)."""
+        self._write((self.start + self.size - 1) % self.capacity, bar)
+
+    def push(self, bar):
+        """Replaces the last bar if it has the same timestamp, otherwise appends. Returns True if replaced."""
+        if self.size and self.last_timestamp == bar.timestamp:
+            self.replace_last(bar)
+            return True
+        self.append(bar)
+        return False
+
+    def popleft(self):
+        """Drops the oldest bar."""
+        self.start = (self.start + 1) % self.capacity
+        self.size -= 1
+
+    def evict_before(self, cutoff_ms):
+        """Drops every bar older than cutoff_ms and returns how many were dropped."""
+        count = int(np.searchsorted(self.timestamps[self.start:self.start + self.size], cutoff_ms, side="left"))
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+        return count
+
+    def set_last(self, name, value):
+        """Writes a derived value (e.g. buy_line) onto the last bar."""
+        slot = (self.start + self.size - 1) % self.capacity
+        column = self.columns[name]
+        column[slot] = value
+        column[slot + self.capacity] = value
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    # reads
+
+    def view(self, name, n=None):
+        """Zero-copy view of the most recent n values of a column (all bars if n is None)."""
+        n = self.size if n is None else min(n, self.size)
+        end = self.start + self.size
+        column = self.timestamps if name == "timestamp" else self.columns[name]
+        return column[end - n:end]
+
+    def closes(self, n=None):
+        return self.view("close", n)
+
+    def last(self, name):
+        return self.columns[name][self.start + self.size - 1]
+
+    def bar(self, i=-1):
+        """Returns bar i (negative counts from the newest) as a Bar."""
+        if i < 0:
+            i += self.size
+        slot = self.start + i
+        cols = self.columns
+        return Bar(self.symbol, int(self.timestamps[slot]), float(cols["open"][slot]), float(cols["high"][slot]),
+                   float(cols["low"][slot]), float(cols["close"][slot]), float(cols["volume"][slot]))
+
+    def _write(self, slot, bar):
+        mirror = slot + self.capacity
+        self.timestamps[slot] = self.timestamps[mirror] = bar.timestamp
+        cols = self.columns
+        cols["open"][slot] = cols["open"][mirror] = bar.open
+        cols["high"][slot] = cols["high"][mirror] = bar.high
+        cols["low"][slot] = cols["low"][mirror] = bar.low
+        cols["close"][slot] = cols["close"][mirror] = bar.close
+        cols["volume"][slot] = cols["volume"][mirror] = bar.volume
+        cols["buy_line"][slot] = cols["buy_line"][mirror] = np.nan
+        cols["sell_line"][slot] = cols["sell_line"][mirror] = np.nan
@@ -1,7 +1,12 @@
-import requests
 import datetime
+import BarStore, logs, RequestScheduler
+
+log = logs.get(__name__)
 
 class BinanceUSPrimer:
+    MAX_LIMIT = 1000  # klines per request
+    WEIGHT = 2  # request weight of a klines call
+
     def __init__(self, trading_bot=None, symbol="BTCUSDC", interval="1m", limit=60):
         self.trading_bot = trading_bot
         self.symbol = symbol.upper()
@@ -9,37 +14,43 @@ class BinanceUSPrimer:
         self.limit = limit
         self.url = "https://api.binance.us/api/v3/klines"
 
-    def fetch_and_send(self):
-        params = {
-            "symbol": self.symbol,
-            "interval": self.interval,
-            "limit": self.limit
-        }
+    def fetch(self, start_time=None):
+        """
+        Fetches klines as BarStore.Bar records: the last `limit` bars, or every bar from
+        start_time (epoch ms, inclusive) up to now when filling the gap after a restart.
+        """
+        if start_time is None:
+            log.info("📥 Fetching %d %s candles for %s from Binance.US", self.limit, self.interval, self.symbol)
+        else:
+            log.info("📥 Fetching %s %s candles since %s from Binance.US", self.symbol, self.interval, datetime.datetime.fromtimestamp(start_time / 1000))
+        params = {"symbol": self.symbol, "interval": self.interval, "limit": self.limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+            params["limit"] = self.MAX_LIMIT
 
-        print(f"📥 Fetching {self.limit} {self.interval} candles for {self.symbol} from Binance.US")
-        response = requests.get(self.url, params=params)
+        bars = []
+        while True:
+            response = RequestScheduler.shared().request("GET", self.url, self.WEIGHT, RequestScheduler.DATA, params=params)
+            if response.status_code != 200:
+                log.error("❌ Failed to fetch data: %s - %s", response.status_code, response.text)
+                break
 
-        if response.status_code == 200:
             candles = response.json()
-            for candle in candles:
-                timestamp = datetime.datetime.fromtimestamp(candle[0] / 1000)
-                kline_data = {
-                    "symbol": self.symbol,
-                    "timestamp": timestamp,
-                    "open": float(candle[1]),
-                    "high": float(candle[2]),
-                    "low": float(candle[3]),
-                    "close": float(candle[4]),
-                    "volume": float(candle[5]),
-                }
-
-                if self.trading_bot:
-                    self.trading_bot.data_prime(kline_data)
-                else:
-                    print(f"[{kline_data['timestamp']}] O: {kline_data['open']} H: {kline_data['high']} L: {kline_data['low']} C: {kline_data['close']} V: {kline_data['volume']}")
+            bars.extend(BarStore.Bar(self.symbol, int(candle[0]), float(candle[1]), float(candle[2]),
+                                     float(candle[3]), float(candle[4]), float(candle[5])) for candle in candles)
+            if start_time is None or len(candles) < self.MAX_LIMIT:
+                break
+            params["startTime"] = int(candles[-1][0]) + 1
+        return bars
+
+    def fetch_and_send(self, start_time=None):
+        bars = self.fetch(start_time)
 
+        if self.trading_bot:
+            self.trading_bot.data_prime(bars)  # one batch; indicators are computed once at the end
         else:
-            print(f"❌ Failed to fetch data: {response.status_code} - {response.text}")
+            for bar in bars:
+                print(f"[{datetime.datetime.fromtimestamp(bar.timestamp / 1000)}] O: {bar.open} H: {bar.high} L: {bar.low} C: {bar.close} V: {bar.volume}")
 
-    def start(self):
-        self.fetch_and_send()
+    def start(self, start_time=None):
+        self.fetch_and_send(start_time)
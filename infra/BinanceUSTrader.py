@@ -1,81 +1,196 @@
-import ccxt
-import yaml, pytz
-import comms
+import ccxt.async_support as ccxt
+import yaml, pytz, time
+import comms, orders, logs
+import AccountState, MarketMetadata, RequestScheduler
 from datetime import datetime, timezone
 
+log = logs.get(__name__)
+
 class BinanceUSTrader:
-    def __init__(self, config_path="infra/config.yaml"):
-        """Initialize Binance.US API with credentials from a config file."""
+    def __init__(self, config_path="infra/config.yaml", quotes=None):
+        """
+        Initialize Binance.US API with credentials from a config file.
+        quotes: optional QuoteCache; buys are sized from it and fetch a ticker only when it is stale.
+        Orders are quantized to the lot / tick filters from MarketMetadata and rejected locally when they break one.
+        Balances come from an AccountState fed by the user-data stream once start() has loaded it;
+        trading_config.account_reconcile (seconds, 0 = off) sets how often it re-reads the REST snapshot.
+        """
         with open(config_path, "r") as file:
             config = yaml.safe_load(file)
 
         self.api_key = config["binance_us"]["key"]
         self.api_secret = config["binance_us"]["secret"]
 
-        # Initialize Binance.US API
+        # Initialize the async Binance.US client; it keeps one HTTP session open for all calls.
+        # Its rate limiter is replaced by the process-wide one, in the order lane.
         self.exchange = ccxt.binanceus({
             "apiKey": self.api_key,
             "secret": self.api_secret,
             "enableRateLimit": True
         })
+        RequestScheduler.shared().throttle(self.exchange, "binance")
+        self.quotes = quotes
+
+        reconcile = config.get("trading_config", {}).get("account_reconcile", 300)
+        self.account = AccountState.AccountState(AccountState.BinanceAccountSource(self.exchange, self.api_key), reconcile) if reconcile else None
+        self.markets = MarketMetadata.MarketMetadata(MarketMetadata.BinanceMarketSource(self.exchange))
+
+    async def start(self):
+        """Loads the market rules and the account snapshot and starts the user-data stream; without it balances come from REST."""
+        try:
+            await self.markets.load()
+        except Exception as e:
+            log.warning("⚠️ Market rules unavailable, orders are only rounded: %r", e)
+        if self.account:
+            try:
+                await self.account.start()
+            except Exception as e:
+                log.warning("⚠️ Account stream unavailable, sizing sells from REST: %r", e)
 
-    def get_balance(self):
+    async def close(self):
+        """Stops the account stream and closes the exchange HTTP session."""
+        if self.account:
+            await self.account.stop()
+        await self.exchange.close()
+
+    async def get_balance(self):
         """Fetch account balance for USDC."""
-        balance = self.exchange.fetch_balance()
-        usdc_balance = balance['total'].get('USDC', 0)
-        print(f"Available USDC balance: {usdc_balance}")
+        if self.account and self.account.ready:
+            usdc_balance = self.account.balance('USDC')
+        else:
+            balance = await self.exchange.fetch_balance()
+            usdc_balance = balance['total'].get('USDC', 0)
+        log.info("Available USDC balance: %s", usdc_balance)
         return usdc_balance
 
-    def place_buy_order(self, symbol, usdc_amt = 10, order_type="market"):
-        """Places a market buy order for the given symbol using a specified USDC amount."""
-
-        ticker = self.exchange.fetch_ticker(symbol)
-        current_price = ticker['last']
-        qty = round(usdc_amt / current_price, 8)  # precision depends on the exchange
+    async def place_buy_order(self, symbol, usdc_amt = 10, order_type="market"):
+        """Places a market buy order for the given symbol using a specified USDC amount. Returns an OrderAck."""
+        started = time.perf_counter()
+        timings = {}
 
         try:
+            current_price = self.quotes.price(symbol, "buy") if self.quotes else None
+            if current_price is None:  # no fresh streamed quote; one REST round-trip
+                ticker = await self.exchange.fetch_ticker(symbol)
+                current_price = ticker['last']
+            timings["quote_ms"] = orders.elapsed_ms(started)
+            qty, reason = await self.quantize(symbol, usdc_amt / current_price, current_price, "buy")
+            if reason:
+                return self.reject(symbol, "buy", reason, timings, started)
+
             # Place the buy order
-            order = self.exchange.create_market_order(symbol=symbol, side="buy", amount=qty)
+            submitted = time.perf_counter()
+            sent_ms = int(time.time() * 1000)
+            order = await self.exchange.create_market_order(symbol=symbol, side="buy", amount=qty)
+            timings["submit_ms"] = orders.elapsed_ms(submitted)
+            timings["total_ms"] = orders.elapsed_ms(started)
 
             order_id = order['id']
-            trade_price = order['price']
-            timestamp_str = datetime.fromtimestamp(int(order['info']['transactTime']) / 1000, tz=timezone.utc) \
-                    .astimezone(pytz.timezone('America/Los_Angeles')) \
-                    .strftime('%Y-%m-%d %I:%M:%S %p PDT')
+            trade_price = order.get('average') or order['price'] or current_price
+            self.record_fill(symbol, "buy", order, qty, trade_price, sent_ms)
+            timestamp_str = self.format_timestamp(order)
             comms.buy_order_success(symbol, qty, trade_price, timestamp_str)
-            print(f"✅ Buy order {order_id} placed successfully at {trade_price} @ {timestamp_str}")
+            log.info("✅ Buy order %s placed successfully at %s @ %s (%.0f ms)", order_id, trade_price, timestamp_str, timings["total_ms"],
+                     extra={"symbol": symbol, "order_id": order_id, "qty": qty})
+            return orders.ack(symbol, "buy", True, order_id, qty, trade_price, timestamp_str, timings=timings)
         except Exception as e:
             reason = f"Error placing buy order: {e}"
-            print(reason)
+            log.error(reason)
             comms.buy_order_fail(symbol, reason)
+            timings["total_ms"] = orders.elapsed_ms(started)
+            return orders.ack(symbol, "buy", False, error=reason, timings=timings)
+
+    async def place_sell_order(self, symbol):
+        """Places a market sell order for the full position of the given symbol. Returns an OrderAck."""
+        started = time.perf_counter()
+        timings = {}
 
-    def place_sell_order(self, symbol):
-        """Places a market sell order for the full position of the given symbol."""
         try:
-            balance = self.exchange.fetch_balance()
             asset = symbol.split("/")[0]  # Extracts base asset (e.g., BTC from BTC/USDC)
-            qty = balance['total'].get(asset, 0)
+            if self.account and self.account.ready:  # streamed state; no pre-trade REST call
+                qty = self.account.balance(asset)
+            else:
+                balance = await self.exchange.fetch_balance()
+                qty = balance['total'].get(asset, 0)
+            timings["balance_ms"] = orders.elapsed_ms(started)
 
             if qty > 0:
-                order = self.exchange.create_market_order(symbol=symbol, side="sell", amount=qty)
+                price = self.quotes.price(symbol, "sell") if self.quotes else None
+                qty, reason = await self.quantize(symbol, qty, price, "sell")
+                if reason:
+                    return self.reject(symbol, "sell", reason, timings, started, flat=await self.dust(symbol, qty, price))
+
+                submitted = time.perf_counter()
+                sent_ms = int(time.time() * 1000)
+                order = await self.exchange.create_market_order(symbol=symbol, side="sell", amount=qty)
+                timings["submit_ms"] = orders.elapsed_ms(submitted)
+                timings["total_ms"] = orders.elapsed_ms(started)
 
                 order_id = order['id']
-                trade_price = order['price']
-                timestamp_str = datetime.fromtimestamp(int(order['info']['transactTime']) / 1000, tz=timezone.utc) \
-                    .astimezone(pytz.timezone('America/Los_Angeles')) \
-                    .strftime('%Y-%m-%d %I:%M:%S %p PDT')
+                trade_price = order.get('average') or order['price']
+                self.record_fill(symbol, "sell", order, qty, trade_price, sent_ms)
+                timestamp_str = self.format_timestamp(order)
                 comms.sell_order_success(symbol, qty, trade_price, timestamp_str)
-                print(f"✅ Sell order {order_id} placed successfully at {trade_price} @ {timestamp_str}")
+                log.info("✅ Sell order %s placed successfully at %s @ %s (%.0f ms)", order_id, trade_price, timestamp_str, timings["total_ms"],
+                         extra={"symbol": symbol, "order_id": order_id, "qty": qty})
+                return orders.ack(symbol, "sell", True, order_id, qty, trade_price, timestamp_str, timings=timings)
             else:
                 reason = f"No {symbol} position found. Holding 0 {asset}."
-                print(reason)
+                log.warning(reason)
                 comms.sell_order_fail(symbol, reason)
+                timings["total_ms"] = orders.elapsed_ms(started)
+                return orders.ack(symbol, "sell", False, error=reason, timings=timings, flat=True)
 
         except Exception as e:
             reason = f"Error placing sell order: {e}"
-            print(reason)
+            log.error(reason)
             comms.sell_order_fail(symbol, reason)
 
+        timings["total_ms"] = orders.elapsed_ms(started)
+        return orders.ack(symbol, "sell", False, error=reason, timings=timings)
+
+    async def quantize(self, symbol, qty, price, side):
+        """Returns the exchange-exact quantity and the reason the order would be rejected, if it would."""
+        try:
+            market = await self.markets.market(symbol)
+        except Exception as e:
+            log.warning("⚠️ No market rules for %s: %r", symbol, e)
+            market = None
+        if market is None:
+            return round(qty, 8), None
+        qty, _, reason = market.order(qty, price, side)
+        return float(qty), reason
+
+    async def dust(self, symbol, qty, price):
+        """True when the holding is below the market's minimums: it can never be sold, so the position is over."""
+        market = await self.markets.market(symbol)
+        return market is not None and market.dust(qty, price)
+
+    def reject(self, symbol, side, reason, timings, started, flat=False):
+        """An order that breaks a market filter; it never reaches the exchange."""
+        reason = f"{side.capitalize()} order rejected locally: {reason}"
+        log.warning(reason, extra={"symbol": symbol})
+        timings["total_ms"] = orders.elapsed_ms(started)
+        return orders.ack(symbol, side, False, error=reason, timings=timings, flat=flat)
+
+    def record_fill(self, symbol, side, order, qty, price, sent_ms):
+        """Applies our fill to the account state until the stream's balances arrive."""
+        if not self.account:
+            return
+        base, quote = symbol.split("/")
+        fee = order.get('fee') or {}
+        self.account.on_fill(base, quote, side, order.get('filled') or qty, price, sent_ms, order['id'],
+                             fee.get('cost') or 0.0, fee.get('currency'))
+
+    def format_timestamp(self, order):
+        return datetime.fromtimestamp(int(order['info']['transactTime']) / 1000, tz=timezone.utc) \
+                .astimezone(pytz.timezone('America/Los_Angeles')) \
+                .strftime('%Y-%m-%d %I:%M:%S %p PDT')
+
 # if __name__ == "__main__":
-#     trader = BinanceUSTrader()
-#     trader.place_sell_order('BTC/USDC')
\ No newline at end of file
+#     import asyncio
+#     async def main():
+#         trader = BinanceUSTrader()
+#         await trader.place_sell_order('BTC/USDC')
+#         await trader.close()
+#     asyncio.run(main())
@@ -1,46 +1,51 @@
-import asyncio
-import websockets
-import json
 import datetime
+import feeds
 
 class BinanceUSWebsocketClient:
-    def __init__(self, trading_bot=None, symbol="btcusdc", interval="1m"):
-        self.url = f"wss://stream.binance.us:9443/ws/{symbol.lower()}@kline_{interval}"
-        self.trading_bot = trading_bot
-        self.symbol = symbol.upper()
+    BASE_URL = "wss://stream.binance.us:9443"
 
-    async def handle_message(self, message):
-        kline = message['k']
-        timestamp = datetime.datetime.fromtimestamp(kline['t'] / 1000)
-        kline_data = {
-            "symbol": self.symbol,
-            "timestamp": timestamp,
-            "open": float(kline['o']),
-            "high": float(kline['h']),
-            "low": float(kline['l']),
-            "close": float(kline['c']),
-            "volume": float(kline['v']),
-        }
+    def __init__(self, trading_bot=None, symbol="btcusdc", interval="1m", symbols=None, bar_interval=None, base_url=None, rest_url=None, quotes=None):
+        """
+        Streams klines for one symbol, or for every symbol in `symbols` over combined streams.
+        With bar_interval (e.g. "5s", "100v", "500t") it subscribes to the trade stream instead
+        and builds the bars locally with BarAggregator. Reconnects and gap backfill are handled
+        by feeds.Feed; attach() shares a FeedHub's sockets with other consumers instead.
+        With a QuoteCache in `quotes` the bookTicker stream is added on the same socket to keep it fresh.
+        """
+        self.trading_bot = trading_bot
+        self.interval = interval
+        self.symbols = [s.upper() for s in (symbols or [symbol])]
+        self.symbol = self.symbols[0]
+        self.quotes = quotes
+        stream = "trade" if bar_interval else f"kline_{interval}"
+        self.adapter = feeds.BinanceAdapter((stream, "bookTicker") if quotes else stream, base_url or self.BASE_URL, rest_url)
+        self.handler = feeds.BarBuilder(self.emit, bar_interval) if bar_interval else self.emit
+        self.urls = self.adapter.urls(self.symbols)
+        self.url = self.urls[0]
 
+    def emit(self, bar):
         if self.trading_bot:
-            self.trading_bot.on_new_data(kline_data)
+            self.trading_bot.on_new_data(bar)
         else:
-            print(f"[{kline_data['timestamp']}] Open: {kline_data['open']} | High: {kline_data['high']} | Low: {kline_data['low']} | Close: {kline_data['close']} | Volume: {kline_data['volume']}")
+            print(f"[{bar.symbol} {datetime.datetime.fromtimestamp(bar.timestamp / 1000)}] Open: {bar.open} | High: {bar.high} | Low: {bar.low} | Close: {bar.close} | Volume: {bar.volume}")
+
+    def attach(self, hub):
+        """Subscribes to the hub's shared Binance feed; returns the Feed."""
+        return self.subscribe(hub.feed(self.adapter, self.symbols))
 
-    async def connect(self):
-        print(f"🔌 Connecting to Binance.US WebSocket for {self.symbol} ({self.url})")
-        while True:
-            try:
-                async with websockets.connect(self.url) as ws:
-                    print("✅ Connected")
-                    async for message in ws:
-                        data = json.loads(message)
-                        await self.handle_message(data)
+    def prime(self, bars):
+        """Bars backfilled after a reconnect: the bot loads them like primed history and places no orders on them."""
+        if self.trading_bot:
+            self.trading_bot.data_prime(bars)
+        else:
+            for bar in bars:
+                self.emit(bar)
 
-            except Exception as e:
-                print(f"❌ Connection error: {e}")
-                print("🔄 Reconnecting in 5 seconds...")
-                await asyncio.sleep(5)
+    def subscribe(self, feed):
+        feed.subscribe(self.handler, self.symbols, feeds.BAR_KINDS, backfill=self.prime)
+        if self.quotes:
+            feed.subscribe(self.quotes, self.symbols)
+        return feed
 
     async def start(self):
-        await self.connect()
\ No newline at end of file
+        await self.subscribe(feeds.Feed(self.adapter, self.symbols)).start()
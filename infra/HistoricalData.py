@@ -0,0 +1,309 @@
+"""
+Bulk historical bar downloader with a per-day on-disk cache.
+
+Pages through Binance.US klines (1000 per request) or Alpaca bars (10000 per page) through
+the shared RequestScheduler (pooled sessions, the process-wide rate limit, backfill lane),
+fetching several symbols / date ranges at once on a thread pool. Every completed UTC day is stored as its own .npz file under
+cache_dir/<source>/<symbol>/<interval>/, so later calls only download the days that
+are missing; fetch() pages one bounded range without touching the cache (live gap fills).
+base_url can point at a local mock server.
+
+Run from the repo root:
+    python infra/HistoricalData.py BTCUSDC ETHUSDC --days 30
+    python infra/HistoricalData.py AAPL AMD --source alpaca --days 730
+"""
+import argparse, datetime, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+import logs, RequestScheduler
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+DAY_MS = 86_400_000
+INTERVAL_MS = {"m": 60_000, "h": 3_600_000, "d": DAY_MS}
+BASE_URLS = {"binance": "https://api.binance.us", "alpaca": "https://data.alpaca.markets"}
+PAGE_LIMITS = {"binance": 1000, "alpaca": 10000}
+WEIGHTS = {"binance": 2, "alpaca": 1}  # request weight of one page against the exchange's limit
+
+log = logs.get(__name__)
+
+def interval_ms(interval):
+    """'1m' / '15m' / '1h' / '1d' -> milliseconds."""
+    return int(interval[:-1]) * INTERVAL_MS[interval[-1]]
+
+def to_ms(value):
+    """datetime (naive = UTC) or epoch ms -> epoch ms."""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+def iso(ms):
+    return datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def empty():
+    return {name: np.array([], dtype=np.int64 if name == "timestamp" else np.float64) for name in COLUMNS}
+
+def concat(parts):
+    parts = [part for part in parts if len(part["timestamp"])]
+    if not parts:
+        return empty()
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+def select(bars, start, end):
+    """Rows with start <= timestamp < end (bars are in time order)."""
+    lo, hi = np.searchsorted(bars["timestamp"], [start, end])
+    return {name: values[lo:hi] for name, values in bars.items()}
+
+
+class RateLimiter:
+    """Token bucket shared by the download threads, for an extra cap below the exchange limit."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Empties the bucket so every thread waits, e.g. after a 429."""
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class HistoricalData:
+    def __init__(self, source="binance", cache_dir="hist_cache", interval="1m", base_url=None,
+                 key=None, secret=None, max_workers=4, rate=None, max_retries=5, settle_ms=3_600_000,
+                 lane=RequestScheduler.BACKFILL):
+        """
+        :param source: "binance" (Binance.US klines) or "alpaca" (stock bars; crypto when the symbol has a '/').
+        :param base_url: override the API host, e.g. "http://127.0.0.1:8000" for a mock server.
+        :param rate: optional requests per second across all threads, on top of the exchange's shared limit.
+        :param lane: RequestScheduler lane; live gap fills use DATA so bulk downloads do not delay them.
+        :param settle_ms: a day is cached only once it ended this long ago, so late bars are not missed.
+        """
+        if source not in BASE_URLS:
+            raise ValueError(f"Unknown source {source!r}; expected one of {list(BASE_URLS)}")
+        self.source = source
+        self.cache_dir = cache_dir
+        self.interval = interval
+        self.interval_ms = interval_ms(interval)
+        self.base_url = (base_url or BASE_URLS[source]).rstrip("/")
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.settle_ms = settle_ms
+        self.limiter = RateLimiter(rate) if rate else None
+        self.lane = lane
+        self.scheduler = RequestScheduler.shared()
+        self.requests_made = 0
+
+        self.headers = {}
+        if source == "alpaca" and key:
+            self.headers = {"APCA-API-KEY-ID": key, "APCA-API-SECRET-KEY": secret or ""}
+
+    def close(self):
+        pass  # the pooled sessions belong to the shared RequestScheduler
+
+    # public API
+
+    def load(self, symbol, start, end=None):
+        """Bars for one symbol in [start, end) as a dict of arrays (timestamp in epoch ms)."""
+        return self.load_many([symbol], start, end)[symbol]
+
+    def load_many(self, symbols, start, end=None):
+        """
+        Bars for several symbols, downloading only the days not already cached.
+        Missing ranges of every symbol are fetched concurrently.
+
+        :return: {symbol: {"timestamp", "open", "high", "low", "close", "volume"}}
+        """
+        start = to_ms(start)
+        end = to_ms(end) if end is not None else int(time.time() * 1000)
+        days = range(start // DAY_MS * DAY_MS, end, DAY_MS)
+
+        tasks = [(symbol, run_start, run_end)
+                 for symbol in symbols
+                 for run_start, run_end in self.missing_ranges(symbol, days, end)]
+        fetched = {symbol: [] for symbol in symbols}
+        if tasks:
+            log.info("📥 Downloading %d range(s) for %d symbol(s) from %s", len(tasks), len(symbols), self.source)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [(task[0], pool.submit(self._fetch_range, *task)) for task in tasks]
+                for symbol, future in futures:
+                    fetched[symbol].append(future.result())
+
+        result = {}
+        for symbol in symbols:
+            downloaded = concat(fetched[symbol])
+            parts = []
+            for day in days:
+                path = self.day_path(symbol, day)
+                if os.path.exists(path):
+                    with np.load(path) as data:
+                        parts.append({name: data[name] for name in COLUMNS})
+                else:
+                    parts.append(select(downloaded, day, day + DAY_MS))
+            result[symbol] = select(concat(parts), start, end)
+        return result
+
+    def fetch(self, symbol, start, end=None):
+        """
+        Bars in [start, end) straight from the exchange, bypassing the day cache: pages only the
+        requested range and writes nothing to disk. For live gap fills of a few minutes.
+        """
+        start = to_ms(start)
+        end = to_ms(end) if end is not None else int(time.time() * 1000)
+        if start >= end:
+            return empty()
+        pages = self._fetch_binance(symbol, start, end) if self.source == "binance" else self._fetch_alpaca(symbol, start, end)
+        return select(concat(pages), start, end)
+
+    def missing_ranges(self, symbol, days, end):
+        """Contiguous [start, end) runs of days without a cache file."""
+        runs = []
+        for day in days:
+            if os.path.exists(self.day_path(symbol, day)):
+                continue
+            if runs and runs[-1][1] == day:
+                runs[-1][1] = day + DAY_MS
+            else:
+                runs.append([day, day + DAY_MS])
+        return [(run_start, min(run_end, end)) for run_start, run_end in runs]
+
+    def day_path(self, symbol, day):
+        name = datetime.datetime.fromtimestamp(day / 1000, datetime.timezone.utc).strftime("%Y-%m-%d")
+        return os.path.join(self.cache_dir, self.source, symbol.replace("/", "_"), self.interval, f"{name}.npz")
+
+    # download
+
+    def _fetch_range(self, symbol, start, end):
+        """Pages through [start, end), then caches each day in the range that has fully settled."""
+        pages = self._fetch_binance(symbol, start, end) if self.source == "binance" else self._fetch_alpaca(symbol, start, end)
+        bars = select(concat(pages), start, end)
+
+        settled = int(time.time() * 1000) - self.settle_ms
+        for day in range(start, end, DAY_MS):
+            if day + DAY_MS <= min(end, settled):
+                self._write_day(symbol, day, select(bars, day, day + DAY_MS))
+        log.info("✅ %s: %d bars %s -> %s", symbol, len(bars["timestamp"]), iso(start), iso(end))
+        return bars
+
+    def _fetch_binance(self, symbol, start, end):
+        limit = PAGE_LIMITS["binance"]
+        cursor, pages = start, []
+        while cursor < end:
+            rows = self._get("/api/v3/klines", {"symbol": symbol.replace("/", "").upper(), "interval": self.interval,
+                                                "startTime": cursor, "endTime": end - 1, "limit": limit})
+            if not rows:
+                break
+            table = np.array([row[:6] for row in rows], dtype=np.float64)
+            pages.append({"timestamp": table[:, 0].astype(np.int64), "open": table[:, 1], "high": table[:, 2],
+                          "low": table[:, 3], "close": table[:, 4], "volume": table[:, 5]})
+            cursor = int(rows[-1][0]) + self.interval_ms
+            if len(rows) < limit:
+                break
+        return pages
+
+    def _fetch_alpaca(self, symbol, start, end):
+        path = "/v1beta3/crypto/us/bars" if "/" in symbol else "/v2/stocks/bars"
+        unit = {"m": "Min", "h": "Hour", "d": "Day"}[self.interval[-1]]
+        params = {"symbols": symbol, "timeframe": f"{self.interval[:-1]}{unit}", "start": iso(start), "end": iso(end),
+                  "limit": PAGE_LIMITS["alpaca"]}
+        pages = []
+        while True:
+            body = self._get(path, params)
+            rows = (body.get("bars") or {}).get(symbol) or []
+            if rows:
+                timestamps = np.array([row["t"].rstrip("Z")[:19] for row in rows], dtype="datetime64[ms]").astype(np.int64)
+                table = np.array([(row["o"], row["h"], row["l"], row["c"], row["v"]) for row in rows], dtype=np.float64)
+                pages.append({"timestamp": timestamps, "open": table[:, 0], "high": table[:, 1],
+                              "low": table[:, 2], "close": table[:, 3], "volume": table[:, 4]})
+            token = body.get("next_page_token")
+            if not token:
+                break
+            params = {**params, "page_token": token}
+        return pages
+
+    def _get(self, path, params):
+        """GET with the shared rate limit; retries 429/418/5xx and connection errors with backoff."""
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                response = self.scheduler.request("GET", self.base_url + path, WEIGHTS[self.source], self.lane, self.source,
+                                                  params=params, headers=self.headers)
+                self.requests_made += 1
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise
+                log.warning("⚠️ %s failed (%s); retrying in %.0fs", path, e, delay)
+                time.sleep(delay)
+                delay *= 2
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code in (418, 429) or response.status_code >= 500:
+                if attempt == self.max_retries:
+                    break
+                wait = float(response.headers.get("Retry-After", delay))
+                log.warning("⚠️ %s returned %s; backing off %.0fs", path, response.status_code, wait)
+                if response.status_code >= 500:  # 429 / 418 already paused the whole group in the scheduler
+                    time.sleep(wait)
+                delay *= 2
+                continue
+            break
+        raise RuntimeError(f"❌ {self.base_url}{path} failed: {response.status_code} - {response.text[:200]}")
+
+    def _write_day(self, symbol, day, bars):
+        path = self.day_path(symbol, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as file:
+            np.savez(file, **bars)
+        os.replace(temp, path)
+
+
+if __name__ == "__main__":
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Download and cache historical bars.")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument("--source", default="binance", choices=sorted(BASE_URLS))
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--cache-dir", default="hist_cache")
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--config", default="infra/config.yaml")
+    args = parser.parse_args()
+
+    key = secret = None
+    if args.source == "alpaca" and os.path.exists(args.config):
+        with open(args.config, "r") as file:
+            config = yaml.safe_load(file)
+        key, secret = config["alpaca"]["key"], config["alpaca"]["secret"]
+
+    data = HistoricalData(args.source, args.cache_dir, args.interval, args.base_url, key, secret, args.workers)
+    end = int(time.time() * 1000)
+    started = time.perf_counter()
+    bars = data.load_many(args.symbols, end - args.days * DAY_MS, end)
+    data.close()
+    for symbol, symbol_bars in bars.items():
+        print(f"{symbol}: {len(symbol_bars['timestamp'])} bars")
+    print(f"Done in {time.perf_counter() - started:.2f} s ({data.requests_made} requests)")
@@ -0,0 +1,321 @@
+import math, operator
+from collections import deque
+
+class IndicatorEngine:
+    """
+    Streaming counterpart of the functions in indicators.py.
+
+    The engine mirrors the bot's price window (append a bar, replace the last bar of
+    the same minute, evict the oldest bar) and keeps running state so that every
+    update is O(1) instead of rebuilding the whole window:
+
+    - mean / std: Welford add and remove
+    - RSI: Wilder smoothing, kept as a seed sum plus a decayed tail sum so the window
+      can slide without replaying it
+    - DI+ / DI-: running +DM, -DM and TR sums (close-to-close, like indicators.py)
+    - MACD: the histogram of a window is a fixed linear combination of its closes (every
+      EMA is seeded at the window's first close), so it is one dot product with a weight
+      vector computed once per window length, in O(length)
+
+    All of them match the batch functions in indicators.py applied to the same window.
+    macd_components() is the incremental alternative for MACD: fast, slow and signal EMAs
+    carried across evictions, O(1) per update, equal to indicators.macd_series over the
+    whole stream rather than the window.
+    """
+
+    def __init__(self, rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9, resync_every=1000):
+        self.rsi_period = rsi_period
+        self.macd_fast = macd_fast
+        self.macd_slow = macd_slow
+        self.macd_signal = macd_signal
+        self.resync_every = resync_every  # evictions between exact recomputes (bounds float drift)
+
+        self.closes = deque()
+        self.deltas = deque()
+
+        # Welford state
+        self.n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+        # Directional sums over the whole window
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.up_moves = 0
+        self.down_moves = 0
+
+        # Wilder RSI: seed sums over the first `rsi_period` deltas, decayed tail over the rest
+        self._decay = (rsi_period - 1) / rsi_period
+        self.seed_gain = 0.0
+        self.seed_loss = 0.0
+        self.tail_gain = 0.0
+        self.tail_loss = 0.0
+
+        # MACD histogram weights per window length
+        self._macd_kernels = {}
+
+        # stream-long MACD EMA state; _macd_prev is the state before the last bar so it can be replaced
+        self._alpha_fast = 2 / (macd_fast + 1)
+        self._alpha_slow = 2 / (macd_slow + 1)
+        self._alpha_signal = 2 / (macd_signal + 1)
+        self._macd_state = (0, 0.0, 0.0, 0.0)  # (bars seen, fast ema, slow ema, signal ema)
+        self._macd_prev = self._macd_state
+
+        self._evictions = 0
+
+    def __len__(self):
+        return len(self.closes)
+
+    # window maintenance
+
+    def append(self, close):
+        """Adds a new bar to the end of the window."""
+        if self.closes:
+            self._push_delta(close - self.closes[-1])
+        self.closes.append(close)
+        self._welford_add(close)
+
+        self._macd_prev = self._macd_state
+        self._macd_state = self._macd_step(self._macd_state, close)
+
+    def replace_last(self, close):
+        """Replaces the close of the last bar (kline update within the same minute)."""
+        if not self.closes:
+            self.append(close)
+            return
+
+        old = self.closes[-1]
+        if len(self.closes) > 1:
+            self._replace_last_delta(close - self.closes[-2])
+        self.closes[-1] = close
+        self._welford_remove(old)
+        self._welford_add(close)
+
+        self._macd_state = self._macd_step(self._macd_prev, close)
+
+    def popleft(self):
+        """Evicts the oldest bar from the window."""
+        old = self.closes.popleft()
+        self._welford_remove(old)
+        if self.deltas:
+            self._pop_first_delta()
+
+        self._evictions += 1
+        if self._evictions % self.resync_every == 0:
+            self.resync()
+        return old
+
+    def resync(self):
+        """Recomputes the window sums exactly, discarding accumulated rounding error."""
+        closes = list(self.closes)
+        self.closes.clear()
+        self.deltas.clear()
+        self.n, self._mean, self._m2 = 0, 0.0, 0.0
+        self.gain_sum = self.loss_sum = 0.0
+        self.up_moves = self.down_moves = 0
+        self.seed_gain = self.seed_loss = self.tail_gain = self.tail_loss = 0.0
+
+        for close in closes:
+            if self.closes:
+                self._push_delta(close - self.closes[-1])
+            self.closes.append(close)
+            self._welford_add(close)
+
+    # persistence
+
+    def snapshot(self):
+        """Window closes and the stream-long MACD EMA state as plain lists (JSON-serializable)."""
+        return {"closes": list(self.closes), "macd_state": list(self._macd_state), "macd_prev": list(self._macd_prev)}
+
+    def restore(self, snapshot):
+        """
+        Rebuilds the engine from snapshot(); the window sums are recomputed from the closes.
+        Without saved EMA state the stream-long MACD restarts at the window's first close.
+        """
+        self.closes = deque(snapshot["closes"])
+        self.resync()
+        if "macd_state" in snapshot:
+            self._macd_state = tuple(snapshot["macd_state"])
+            self._macd_prev = tuple(snapshot["macd_prev"])
+        else:
+            self._macd_state = self._macd_prev = (0, 0.0, 0.0, 0.0)
+            for close in self.closes:
+                self._macd_prev = self._macd_state
+                self._macd_state = self._macd_step(self._macd_state, close)
+
+    # indicator values
+
+    def mean(self):
+        return self._mean if self.n else math.nan
+
+    def std(self):
+        """Sample standard deviation (ddof=1), like np.std(prices, ddof=1)."""
+        if self.n < 2:
+            return math.nan
+        return math.sqrt(max(self._m2, 0.0) / (self.n - 1))
+
+    def rsi(self):
+        period = self.rsi_period
+        m = len(self.deltas)
+        if m < period:
+            return None
+        if self.down_moves == 0:
+            return 100  # RSI = 100 if no losses
+
+        weight = self._decay ** (m - period) / period
+        avg_gain = self.seed_gain * weight + self.tail_gain
+        avg_loss = self.seed_loss * weight + self.tail_loss
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+    def di_plus(self):
+        if len(self.closes) < 3:
+            return -1
+        if self.up_moves == 0 and self.down_moves == 0:
+            return 0
+        return self.gain_sum / (self.gain_sum + self.loss_sum) * 100
+
+    def di_minus(self):
+        if len(self.closes) < 3:
+            return -1
+        if self.up_moves == 0 and self.down_moves == 0:
+            return 0
+        return self.loss_sum / (self.gain_sum + self.loss_sum) * 100
+
+    def macd(self):
+        """Latest MACD histogram (macd - signal) of the window, like indicators.macd; None until it is defined."""
+        n = len(self.closes)
+        if n < self.macd_slow + self.macd_signal - 1:
+            return None
+        kernel = self._macd_kernels.get(n)
+        if kernel is None:
+            kernel = self._macd_kernels[n] = self._macd_kernel(n)
+        return sum(map(operator.mul, kernel, self.closes))
+
+    def macd_components(self):
+        """
+        Incremental MACD over the whole stream: (fast ema, slow ema, macd line, signal line,
+        histogram), None where not yet valid; matches the last row of indicators.macd_series.
+        """
+        count, fast, slow, signal_ema = self._macd_state
+        line = fast - slow if count >= self.macd_slow else None
+        signal_line = signal_ema if count >= self.macd_slow + self.macd_signal - 1 else None
+        histogram = line - signal_line if signal_line is not None else None
+        return (fast if count >= self.macd_fast else None,
+                slow if count >= self.macd_slow else None,
+                line, signal_line, histogram)
+
+    # internals
+
+    def _welford_add(self, x):
+        self.n += 1
+        delta = x - self._mean
+        self._mean += delta / self.n
+        self._m2 += delta * (x - self._mean)
+
+    def _welford_remove(self, x):
+        if self.n <= 1:
+            self.n, self._mean, self._m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        delta = x - self._mean
+        self._mean -= delta / self.n
+        self._m2 -= delta * (x - self._mean)
+
+    def _count(self, delta, sign):
+        if delta > 0:
+            self.gain_sum += sign * delta
+            self.up_moves += sign
+        elif delta < 0:
+            self.loss_sum -= sign * delta
+            self.down_moves += sign
+
+    def _push_delta(self, delta):
+        period = self.rsi_period
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if len(self.deltas) < period:
+            self.seed_gain += gain
+            self.seed_loss += loss
+        else:
+            self.tail_gain = self.tail_gain * self._decay + gain / period
+            self.tail_loss = self.tail_loss * self._decay + loss / period
+        self.deltas.append(delta)
+        self._count(delta, 1)
+
+    def _replace_last_delta(self, delta):
+        period = self.rsi_period
+        old = self.deltas[-1]
+        d_gain = max(delta, 0.0) - max(old, 0.0)
+        d_loss = max(-delta, 0.0) - max(-old, 0.0)
+        if len(self.deltas) <= period:
+            self.seed_gain += d_gain
+            self.seed_loss += d_loss
+        else:
+            self.tail_gain += d_gain / period
+            self.tail_loss += d_loss / period
+        self._count(old, -1)
+        self._count(delta, 1)
+        self.deltas[-1] = delta
+
+    def _pop_first_delta(self):
+        period = self.rsi_period
+        m = len(self.deltas)
+        first = self.deltas.popleft()
+        self.seed_gain -= max(first, 0.0)
+        self.seed_loss -= max(-first, 0.0)
+
+        if m > period:
+            # the first tail delta slides into the seed window
+            moved = self.deltas[period - 1]
+            weight = self._decay ** (m - 1 - period) / period
+            gain, loss = max(moved, 0.0), max(-moved, 0.0)
+            self.seed_gain += gain
+            self.seed_loss += loss
+            self.tail_gain -= gain * weight
+            self.tail_loss -= loss * weight
+        self._count(first, -1)
+
+    def _macd_step(self, state, close):
+        count, fast, slow, signal = state
+        if count == 0:
+            return (1, close, close, 0.0)
+
+        count += 1
+        fast += self._alpha_fast * (close - fast)
+        slow += self._alpha_slow * (close - slow)
+        if count == self.macd_slow:
+            signal = fast - slow  # signal EMA starts at the first valid MACD value
+        elif count > self.macd_slow:
+            signal += self._alpha_signal * ((fast - slow) - signal)
+        return (count, fast, slow, signal)
+
+    def _macd_kernel(self, n):
+        """
+        Weights w with histogram = w . closes for an n-bar window, in O(n).
+
+        Forward, every EMA is e_0 = x_0, e_i = (1 - a) e_(i-1) + a x_i, and the signal EMA is
+        seeded at the MACD value of bar slow - 1. The histogram is a linear combination
+        sum(c_i * macd_i); one backward pass per EMA turns the c_i into weights on the closes.
+        """
+        a_signal = 2 / (self.macd_signal + 1)
+        seed = self.macd_slow - 1
+        c = [0.0] * n  # d histogram / d macd_i
+        c[-1] = 1.0
+        if n > seed:
+            c[seed] -= (1 - a_signal) ** (n - 1 - seed)
+            for i in range(seed + 1, n):
+                c[i] -= a_signal * (1 - a_signal) ** (n - 1 - i)
+        fast = self._ema_adjoint(c, 2 / (self.macd_fast + 1))
+        slow = self._ema_adjoint(c, 2 / (self.macd_slow + 1))
+        return [f - s for f, s in zip(fast, slow)]
+
+    @staticmethod
+    def _ema_adjoint(c, alpha):
+        """Weights on x of sum(c_i * e_i) for the EMA e seeded at x_0 (backward recursion)."""
+        weights = [0.0] * len(c)
+        carry = 0.0
+        for i in range(len(c) - 1, -1, -1):
+            carry = c[i] + (1 - alpha) * carry
+            weights[i] = alpha * carry
+        weights[0] = carry  # e_0 = x_0 takes the whole adjoint
+        return weights
@@ -0,0 +1,193 @@
+"""
+Exchange trading rules (lot size, tick size, min notional) per symbol, cached on disk.
+
+The markets are fetched at most once per max_age (a day by default) and written to
+market_cache_<exchange>.json, so a restart reads the file instead of calling load_markets.
+The Binance source also hands the cached markets back to ccxt, which would otherwise
+load them itself before the first order.
+
+Traders quantize every order with Market.order() before it is sent. An order that breaks
+a filter is rejected locally instead of after an exchange round-trip.
+"""
+import asyncio, json, os, time
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+import logs
+
+log = logs.get(__name__)
+
+
+def decimal(value):
+    """Exchange filter value as a Decimal; missing and zero ("0.00000000") mean no limit."""
+    if value in (None, ""):
+        return None
+    value = Decimal(str(value))
+    return value if value > 0 else None
+
+def floor_to(value, step):
+    return (value / step).to_integral_value(ROUND_DOWN) * step if step else value
+
+
+class Market:
+    """Trading rules of one symbol; quantities and prices are Decimals, exact to the exchange's increments."""
+
+    def __init__(self, symbol, step=None, min_qty=None, max_qty=None, tick=None, min_notional=None):
+        self.symbol = symbol
+        self.step = decimal(step)
+        self.min_qty = decimal(min_qty)
+        self.max_qty = decimal(max_qty)
+        self.tick = decimal(tick)
+        self.min_notional = decimal(min_notional)
+
+    def quantity(self, qty):
+        """Rounds down to the lot step, so a sell never asks for more than is held."""
+        return floor_to(Decimal(str(qty)), self.step)
+
+    def price(self, price, side="buy"):
+        """Rounds to the tick on the passive side: down for buys, up for sells."""
+        price = Decimal(str(price))
+        if not self.tick:
+            return price
+        rounding = ROUND_DOWN if side == "buy" else ROUND_UP
+        return (price / self.tick).to_integral_value(rounding) * self.tick
+
+    def order(self, qty, price=None, side="buy"):
+        """
+        Quantizes an order and checks it against the filters.
+        Returns (qty, price, None) or (qty, price, reason) when the exchange would reject it.
+        """
+        qty = self.quantity(qty)
+        price = self.price(price, side) if price else None
+        if qty <= 0:
+            return qty, price, f"quantity rounds to 0 at lot step {self.step}"
+        if self.min_qty and qty < self.min_qty:
+            return qty, price, f"quantity {qty} is below the minimum {self.min_qty}"
+        if self.max_qty and qty > self.max_qty:
+            return qty, price, f"quantity {qty} is above the maximum {self.max_qty}"
+        if price and self.min_notional and qty * price < self.min_notional:
+            if side == "buy" and self.step and (qty + self.step) * price >= self.min_notional:
+                return qty + self.step, price, None  # a buy sized at the minimum spends up to one lot step more
+            return qty, price, f"notional {qty * price:.8f} is below the minimum {self.min_notional}"
+        return qty, price, None
+
+    def dust(self, qty, price=None):
+        """True when the whole quantity is below the minimums, so no sell of it can ever pass the filters."""
+        qty = self.quantity(qty)
+        return qty <= 0 or bool(self.min_qty and qty < self.min_qty) \
+            or bool(price and self.min_notional and qty * Decimal(str(price)) < self.min_notional)
+
+
+class MarketMetadata:
+    def __init__(self, source, path=None, max_age=86400):
+        """
+        :param source: BinanceMarketSource / AlpacaMarketSource
+        :param path: cache file, default market_cache_<source name>.json in the working directory
+        :param max_age: seconds before the markets are fetched again
+        """
+        self.source = source
+        self.path = path or f"market_cache_{source.name}.json"
+        self.max_age = max_age
+        self.raw = {}  # symbol -> market as the exchange returned it
+        self.markets = {}  # "BTCUSDC" -> Market
+        self.loaded_at = 0.0
+        self.refresh_task = None
+
+    async def load(self, force=False):
+        """Reads the cache file when it is fresh, else fetches the markets and rewrites it."""
+        if not force and self.read():
+            log.info("📒 %d %s markets from %s", len(self.raw), self.source.name, self.path)
+            return
+        raw = await self.source.fetch()
+        self.set(raw, time.time())
+        self.write()
+        log.info("📒 Loaded %d %s markets", len(raw), self.source.name)
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r") as file:
+                cache = json.load(file)
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ Ignoring unreadable market cache %s: %r", self.path, e)
+            return False
+        if time.time() - cache["loaded_at"] > self.max_age:
+            return False
+        self.set(cache["markets"], cache["loaded_at"])
+        return True
+
+    def write(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as file:
+            json.dump({"loaded_at": self.loaded_at, "markets": self.raw}, file, default=str)
+        os.replace(tmp, self.path)
+
+    def set(self, raw, loaded_at):
+        self.raw = raw
+        self.loaded_at = loaded_at
+        self.markets = {}
+        for symbol, market in raw.items():
+            self.markets[symbol.replace("/", "")] = Market(symbol, **self.source.rules(market))
+        self.source.restore(raw)
+
+    async def market(self, symbol):
+        """The symbol's Market (None if unknown); loads on first use and refreshes in the background once stale."""
+        if not self.markets:
+            await self.load()
+        elif time.time() - self.loaded_at > self.max_age and not (self.refresh_task and not self.refresh_task.done()):
+            self.refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+        return self.markets.get(symbol.replace("/", ""))
+
+    async def refresh(self):
+        try:
+            await self.load(force=True)
+        except Exception as e:
+            log.warning("⚠️ Market refresh failed, keeping rules from %s: %r", time.ctime(self.loaded_at), e)
+
+
+class BinanceMarketSource:
+    """ccxt load_markets; the rules come from each market's raw exchangeInfo filters."""
+    name = "binance"
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    async def fetch(self):
+        return await self.exchange.load_markets(reload=True)
+
+    def restore(self, markets):
+        if self.exchange.markets is not markets:
+            self.exchange.set_markets(markets)
+
+    @staticmethod
+    def rules(market):
+        filters = {f["filterType"]: f for f in market.get("info", {}).get("filters", [])}
+        lot = filters.get("LOT_SIZE", {})
+        market_lot = filters.get("MARKET_LOT_SIZE", {})  # market orders are bound by this one too
+        notional = filters.get("NOTIONAL") or filters.get("MIN_NOTIONAL") or {}
+        max_qty = [q for q in (decimal(lot.get("maxQty")), decimal(market_lot.get("maxQty"))) if q]
+        return {"step": lot.get("stepSize"), "min_qty": lot.get("minQty"), "max_qty": min(max_qty) if max_qty else None,
+                "tick": filters.get("PRICE_FILTER", {}).get("tickSize"), "min_notional": notional.get("minNotional")}
+
+
+class AlpacaMarketSource:
+    """Alpaca list_assets; fractionable equities trade in 1e-9 share lots with a $1 minimum."""
+    name = "alpaca"
+
+    def __init__(self, trader):
+        self.trader = trader  # AlpacaTrader, for its REST client and executor
+
+    async def fetch(self):
+        assets = await self.trader.call(self.trader.api.list_assets, status="active")
+        return {asset.symbol: asset._raw for asset in assets if asset.tradable}
+
+    def restore(self, markets):
+        pass
+
+    @staticmethod
+    def rules(asset):
+        if asset.get("class") == "crypto":
+            return {"step": asset.get("min_trade_increment"), "min_qty": asset.get("min_order_size"),
+                    "tick": asset.get("price_increment")}
+        if asset.get("fractionable"):
+            return {"step": "0.000000001", "tick": "0.01", "min_notional": "1"}
+        return {"step": "1", "tick": "0.01"}
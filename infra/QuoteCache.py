@@ -0,0 +1,54 @@
+"""
+Latest best bid / ask and last price per symbol, fed from the websocket feeds.
+
+Subscribe the cache to a feed (it is a callable taking records): Book records
+(Binance @bookTicker) set the top of book, Trade and Bar records set the last price.
+The traders size orders from price() and only go to REST when it returns None, so a
+buy no longer waits a full HTTP round-trip for a ticker.
+"""
+import time
+import BarStore
+
+
+class QuoteCache:
+    def __init__(self, max_age=5.0):
+        """:param max_age: seconds after which a quote is stale and price() returns None."""
+        self.max_age = max_age
+        self.books = {}  # symbol -> (bid, ask, monotonic receive time)
+        self.lasts = {}  # symbol -> (price, monotonic receive time)
+
+    def __call__(self, record):
+        kind = type(record)
+        if kind is BarStore.Book:
+            self.update(record.symbol, record.bid, record.ask)
+        elif kind is BarStore.Trade:
+            self.update_last(record.symbol, record.price)
+        elif kind is BarStore.Bar:
+            self.update_last(record.symbol, record.close)
+
+    def update(self, symbol, bid, ask):
+        self.books[symbol] = (bid, ask, time.monotonic())
+
+    def update_last(self, symbol, price):
+        self.lasts[symbol] = (price, time.monotonic())
+
+    def price(self, symbol, side="buy", max_age=None):
+        """
+        Ask for buys / bid for sells from a fresh book, else a fresh last price, else None.
+        Accepts "BTC/USDC" or "BTCUSDC".
+        """
+        symbol = symbol.replace("/", "")
+        limit = time.monotonic() - (self.max_age if max_age is None else max_age)
+        book = self.books.get(symbol)
+        if book and book[2] >= limit and book[0] > 0 and book[1] > 0:
+            return book[1] if side == "buy" else book[0]
+        last = self.lasts.get(symbol)
+        if last and last[1] >= limit:
+            return last[0]
+        return None
+
+    def age(self, symbol):
+        """Seconds since the symbol's last book or price update, or None if never seen."""
+        symbol = symbol.replace("/", "")
+        times = [entry[-1] for entry in (self.books.get(symbol), self.lasts.get(symbol)) if entry]
+        return time.monotonic() - max(times) if times else None
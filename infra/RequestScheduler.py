@@ -0,0 +1,200 @@
+"""
+One process-wide gate for REST traffic: pooled keep-alive sessions and shared rate limits.
+
+Every client of the same exchange draws from one token bucket per limit group, whichever
+thread or event loop it runs on: the primer, HistoricalData downloads, the account
+streams' listenKey calls and (through throttle()) the ccxt trader. Buckets count request
+weight, not requests (Binance.US: 1200 weight / minute), and are corrected from the
+exchange's own counters (X-MBX-USED-WEIGHT-1M, X-RateLimit-Remaining). A 429 / 418 pauses
+the whole group for Retry-After.
+
+Lanes keep order traffic ahead of everything else: a request waits while a higher lane is
+waiting, and DATA / BACKFILL may not draw the bucket below their reserve, so there is
+always weight left for an order.
+
+    RequestScheduler.shared().request("GET", url, weight=2, lane=RequestScheduler.BACKFILL, params=...)
+"""
+import asyncio, threading, time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import latency, logs
+
+log = logs.get(__name__)
+
+ORDERS, DATA, BACKFILL = 0, 1, 2
+LANE_NAMES = ("orders", "data", "backfill")
+RESERVE = (0.0, 0.1, 0.3)  # share of each bucket a lane leaves untouched
+# group -> (weight, seconds); Alpaca counts 200 requests / minute per key across trading and data
+LIMITS = {"binance": (1200, 60), "alpaca": (200, 60)}
+GROUPS = {"api.binance.us": "binance", "paper-api.alpaca.markets": "alpaca", "api.alpaca.markets": "alpaca",
+          "data.alpaca.markets": "alpaca"}
+POOL_SIZE = 10  # keep-alive connections per host
+MAX_SLEEP = 0.05  # waiters re-check this often, so a higher lane's arrival is noticed
+
+
+class Bucket:
+    def __init__(self, capacity, window):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting = [0, 0, 0]  # waiters per lane
+
+    def reserve(self, weight, lane, now):
+        """Takes the weight and returns 0, or returns how long to wait before asking again."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if any(self.waiting[:lane]):
+            return MAX_SLEEP
+        floor = self.capacity * RESERVE[lane]
+        weight = min(weight, self.capacity - floor)
+        short = floor + weight - self.tokens
+        if short <= 0:
+            self.tokens -= weight
+            return 0.0
+        return short / self.rate
+
+    def sync(self, remaining):
+        """Lowers the local count to what the exchange says is left."""
+        self.tokens = min(self.tokens, float(remaining))
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RequestScheduler:
+    def __init__(self, limits=None):
+        self.lock = threading.Lock()
+        self.buckets = {group: Bucket(*limit) for group, limit in (limits or LIMITS).items()}
+        self.sessions = {}
+
+    def group(self, url):
+        return GROUPS.get(urlsplit(url).hostname)
+
+    def session(self, url):
+        """The pooled keep-alive session for the url's host."""
+        host = urlsplit(url).netloc
+        session = self.sessions.get(host)
+        if session is None:
+            with self.lock:
+                session = self.sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self.sessions[host] = session
+        return session
+
+    def acquire(self, group, weight=1, lane=DATA):
+        """Blocks until the group's bucket grants the weight; returns the seconds waited."""
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            return 0.0
+        started, registered = time.monotonic(), False
+        try:
+            while True:
+                with self.lock:
+                    wait = bucket.reserve(weight, lane, time.monotonic())
+                    if not wait:
+                        return self.waited(lane, started, registered)
+                    if not registered:
+                        bucket.waiting[lane] += 1
+                        registered = True
+                time.sleep(min(wait, MAX_SLEEP))
+        finally:
+            if registered:
+                with self.lock:
+                    bucket.waiting[lane] -= 1
+
+    async def acquire_async(self, group, weight=1, lane=ORDERS):
+        """acquire() for coroutines; waits with asyncio.sleep instead of blocking the loop."""
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            return 0.0
+        started, registered = time.monotonic(), False
+        try:
+            while True:
+                with self.lock:
+                    wait = bucket.reserve(weight, lane, time.monotonic())
+                    if not wait:
+                        return self.waited(lane, started, registered)
+                    if not registered:
+                        bucket.waiting[lane] += 1
+                        registered = True
+                await asyncio.sleep(min(wait, MAX_SLEEP))
+        finally:
+            if registered:
+                with self.lock:
+                    bucket.waiting[lane] -= 1
+
+    def waited(self, lane, started, registered):
+        waited = time.monotonic() - started if registered else 0.0
+        if registered:
+            latency.observe_ms(f"throttle_{LANE_NAMES[lane]}", waited * 1000)
+        return waited
+
+    def request(self, method, url, weight=1, lane=DATA, group=None, **kwargs):
+        """A rate-limited call on the host's pooled session; returns the requests.Response."""
+        group = group or self.group(url)
+        self.acquire(group, weight, lane)
+        kwargs.setdefault("timeout", 30)
+        response = self.session(url).request(method, url, **kwargs)
+        self.observe(group, response)
+        return response
+
+    async def request_async(self, method, url, weight=1, lane=ORDERS, group=None, **kwargs):
+        """request() from a coroutine: waits for the bucket on the loop, sends on a worker thread."""
+        group = group or self.group(url)
+        await self.acquire_async(group, weight, lane)
+        kwargs.setdefault("timeout", 30)
+        response = await asyncio.to_thread(self.session(url).request, method, url, **kwargs)
+        self.observe(group, response)
+        return response
+
+    def observe(self, group, response):
+        """Follows the exchange's weight counters and backs the group off on 429 / 418."""
+        bucket = self.buckets.get(group)
+        if bucket is None:
+            return
+        headers = response.headers
+        used, remaining = headers.get("X-MBX-USED-WEIGHT-1M"), headers.get("X-RateLimit-Remaining")
+        with self.lock:
+            if used is not None:
+                bucket.sync(bucket.capacity - float(used))
+            elif remaining is not None:
+                bucket.sync(remaining)
+            if response.status_code in (418, 429):
+                wait = float(headers.get("Retry-After") or 1)
+                bucket.pause(wait)
+        if response.status_code in (418, 429):
+            log.warning("⚠️ %s rate limited (%s); pausing the group for %.0fs", group, response.status_code, wait)
+
+    def throttle(self, exchange, group, lane=ORDERS):
+        """Routes a ccxt async exchange's own throttle (cost = request weight) through the shared bucket."""
+        exchange.throttle = lambda cost=None: self.acquire_async(group, cost or 1, lane)
+        return exchange
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared():
+    """The process-wide scheduler."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = RequestScheduler()
+    return _shared
@@ -0,0 +1,204 @@
+import json, math
+from collections import deque
+from features import MEAN_PERIOD, RSI_PERIOD, ADX_WINDOW, MACD_FAST, MACD_SLOW, MACD_SIGNAL, SLOPE_LAGS, FEATURES
+
+# Feature definitions (periods, slope lags, column names) live in features.py, which
+# also builds them in bulk for training; FeatureTracker is the one-bar-at-a-time
+# version of the same columns.
+
+def export_model(model, feature_names, path, threshold=0.5):
+    """
+    Writes a fitted LogisticRegression as plain JSON (coefficients, intercept, feature order).
+    Call this from the training notebook; serving only needs the JSON, not sklearn.
+    """
+    unsupported = [name for name in feature_names if name not in FEATURES]
+    if unsupported:
+        raise ValueError(f"Features not available on the live path: {unsupported}")
+    with open(path, "w") as file:
+        json.dump({
+            "features": list(feature_names),
+            "coef": [float(c) for c in model.coef_[0]],
+            "intercept": float(model.intercept_[0]),
+            "threshold": threshold,
+        }, file, indent=2)
+
+
+class FeatureTracker:
+    """
+    Keeps the model's feature vector up to date one bar at a time.
+
+    Every feature is carried as running state (EMAs, Wilder averages, a 20-bar Welford
+    window, the last 15 closes), so an update is O(1). Like the live bar window,
+    replace_last() re-applies a kline update for the same minute on top of the state
+    saved before that bar. Values that are not defined yet are 0, matching the
+    notebook's fillna(0).
+    """
+
+    def __init__(self):
+        self.state = {
+            "count": 0, "close": 0.0, "high": 0.0, "low": 0.0, "volume": 0.0,
+            "ema_mean": 0.0, "ema_fast": 0.0, "ema_slow": 0.0, "ema_signal": 0.0,
+            "avg_gain": 0.0, "avg_loss": 0.0, "seed_gain": 0.0, "seed_loss": 0.0,
+            "trs": 0.0, "dip": 0.0, "din": 0.0, "dx_sum": 0.0, "adx": 0.0,
+            "window": (), "win_mean": 0.0, "win_m2": 0.0,
+            "closes": (),
+        }
+        self.previous = dict(self.state)
+
+    def append(self, bar):
+        self.previous = self.state
+        self.state = self._step(self.state, bar)
+
+    def replace_last(self, bar):
+        self.state = self._step(self.previous, bar)
+
+    def snapshot(self):
+        return {"state": self.state, "previous": self.previous}
+
+    def restore(self, snapshot):
+        """Loads snapshot() output, e.g. after a JSON round trip (lists back to tuples)."""
+        self.state, self.previous = (
+            {key: tuple(value) if isinstance(value, list) else value for key, value in snapshot[name].items()}
+            for name in ("state", "previous"))
+
+    def values(self):
+        """Current features as a {name: float} dict."""
+        s = self.state
+        count, close = s["count"], s["close"]
+        closes = s["closes"]
+        values = {
+            "volume": s["volume"],
+            "n_std": math.sqrt(max(s["win_m2"], 0.0) / MEAN_PERIOD) if len(s["window"]) == MEAN_PERIOD else 0.0,
+            "RSI": self._rsi(s) if count > RSI_PERIOD else 0.0,
+            "ADX": s["adx"] if count >= 2 * ADX_WINDOW else 0.0,
+            "MACD": (s["ema_fast"] - s["ema_slow"]) - s["ema_signal"] if count >= MACD_SLOW + MACD_SIGNAL - 1 else 0.0,
+            "diff": close - s["ema_mean"],
+        }
+        for name, lag in SLOPE_LAGS.items():
+            values[name] = closes[-1 - lag] - close if len(closes) > lag else 0.0
+        return values
+
+    def _rsi(self, s):
+        if s["avg_loss"] == 0:
+            return 100.0
+        return 100 - 100 / (1 + s["avg_gain"] / s["avg_loss"])
+
+    def _step(self, prev, bar):
+        s = dict(prev)
+        count = prev["count"] + 1
+        close, high, low = bar.close, bar.high, bar.low
+        s.update(count=count, close=close, high=high, low=low, volume=bar.volume)
+
+        # EMAs (pandas ewm adjust=False, seeded at the first close)
+        if count == 1:
+            s.update(ema_mean=close, ema_fast=close, ema_slow=close)
+        else:
+            s["ema_mean"] += 2 / (MEAN_PERIOD + 1) * (close - s["ema_mean"])
+            s["ema_fast"] += 2 / (MACD_FAST + 1) * (close - s["ema_fast"])
+            s["ema_slow"] += 2 / (MACD_SLOW + 1) * (close - s["ema_slow"])
+            if count == MACD_SLOW:
+                s["ema_signal"] = s["ema_fast"] - s["ema_slow"]
+            elif count > MACD_SLOW:
+                s["ema_signal"] += 2 / (MACD_SIGNAL + 1) * ((s["ema_fast"] - s["ema_slow"]) - s["ema_signal"])
+
+        # Last closes for slopes, and a 20-bar population std (Welford add/remove)
+        s["closes"] = (prev["closes"] + (close,))[-(max(SLOPE_LAGS.values()) + 1):]
+        window = prev["window"] + (close,)
+        mean, m2 = prev["win_mean"], prev["win_m2"]
+        n = len(window)
+        delta = close - mean
+        mean += delta / n
+        m2 += delta * (close - mean)
+        if n > MEAN_PERIOD:
+            old, window = window[0], window[1:]
+            n -= 1
+            delta = old - mean
+            mean -= delta / n
+            m2 -= delta * (old - mean)
+        s.update(window=window, win_mean=mean, win_m2=m2)
+
+        if count > 1:
+            self._step_rsi(s, prev, close - prev["close"], count)
+            self._step_adx(s, prev, bar, count)
+        return s
+
+    def _step_rsi(self, s, prev, delta, count):
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if count <= RSI_PERIOD + 1:
+            s["seed_gain"] += gain
+            s["seed_loss"] += loss
+            if count == RSI_PERIOD + 1:
+                s["avg_gain"] = s["seed_gain"] / RSI_PERIOD
+                s["avg_loss"] = s["seed_loss"] / RSI_PERIOD
+        else:
+            s["avg_gain"] = (prev["avg_gain"] * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+            s["avg_loss"] = (prev["avg_loss"] * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+
+    def _step_adx(self, s, prev, bar, count):
+        """ta.trend.ADXIndicator: Wilder sums of TR/+DM/-DM, then a Wilder average of DX."""
+        w = ADX_WINDOW
+        t = count - 1  # bar index
+        true_range = max(bar.high, prev["close"]) - min(bar.low, prev["close"])
+        up, down = bar.high - prev["high"], prev["low"] - bar.low
+        plus = up if up > down and up > 0 else 0.0
+        minus = down if down > up and down > 0 else 0.0
+
+        if t <= w:
+            s["trs"] += true_range
+            s["dip"] += plus
+            s["din"] += minus
+        else:
+            s["trs"] += true_range - s["trs"] / w
+            s["dip"] += plus - s["dip"] / w
+            s["din"] += minus - s["din"] / w
+        if t < w:
+            return
+
+        di_plus = 100 * s["dip"] / s["trs"] if s["trs"] else 0.0
+        di_minus = 100 * s["din"] / s["trs"] if s["trs"] else 0.0
+        dx = 100 * abs((di_plus - di_minus) / (di_plus + di_minus)) if di_plus + di_minus else 0.0
+        if t < 2 * w - 1:
+            s["dx_sum"] += dx
+        elif t == 2 * w - 1:
+            s["adx"] = (s["dx_sum"] + dx) / w
+        else:
+            s["adx"] = (s["adx"] * (w - 1) + dx) / w
+
+
+class SignalModel:
+    """
+    Serves an exported logistic-regression entry filter.
+
+    The model file is the JSON written by export_model: feature names, coefficients and
+    intercept. Scoring is a dot product and a sigmoid over the FeatureTracker values, so
+    no sklearn import is needed at runtime.
+    """
+
+    def __init__(self, path, threshold=None):
+        with open(path, "r") as file:
+            spec = json.load(file)
+
+        self.features = spec["features"]
+        unsupported = [name for name in self.features if name not in FEATURES]
+        if unsupported:
+            raise ValueError(f"Model {path} uses features the live path does not compute: {unsupported}")
+
+        self.coef = [float(c) for c in spec["coef"]]
+        self.intercept = float(spec["intercept"])
+        self.threshold = spec.get("threshold", 0.5) if threshold is None else threshold
+        self.tracker = FeatureTracker()
+
+    def probability(self):
+        """Model probability that entering now is a winning trade."""
+        values = self.tracker.values()
+        z = self.intercept
+        for name, coef in zip(self.features, self.coef):
+            z += coef * values[name]
+        if z < -500:
+            return 0.0
+        return 1 / (1 + math.exp(-z))
+
+    def accept(self):
+        """Returns (accepted, probability) for a candidate entry on the latest bar."""
+        probability = self.probability()
+        return probability > self.threshold, probability
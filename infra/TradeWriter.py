@@ -0,0 +1,171 @@
+import asyncio, json, sqlite3
+import latency, logs
+from concurrent.futures import ThreadPoolExecutor
+
+log = logs.get(__name__)
+
+TRADES_TABLE = """
+    CREATE TABLE IF NOT EXISTS trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        asset TEXT,
+        buy INTEGER,
+        sell INTEGER,
+        position INTEGER,
+        quantity REAL,
+        price REAL,
+        volume REAL,
+        mean REAL,
+        std REAL,
+        buy_line REAL,
+        sell_line REAL,
+        rsi REAL,
+        di_plus REAL,
+        di_minus REAL,
+        macd REAL
+    )
+"""
+
+INSERT_TRADE = """
+    INSERT INTO trades (timestamp, asset, buy, sell, position, quantity, price, volume, mean, std, buy_line, sell_line, rsi, di_plus, di_minus, macd)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+class TradeWriter:
+    """
+    Batched background writer for the trades table.
+
+    write() only enqueues the row, so it is safe to call from the websocket callback.
+    A writer task drains the queue every flush_interval seconds (or as soon as
+    batch_size rows are waiting, or immediately for urgent rows such as buys and
+    sells) and inserts the batch with one executemany + commit on a dedicated thread,
+    so fsyncs never run on the event loop.
+
+    A batch whose insert fails is kept and retried first on the next flush. After
+    max_retries failed attempts, or on close(), unsaved rows are appended to
+    fallback_path as JSON lines (one row per line, in INSERT_TRADE column order).
+    """
+
+    def __init__(self, db_path="btc_MR_trades.db", batch_size=500, flush_interval=1.0, max_queue=10000,
+                 max_retries=5, fallback_path=None):
+        self.db_path = db_path
+        self.fallback_path = fallback_path or db_path + ".unsaved.jsonl"
+        self.max_retries = max_retries
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.overflow = []  # urgent rows that arrived while the queue was full
+        self.retry = []  # the batch whose insert failed last time
+        self.failures = 0  # consecutive failed attempts for that batch
+        self.dropped = 0
+        self.rows_written = 0
+        self.rows_spilled = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trade-writer")
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._closing = False
+        self.conn = None
+
+    async def start(self):
+        """Opens the database on the writer thread and starts the flush loop."""
+        await self._run_on_writer(self._open)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def write(self, row, urgent=False):
+        """Queues one trades row. Urgent rows wake the writer right away and are never dropped."""
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            if urgent:
+                self.overflow.append(row)
+            else:
+                self.dropped += 1
+                return
+
+        if urgent or self.queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self):
+        """Writes everything queued so far; stops at the first failed batch, which is retried next time."""
+        async with self._lock:
+            while self.retry or self.overflow or not self.queue.empty():
+                if self.retry:
+                    rows, self.retry = self.retry, []
+                else:
+                    rows, self.overflow = self.overflow, []
+                    while len(rows) < self.batch_size and not self.queue.empty():
+                        rows.append(self.queue.get_nowait())
+                try:
+                    with latency.span("db_write"):
+                        await self._run_on_writer(self._insert, rows)
+                    self.rows_written += len(rows)
+                    self.failures = 0
+                except Exception as e:
+                    self.failures += 1
+                    if self.failures <= self.max_retries:
+                        log.error("Error saving trade data (%d rows kept, attempt %d of %d): %s",
+                                  len(rows), self.failures, self.max_retries + 1, e)
+                        self.retry = rows
+                    else:
+                        log.error("Error saving trade data, giving up on %d rows: %s", len(rows), e)
+                        self.failures = 0
+                        await self._spill(rows)
+                    return
+
+    async def close(self):
+        """Flushes pending rows, stops the writer task and closes the database."""
+        self._closing = True
+        self._wake.set()
+        if self._task:
+            await self._task
+        await self.flush()
+        unsaved, self.retry, self.overflow = self.retry + self.overflow, [], []
+        while not self.queue.empty():
+            unsaved.append(self.queue.get_nowait())
+        if unsaved:
+            await self._spill(unsaved)
+        if self.conn:
+            await self._run_on_writer(self.conn.close)
+            self.conn = None
+        self._executor.shutdown(wait=True)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def _spill(self, rows):
+        """Appends rows the database would not take to the fallback file."""
+        try:
+            await self._run_on_writer(self._append_fallback, rows)
+            self.rows_spilled += len(rows)
+            log.error("Wrote %d unsaved trade rows to %s", len(rows), self.fallback_path)
+        except Exception as e:
+            self.dropped += len(rows)
+            log.error("Error writing %d trade rows to %s: %s", len(rows), self.fallback_path, e)
+
+    def _run_on_writer(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: durable on checkpoint, no fsync per commit
+        self.conn.execute("PRAGMA journal_size_limit=67108864")
+        self.conn.execute(TRADES_TABLE)
+        self.conn.commit()
+
+    def _insert(self, rows):
+        with self.conn:  # one transaction per batch
+            self.conn.executemany(INSERT_TRADE, rows)
+
+    def _append_fallback(self, rows):
+        with open(self.fallback_path, "a", encoding="utf-8") as file:
+            for row in rows:
+                file.write(json.dumps(list(row), default=str) + "\n")
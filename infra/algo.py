@@ -1,7 +1,7 @@
-import comms, indicators, BinanceUSWebsocketClient, BinanceUSPrimer, BinanceUSTrader
-import collections, yaml, sqlite3, asyncio, ctypes, traceback
-from datetime import datetime, timedelta
-import numpy as np
+import comms, BinanceUSWebsocketClient, BinanceUSPrimer, BinanceUSTrader, IndicatorEngine, BarStore, BarAggregator, TradeWriter, strategy, SignalModel, QuoteCache, latency, logs
+import yaml, asyncio, ctypes, time, json, os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 
 # Signal condition:
 # DI+ over 50 and RSI over 50
@@ -9,31 +9,64 @@ import numpy as np
 
 #KEPT BUYING
 
+log = logs.get(__name__)
 
-class TradingBot:
-    def __init__(self):
-        #main deque
-        self.price_deque = collections.deque()  # Store (timestamp, price, volume) tuples
+snapshot_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")  # one file write at a time, in order, off the event loop
 
-        #alpacatrader
-        self.trader = BinanceUSTrader.BinanceUSTrader()
-        self.data_primer = BinanceUSPrimer.BinanceUSPrimer(self)
-        self.data_stream = BinanceUSWebsocketClient.BinanceUSWebsocketClient(self)
 
-        with open("infra/config.yaml", "r") as file:
-            config = yaml.safe_load(file)
+class TradingBot:
+    def __init__(self, asset=None, trader=None, writer=None, config=None, clock=None, quotes=None, data_stream=None):
+        """
+        trader, writer, quotes and data_stream are shared when the bot runs under MultiSymbolBot;
+        left out, the bot builds its own (the stream in start(), so bots driven directly never open one).
+        """
+        if config is None:
+            with open("infra/config.yaml", "r") as file:
+                config = yaml.safe_load(file)
 
         # Extract config
-        self.asset = config["trading_config"]["asset"]
+        self.asset = asset or config["trading_config"]["asset"]
+        self.symbol = self.asset.replace("/", "")  # exchange symbol, e.g. BTCUSDC
         self.usdc_amt = config["trading_config"]["usdc_amt"]
         self.bollinger_std_width = config["trading_config"]["bollinger_std_width"]
         self.sell_std = config["trading_config"]["sell_std"]
         self.loss_threshold = config["trading_config"]["loss_threshold"]
+        self.sell_retry = config["trading_config"].get("sell_retry", 5)  # seconds before retrying a failed sell; doubles per failure
+        self.sell_attempts = config["trading_config"].get("sell_attempts", 6)  # failed sells in a row before exits pause
+
+        # optional logistic-regression entry filter (JSON exported by SignalModel.export_model)
+        model_path = config["trading_config"].get("ml_model")
+        self.signal_model = SignalModel.SignalModel(model_path, config["trading_config"].get("ml_threshold")) if model_path else None
+
+        #main bar window: the last 60 bars. "1m" bars are the exchange kline stream; shorter time bars
+        #("5s") and volume/tick bars ("100v", "500t") are built from the trade stream by BarAggregator
+        self.bar_interval = config["trading_config"].get("bar_interval") or "1m"
+        self.kline_bars = self.bar_interval == "1m"
+        bar_ms = BarAggregator.interval_ms(self.bar_interval)
+        self.window_ms = 60 * bar_ms if bar_ms else None  # volume/tick bars have no fixed duration; the store keeps 60
+        self.bars = BarStore.BarStore(self.symbol, capacity=256 if bar_ms else 60)
+        self.indicator_engine = IndicatorEngine.IndicatorEngine()  # O(1) indicators over self.bars
+        self.snapshot_path = f"bot_state_{self.symbol}.json"  # bar window, indicator state and position, for warm restarts; None = off
+        self.snapshot_pending = None  # latest snapshot handed to snapshot_writer
+        self.clock = clock or time.time  # wall-clock seconds; replay.py injects the recorded stream's time
+        self.status_limit = logs.RateLimit((config.get("logging") or {}).get("status_interval", 10))  # per-tick status line
+
+        #trader and data feeds
+        if quotes is None and trader is None:
+            quotes = QuoteCache.QuoteCache(config["trading_config"].get("quote_max_age", 5))  # bookTicker top of book for order sizing
+        self.quotes = quotes
+        self.trader = trader or BinanceUSTrader.BinanceUSTrader(quotes=self.quotes)
+        self.writer = writer
+        self.data_stream = data_stream
 
         self.active_position = False  # Whether a position is currently open
         self.trading_enabled = False
         self.buy_price = 0.0
-        self.cache_timestamp = ''
+        self.order_task = None  # order currently in flight; market data keeps flowing meanwhile
+        self.order_started = 0  # latency.start() reading when the order was signalled
+        self.sell_failures = 0  # failed sells in a row for the open position
+        self.sell_retry_at = 0.0  # clock() time before which the exit rules do not sell again
+        self.cache_ts = None  # epoch ms of the current bar; formatted only when printed or saved
         self.cache_price = 0.0
         self.cache_volume = 0.0
         self.cache_mean = 0.0
@@ -47,58 +80,130 @@ class TradingBot:
         self.start_time = datetime.now()
 
     async def start(self):
-        self.start_database()
+        await self.start_database()
+        await self.trader.start()  # account stream; sells size from it instead of fetch_balance
         self.prevent_sleep()
-        self.data_primer.start()
-        await self.data_stream.start()  # probably runs sync code that feeds into on_new_data()
+        await self.warm_start()
+        if self.data_stream is None:
+            self.data_stream = BinanceUSWebsocketClient.BinanceUSWebsocketClient(self, symbol=self.symbol, bar_interval=None if self.kline_bars else self.bar_interval,
+                                                                                 quotes=self.quotes)
+        try:
+            await self.data_stream.start()  # probably runs sync code that feeds into on_new_data()
+        finally:
+            if self.order_task:
+                await self.order_task
+            await self.flush_snapshot()
+            await self.trader.close()
+            await self.writer.close()  # flush queued rows on shutdown
+
+    async def warm_start(self):
+        """
+        Restores the last snapshot and fetches only the bars since then; falls back to a full prime.
+        The REST calls run on a worker thread; the bars are applied back on the event loop.
+        """
+        restored = self.load_snapshot()
+        if not self.kline_bars:
+            log.info("%s bars are built from live trades; the window fills from the stream", self.bar_interval)  # REST klines are 1m
+            return
+        primer = BinanceUSPrimer.BinanceUSPrimer(symbol=self.symbol)
+        bars = await asyncio.to_thread(primer.fetch, self.bars.last_timestamp if restored else None)
+        self.data_prime(bars)
 
-    def data_prime(self, data_point):
-        self.update_deque(data_point)
+    def data_prime(self, bars):
+        """Loads a batch of historical bars; indicators are computed once, after the last bar."""
+        try:
+            for bar in bars:
+                self.push_bar(bar)
+            if self.bars:
+                self.refresh_indicators(self.bars.bar())
+                log.info("Primed %s with %d bars, Price: %s, Buy Line: %s, Sell Line: %s", self.symbol, len(bars),
+                         self.cache_price, self.cache_buy_line, self.cache_sell_line, extra={"symbol": self.symbol})
+        except Exception:
+            log.exception("Priming %s failed", self.symbol)
 
     def on_new_data(self, data_point):
         ''' Handles incoming new data. If in a trade, check exit conditions. If not in a trade, update the deque and check entry conditions. '''
-        self.update_deque(data_point)
+        with latency.span("tick"):
+            self.update_deque(data_point)
 
-        if not self.active_position:
-            self.check_entry_conditions()
-        else:
-            self.check_exit_conditions()
+            if self.order_task and not self.order_task.done():
+                return  # wait for the ack before acting on this symbol again
+
+            with latency.span("signal"):
+                if not self.active_position:
+                    self.check_entry_conditions()
+                else:
+                    self.check_exit_conditions()
 
     def update_deque(self, data_point):
         try:
-            """Removes old data points (older than 60 minutes) and adds the new one."""
-            cutoff_time = datetime.now() - timedelta(minutes=60)
-            while self.price_deque and self.price_deque[0]["timestamp"] < cutoff_time:
-                self.price_deque.popleft()  # Remove outdated entries
-
-            # Replace the last entry if it's from the same minute
-            if self.price_deque and self.price_deque[-1]["timestamp"] == data_point["timestamp"]:
-                self.price_deque[-1] = data_point
-            else:
-                self.price_deque.append(data_point)
-
-            self.cache_timestamp = self.price_deque[-1]["timestamp"].isoformat()
-            self.cache_price = self.price_deque[-1]["close"]
-            self.cache_volume = self.price_deque[-1]["volume"]
-            self.cache_mean, self.std, self.cache_buy_line, self.cache_sell_line, self.cache_rsi, self.cache_di_plus, self.cache_di_minus, self.cache_macd = self.get_indicators()
-            self.price_deque[-1]["buy_line"] = self.cache_buy_line
-            self.price_deque[-1]["sell_line"] = self.cache_sell_line
-
-            self.save_trade_data(0, 0, 0.0)
-
-            print(f"Time: {self.price_deque[-1]['timestamp']}, Position: {self.active_position}, Price: {self.price_deque[-1]['close']}, Buy Line: {self.price_deque[-1]['buy_line']}, Sell Line: {self.price_deque[-1]['sell_line']}")
-
-        except Exception as e:
-            print(traceback.format_exc())
+            """Removes old bars (older than 60 minutes) and adds the new one."""
+            with latency.span("bar_update"):
+                replaced = self.push_bar(data_point)
+            if not replaced:
+                self.save_snapshot()  # the previous bar just closed
+
+            with latency.span("indicators"):
+                self.refresh_indicators(data_point)
+            with latency.span("db_enqueue"):
+                self.save_trade_data(0, 0, 0.0)
+
+            if self.status_limit.ready():
+                log.info("Time: %s, Position: %s, Price: %s, Buy Line: %s, Sell Line: %s", self.cache_timestamp, self.active_position,
+                         self.cache_price, self.cache_buy_line, self.cache_sell_line, extra={"symbol": self.symbol})
+
+        except Exception:
+            log.exception("Bar update for %s failed", self.symbol)
+
+    def push_bar(self, data_point):
+        """Adds a bar to the window (bar store, indicator engine, ML features). Returns True if it replaced the last bar."""
+        if self.window_ms:
+            cutoff_ms = int(self.clock() * 1000) - self.window_ms
+            for _ in range(self.bars.evict_before(cutoff_ms)):  # Remove outdated entries
+                self.indicator_engine.popleft()
+
+        # Replace the last entry if it's from the same minute
+        if self.bars and self.bars.last_timestamp == data_point.timestamp:
+            self.bars.replace_last(data_point)
+            self.indicator_engine.replace_last(data_point.close)
+            if self.signal_model:
+                self.signal_model.tracker.replace_last(data_point)
+            return True
+
+        if self.bars.full:
+            self.bars.popleft()
+            self.indicator_engine.popleft()
+        self.bars.append(data_point)
+        self.indicator_engine.append(data_point.close)
+        if self.signal_model:
+            self.signal_model.tracker.append(data_point)
+        return False
+
+    @property
+    def cache_timestamp(self):
+        return datetime.fromtimestamp(self.cache_ts / 1000).isoformat() if self.cache_ts is not None else ''
+
+    def refresh_indicators(self, data_point):
+        """Updates the cached price and indicator values from the current window."""
+        self.cache_ts = data_point.timestamp
+        self.cache_price = data_point.close
+        self.cache_volume = data_point.volume
+        self.cache_mean, self.std, self.cache_buy_line, self.cache_sell_line, self.cache_rsi, self.cache_di_plus, self.cache_di_minus, self.cache_macd = self.get_indicators()
+        self.bars.set_last("buy_line", self.cache_buy_line)
+        self.bars.set_last("sell_line", self.cache_sell_line)
 
 
     #check conditions
 
     def check_entry_conditions(self):
         '''checks buy conditions and if all met, calls trade execute function'''
-        mean, std, buy_line, sell_line, rsi, di_plus, di_minus, macd = self.get_indicators()
-
-        if (self.cache_price < self.cache_buy_line):
+        if strategy.entry_signal(self.cache_price, self.cache_buy_line):
+            if self.signal_model:
+                accepted, probability = self.signal_model.accept()
+                if not accepted:
+                    log.info("ML filter rejected entry at %s (p=%.3f <= %s)", self.cache_price, probability, self.signal_model.threshold,
+                             extra={"symbol": self.symbol})
+                    return
             self.execute_buy_order()
             self.active_position = True
             self.cache_price = self.cache_price
@@ -106,92 +211,177 @@ class TradingBot:
 
     def check_exit_conditions(self):
         '''when active_position is true, checks if sell conditions are met. if so, calls sell_order function'''
-        mean, std, buy_line, sell_line, rsi, di_plus, di_minus, macd = self.get_indicators()
-
-        if (self.cache_price > self.cache_sell_line): #hold condition no longer met
+        if self.clock() < self.sell_retry_at:
+            return  # the last sell failed; backing off
+        if strategy.take_profit(self.cache_price, self.cache_sell_line): #hold condition no longer met
             self.execute_sell_order()
             self.active_position = False
-        elif self.cache_price < self.loss_threshold * self.buy_price: # drops more than x%
+        elif strategy.stop_loss(self.cache_price, self.buy_price, self.loss_threshold): # drops more than x%
             self.execute_sell_order()
             self.active_position = False
 
     #alpaca connectivity
 
     def execute_buy_order(self):
-        '''connects to alpaca api to execute buy order'''
-        self.trader.place_buy_order(self.asset)
-        self.save_trade_data(1, 0, -1)
+        '''schedules the buy order on the event loop so the data stream is not blocked while it is in flight'''
+        self.buy_price = self.cache_price
+        self.order_started = latency.start()
+        self.order_task = asyncio.get_running_loop().create_task(self.buy_order())
 
     def execute_sell_order(self):
-        '''connects to alpaca api to execute sell order'''
-        self.trader.place_sell_order(self.asset)
-        self.save_trade_data(0, 1, -1)
+        '''schedules the sell order on the event loop so the data stream is not blocked while it is in flight'''
+        self.order_started = latency.start()
+        self.order_task = asyncio.get_running_loop().create_task(self.sell_order())
+
+    async def buy_order(self):
+        ack = await self.trader.place_buy_order(self.asset, self.usdc_amt)
+        self.record_order_latency(ack)
+        if ack.ok:
+            self.buy_price = ack.price or self.buy_price
+        else:
+            self.active_position = False  # nothing was bought
+        log.info("Buy ack: ok=%s qty=%s price=%s timings=%s", ack.ok, ack.qty, ack.price, ack.timings, extra={"symbol": self.symbol, "order_id": ack.order_id})
+        self.save_trade_data(1, 0, ack.qty if ack.ok else -1)
+        self.save_snapshot()
+
+    async def sell_order(self):
+        ack = await self.trader.place_sell_order(self.asset)
+        self.record_order_latency(ack)
+        if ack.ok or ack.flat:
+            self.sell_failures = 0
+            self.sell_retry_at = 0.0
+            if ack.flat:
+                log.warning("Nothing sellable left for %s (%s); position closed", self.asset, ack.error, extra={"symbol": self.symbol})
+        else:
+            self.active_position = True  # still holding
+            self.sell_failures += 1
+            if self.sell_failures >= self.sell_attempts:
+                self.sell_retry_at = float("inf")
+                reason = f"{self.sell_failures} sells failed in a row; exits paused until restart, position left open"
+                log.error("%s: %s", self.asset, reason, extra={"symbol": self.symbol})
+                comms.sell_order_fail(self.asset, reason)
+            else:
+                delay = self.sell_retry * 2 ** (self.sell_failures - 1)
+                self.sell_retry_at = self.clock() + delay
+                log.warning("Sell %d/%d for %s failed; retrying in %.0f s", self.sell_failures, self.sell_attempts, self.asset, delay,
+                            extra={"symbol": self.symbol})
+        log.info("Sell ack: ok=%s qty=%s price=%s timings=%s", ack.ok, ack.qty, ack.price, ack.timings, extra={"symbol": self.symbol, "order_id": ack.order_id})
+        self.save_trade_data(0, 1, ack.qty if ack.ok else -1)
+        self.save_snapshot()
+
+    def record_order_latency(self, ack):
+        """Signal -> ack as seen by the bot, plus the trader's own per-stage timings."""
+        latency.stop("signal_to_ack", self.order_started)
+        for stage, ms in ack.timings.items():
+            latency.observe_ms(f"order_{stage.removesuffix('_ms')}", ms)
 
     # retrieve indicators
 
     def get_indicators(self):
-        prices = np.array([entry["close"] for entry in self.price_deque])  # Extract price values
-        mean = np.mean(prices)
-        std = np.std(prices, ddof=1)
-
-        buy_line = mean - std * self.bollinger_std_width
-        sell_line = mean + std * self.sell_std
+        '''reads the current window's indicators from the streaming engine (kept in sync by update_deque)'''
+        engine = self.indicator_engine
+        mean = engine.mean()
+        std = engine.std()
 
-        period = 14
+        buy_line, sell_line = strategy.bands(mean, std, self.bollinger_std_width, self.sell_std)
 
-        rsi = indicators.rsi(prices, period)
-        di_plus = indicators.di_plus(prices)
-        di_minus = indicators.di_minus(prices)
-        macd = indicators.macd(prices, period)
+        rsi = engine.rsi()
+        di_plus = engine.di_plus()
+        di_minus = engine.di_minus()
+        macd = engine.macd()
 
         return mean, std, buy_line, sell_line, rsi, di_plus, di_minus, macd
     
     #data storage
-    def start_database(self):
-        self.conn = sqlite3.connect("btc_MR_trades.db")  # Connect to the database
-        self.cursor = self.conn.cursor()
-
-        # Create table if it doesn't exist
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                asset TEXT,
-                buy INTEGER,
-                sell INTEGER,
-                position INTEGER,
-                quantity REAL,
-                price REAL,
-                volume REAL,
-                mean REAL,
-                std REAL,
-                buy_line REAL,
-                sell_line REAL,
-                rsi REAL,
-                di_plus REAL,
-                di_minus REAL,
-                macd REAL
-            )
-        """)
-
-        self.conn.commit()
+    async def start_database(self):
+        if self.writer is None:
+            self.writer = TradeWriter.TradeWriter("btc_MR_trades.db")
+            await self.writer.start()
 
     def save_trade_data(self, buy, sell, quantity):
-        """Saves the latest trade data into the SQLite database."""
-        if not self.price_deque:
-            print("No trade data available to save.")
+        """Queues the latest trade data for the background SQLite writer. Buy/sell rows are flushed immediately."""
+        if not self.bars:
+            log.warning("No trade data available to save.")
             return
 
+        self.writer.write((self.cache_timestamp, self.asset, buy, sell, self.active_position, quantity, self.cache_price, self.cache_volume, self.cache_mean, self.std, self.cache_buy_line, self.cache_sell_line, self.cache_rsi, self.cache_di_plus, self.cache_di_minus, self.cache_macd),
+                          urgent=bool(buy or sell))
+
+    #warm restarts
+
+    def save_snapshot(self):
+        """
+        Captures the bar window, indicator state and position and queues the file write on
+        snapshot_writer, so JSON encoding and disk I/O stay off the event loop. Returns the
+        write's Future (None when there is nothing to save).
+        """
+        if not self.bars or not self.snapshot_path:
+            return None
+        snapshot = {
+            "symbol": self.symbol,
+            "bar_interval": self.bar_interval,
+            "saved_at": int(self.clock() * 1000),
+            "active_position": self.active_position,
+            "buy_price": self.buy_price,
+            "bars": [list(self.bars.bar(i)[1:]) for i in range(len(self.bars))],
+            "indicator_engine": self.indicator_engine.snapshot(),
+            "features": self.signal_model.tracker.snapshot() if self.signal_model else None,
+        }
+        self.snapshot_pending = snapshot
+        return snapshot_writer.submit(self.write_snapshot, snapshot, self.snapshot_path)
+
+    def write_snapshot(self, snapshot, path):
+        """Runs on snapshot_writer: atomic replace of the file. A snapshot already superseded by a newer one is skipped."""
+        if snapshot is not self.snapshot_pending:
+            return  # the newer one is queued behind this write
         try:
-            self.cursor.execute("""
-                INSERT INTO trades (timestamp, asset, buy, sell, position, quantity, price, volume, mean, std, buy_line, sell_line, rsi, di_plus, di_minus, macd)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.cache_timestamp, self.asset, buy, sell, self.active_position, quantity, self.cache_price, self.cache_volume, self.cache_mean, self.std, self.cache_buy_line, self.cache_sell_line, self.cache_rsi, self.cache_di_plus, self.cache_di_minus, self.cache_macd))
-
-            self.conn.commit()
-
-        except Exception as e:
-            print(f"Error saving trade data: {e}")
+            with open(path + ".tmp", "w") as file:
+                json.dump(snapshot, file)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            log.warning("⚠️ Could not save snapshot %s: %s", path, e)
+
+    async def flush_snapshot(self):
+        """Saves a final snapshot and waits until it is on disk (shutdown)."""
+        future = self.save_snapshot()
+        if future:
+            await asyncio.wrap_future(future)
+
+    def load_snapshot(self):
+        """
+        Restores the position from snapshot_path, and the bar window and indicator state if the
+        last bar is still inside the window. Returns True when the window was restored.
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "r") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError) as e:
+            log.warning("⚠️ Ignoring unreadable snapshot %s: %s", self.snapshot_path, e)
+            return False
+        if snapshot.get("symbol") != self.symbol:
+            return False
+
+        self.active_position = snapshot["active_position"]
+        self.buy_price = snapshot["buy_price"]
+        if snapshot.get("bar_interval", "1m") != self.bar_interval:
+            return False  # window was built from a different bar type
+        bars = [BarStore.Bar(self.symbol, *bar) for bar in snapshot["bars"]]
+        if not bars or (self.window_ms and bars[-1].timestamp < int(self.clock() * 1000) - self.window_ms):
+            log.info("♻️ Restored %s position (active=%s); bar window too old, priming fresh", self.symbol, self.active_position)
+            return False
+        if self.signal_model and not snapshot.get("features"):
+            return False  # no feature state to resume from; a full prime rebuilds it
+
+        self.bars.clear()
+        for bar in bars:
+            self.bars.append(bar)
+        self.indicator_engine.restore(snapshot["indicator_engine"])
+        if self.signal_model:
+            self.signal_model.tracker.restore(snapshot["features"])
+        log.info("♻️ Restored %s from %s: %d bars, active=%s, buy_price=%s", self.symbol, self.snapshot_path, len(bars), self.active_position, self.buy_price)
+        return True
 
     def prevent_sleep(self):
         """Prevent the system from sleeping while the bot is running (Windows)."""
@@ -199,8 +389,80 @@ class TradingBot:
         ES_SYSTEM_REQUIRED = 0x00000001
         ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS | ES_SYSTEM_REQUIRED)
 
-async def main():
-    bot = TradingBot()
-    await bot.start()
 
-asyncio.run(main())
+class MultiSymbolBot:
+    """
+    Runs one TradingBot per symbol in a single process.
+
+    All symbols share one combined-stream websocket, one trader (one HTTP session) and
+    one TradeWriter; each kline is routed to its symbol's bot by a dict lookup, and
+    every bot keeps its own BarStore and IndicatorEngine.
+    """
+
+    def __init__(self, assets, config=None):
+        if config is None:
+            with open("infra/config.yaml", "r") as file:
+                config = yaml.safe_load(file)
+
+        self.quotes = QuoteCache.QuoteCache(config["trading_config"].get("quote_max_age", 5))
+        self.trader = BinanceUSTrader.BinanceUSTrader(quotes=self.quotes)
+        self.writer = TradeWriter.TradeWriter("btc_MR_trades.db")
+        bar_interval = config["trading_config"].get("bar_interval") or "1m"
+        self.data_stream = BinanceUSWebsocketClient.BinanceUSWebsocketClient(self, symbols=[asset.replace("/", "") for asset in assets],
+                                                                             bar_interval=None if bar_interval == "1m" else bar_interval, quotes=self.quotes)
+        self.bots = {}
+        for asset in assets:
+            bot = TradingBot(asset, trader=self.trader, writer=self.writer, config=config, quotes=self.quotes, data_stream=self.data_stream)
+            self.bots[bot.symbol] = bot
+
+    async def start(self):
+        await self.writer.start()
+        await self.trader.start()
+        next(iter(self.bots.values())).prevent_sleep()
+        await asyncio.gather(*(bot.warm_start() for bot in self.bots.values()))  # REST on worker threads, shared rate limit
+        try:
+            await self.data_stream.start()
+        finally:
+            pending = [bot.order_task for bot in self.bots.values() if bot.order_task]
+            if pending:
+                await asyncio.gather(*pending)
+            await asyncio.gather(*(bot.flush_snapshot() for bot in self.bots.values()))
+            await self.trader.close()
+            await self.writer.close()
+
+    def data_prime(self, bars):
+        """Routes a batch of one symbol's historical (backfilled) bars to its bot."""
+        bot = self.bots.get(bars[0].symbol) if bars else None
+        if bot:
+            bot.data_prime(bars)
+
+    def on_new_data(self, data_point):
+        """Routes a bar to the bot trading its symbol."""
+        bot = self.bots.get(data_point.symbol)
+        if bot:
+            bot.on_new_data(data_point)
+
+async def main():
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+
+    logs.setup(config.get("logging"))
+    exporter = latency.configure(config.get("latency"))
+    symbols = config["trading_config"].get("symbols")
+    if symbols and config["trading_config"].get("shards"):
+        import shards  # imports this module for TradingBot
+        bot = shards.ShardedRuntime(symbols, config)
+    elif symbols:
+        bot = MultiSymbolBot(symbols, config)
+    else:
+        bot = TradingBot(config=config)
+    if exporter:
+        await exporter.start()
+    try:
+        await bot.start()
+    finally:
+        if exporter:
+            await exporter.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
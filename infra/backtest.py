@@ -0,0 +1,203 @@
+"""
+Event-driven backtester for the live mean-reversion rules.
+
+Bars come from the trades tables in data_collection/*.db, from OHLCV CSVs (as in
+mr_model/hist_data) or from a BarArchive directory (--asset picks the symbol).
+Indicators are computed once as vectorized passes over the whole history; the position
+loop then jumps from signal to signal with searchsorted instead of stepping bar by bar,
+so a year of 1-minute bars runs in well under a second.
+
+Run from the repo root:
+    python infra/backtest.py data_collection/btc_MR_trades.db --std 2 --sell-std -0.35 --loss 0.98
+"""
+import argparse, collections, os, sqlite3, time
+import numpy as np
+import indicators, strategy
+
+Result = collections.namedtuple("Result", ["growth", "trades", "equity", "max_drawdown", "timestamps"])
+
+TRADE_DTYPE = np.dtype([
+    ("entry_index", np.int64), ("exit_index", np.int64),
+    ("entry_time", np.int64), ("exit_time", np.int64),
+    ("entry_price", np.float64), ("exit_price", np.float64),
+    ("ratio", np.float64), ("reason", "U11"),
+])
+
+# data loading
+
+def load_db(path, asset=None, interval_ms=60_000):
+    """
+    Loads bars from a trades table. Tables written by the bot hold repeated kline snapshots
+    (minute-aligned timestamps, cumulative volume); the older tables hold raw trades.
+    Both are reduced to one OHLCV bar per interval.
+
+    Rows are stably sorted by timestamp first: a restarted bot re-inserts the bars it primed
+    from REST, so the table is not in time order. Within a bar the latest row (the complete
+    kline once re-primed) gives the close and volume.
+    """
+    conn = sqlite3.connect(path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(trades)")]
+    query = "SELECT timestamp, price, volume FROM trades"
+    params = ()
+    if asset and "asset" in columns:
+        query += " WHERE asset = ?"
+        params = (asset,)
+    rows = conn.execute(query + " ORDER BY rowid", params).fetchall()
+    conn.close()
+
+    timestamps, prices, volumes = zip(*rows) if rows else ((), (), ())
+    timestamps = np.array(timestamps, dtype="datetime64[ms]").astype(np.int64)
+    prices = np.array(prices, dtype=np.float64)
+    volumes = np.nan_to_num(np.array(volumes, dtype=np.float64))
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, prices, volumes = timestamps[order], prices[order], volumes[order]
+    klines = bool(len(timestamps)) and not np.any(timestamps % interval_ms)
+    return aggregate(timestamps, prices, volumes, interval_ms, cumulative_volume=klines)
+
+def load_csv(path):
+    """Loads an OHLCV CSV with timestamp, open, high, low, close, volume columns."""
+    import pandas as pd  # research-only dependency
+
+    frame = pd.read_csv(path)
+    frame.columns = [c.lower() for c in frame.columns]
+    timestamps = pd.to_datetime(frame["timestamp"], utc=True).dt.tz_localize(None).to_numpy().astype("datetime64[ms]").astype(np.int64)
+    bars = {"timestamp": timestamps}
+    for name in ("open", "high", "low", "close", "volume"):
+        bars[name] = frame[name].to_numpy(dtype=np.float64)
+    return bars
+
+def load_archive(path, symbol):
+    """Loads every bar of a symbol from a BarArchive root (memmapped, no parsing)."""
+    import BarArchive
+
+    archive = BarArchive.BarArchive(path)
+    if symbol is None and len(archive.symbols()) == 1:
+        symbol = archive.symbols()[0]
+    if symbol not in archive.symbols():
+        raise ValueError(f"{path} holds {archive.symbols()}; pick one with asset=")
+    return archive.read(symbol)
+
+def load(path, asset=None):
+    if os.path.isdir(path):
+        return load_archive(path, asset)
+    return load_csv(path) if path.lower().endswith(".csv") else load_db(path, asset)
+
+def aggregate(timestamps, prices, volumes, interval_ms=60_000, cumulative_volume=False):
+    """Reduces price updates to OHLCV bars (vectorized, input must be in time order)."""
+    buckets = timestamps // interval_ms * interval_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]]) if len(buckets) else np.array([], dtype=np.int64)
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    if not len(starts):
+        return {name: np.array([]) for name in ("timestamp", "open", "high", "low", "close", "volume")}
+    return {
+        "timestamp": buckets[starts],
+        "open": prices[starts],
+        "high": np.maximum.reduceat(prices, starts),
+        "low": np.minimum.reduceat(prices, starts),
+        "close": prices[ends],
+        "volume": volumes[ends] if cumulative_volume else np.add.reduceat(volumes, starts),
+    }
+
+# simulation
+
+def run(bars, bollinger_std_width=2, sell_std=-0.35, loss_threshold=0.98, window=60, fee=0.0, slippage=0.0, bands=None):
+    """
+    Replays bars through strategy.entry_signal / take_profit / stop_loss.
+
+    :param bars: dict of arrays with at least timestamp and close.
+    :param window: bars in the rolling mean/std window (the live bot keeps 60 one-minute bars).
+    :param fee: fraction charged on each side of a trade.
+    :param slippage: fraction the fill is worse than the bar close on each side.
+    :param bands: optional precomputed (mean, std) arrays, e.g. shared across a parameter sweep.
+    :return: Result(growth, trades, equity, max_drawdown, timestamps)
+    """
+    close = np.asarray(bars["close"], dtype=np.float64)
+    n = close.size
+    mean, std = bands if bands is not None else indicators.rolling_mean_std(close, window)
+    buy_line, sell_line = strategy.bands(mean, std, bollinger_std_width, sell_std)
+
+    with np.errstate(invalid="ignore"):
+        entries = np.flatnonzero(strategy.entry_signal(close, buy_line))
+        profits = np.flatnonzero(strategy.take_profit(close, sell_line))
+
+    trades = []
+    position = 0
+    while True:
+        k = np.searchsorted(entries, position)
+        if k == len(entries):
+            break
+        entry = entries[k]
+        buy_price = close[entry]
+
+        t = np.searchsorted(profits, entry + 1)
+        target = profits[t] if t < len(profits) else n
+        stops = np.flatnonzero(strategy.stop_loss(close[entry + 1:target], buy_price, loss_threshold))
+        if stops.size:
+            exit_index, reason = entry + 1 + stops[0], "stop_loss"
+        elif target < n:
+            exit_index, reason = target, "take_profit"
+        else:
+            exit_index, reason = n - 1, "open"  # marked to the last bar
+
+        trades.append((entry, exit_index, reason))
+        position = exit_index + 1
+
+    return _settle(bars, close, trades, fee, slippage)
+
+def _settle(bars, close, trades, fee, slippage):
+    n = close.size
+    timestamps = np.asarray(bars["timestamp"], dtype=np.int64)
+    records = np.zeros(len(trades), dtype=TRADE_DTYPE)
+    if trades:
+        entry, exit_index, reason = (np.array(column) for column in zip(*trades))
+        entry_price = close[entry] * (1 + slippage)
+        exit_price = close[exit_index] * (1 - slippage)
+        records["entry_index"], records["exit_index"] = entry, exit_index
+        records["entry_time"], records["exit_time"] = timestamps[entry], timestamps[exit_index]
+        records["entry_price"], records["exit_price"] = entry_price, exit_price
+        records["ratio"] = exit_price * (1 - fee) / (entry_price * (1 + fee))
+        records["reason"] = reason
+
+    # mark-to-market equity: hold from the bar after each entry through its exit bar
+    log_returns = np.zeros(n)
+    if n > 1 and trades:
+        held = np.zeros(n + 1)
+        np.add.at(held, records["entry_index"] + 1, 1)
+        np.add.at(held, records["exit_index"] + 1, -1)
+        held = np.cumsum(held[:n]) > 0
+        log_returns[1:] = np.where(held[1:], np.log(close[1:] / close[:-1]), 0.0)
+        np.add.at(log_returns, records["entry_index"], np.log(close[records["entry_index"]] / (records["entry_price"] * (1 + fee))))
+        np.add.at(log_returns, records["exit_index"], np.log(records["exit_price"] * (1 - fee) / close[records["exit_index"]]))
+    equity = np.exp(np.cumsum(log_returns))
+    max_drawdown = float(np.max(1 - equity / np.maximum.accumulate(equity))) if n else 0.0
+
+    growth = float(np.prod(records["ratio"])) if len(records) else 1.0
+    return Result(growth, records, equity, max_drawdown, timestamps)
+
+def report(result):
+    trades = result.trades
+    wins = int(np.sum(trades["ratio"] > 1))
+    print(f"Total growth: {(result.growth - 1) * 100:.3f}% over {len(result.equity)} bars")
+    print(f"Trades: {len(trades)} ({wins} winners, {len(trades) - wins} losers)")
+    if len(trades):
+        print(f"Mean trade: {(np.mean(trades['ratio']) - 1) * 100:.4f}%  |  Stops: {int(np.sum(trades['reason'] == 'stop_loss'))}")
+    print(f"Max drawdown: {result.max_drawdown * 100:.3f}%")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the mean-reversion rules over recorded bars.")
+    parser.add_argument("path", help="trades .db, OHLCV .csv or BarArchive directory")
+    parser.add_argument("--asset", default=None)
+    parser.add_argument("--std", type=float, default=2, help="bollinger_std_width")
+    parser.add_argument("--sell-std", type=float, default=-0.35)
+    parser.add_argument("--loss", type=float, default=0.98, help="loss_threshold")
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--fee", type=float, default=0.0)
+    parser.add_argument("--slippage", type=float, default=0.0)
+    args = parser.parse_args()
+
+    bars = load(args.path, args.asset)
+    started = time.perf_counter()
+    result = run(bars, args.std, args.sell_std, args.loss, args.window, args.fee, args.slippage)
+    elapsed = time.perf_counter() - started
+    report(result)
+    print(f"Backtest ran in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,86 @@
+"""
+Websocket decode throughput on one core: frames/sec from raw text to BarStore records for
+the old path (json.loads + dict + datetime) and each feeds decoder (stdlib json, orjson,
+msgspec typed structs), on Binance combined klines, Binance trades and Alpaca trade batches.
+
+Run from the repo root:  python infra/bench_feeds.py [frames]
+"""
+import json, sys, time
+from datetime import datetime
+import BarStore, feeds
+
+def binance_kline(i):
+    t = 1_743_883_920_000 + i * 60_000
+    return json.dumps({"stream": "btcusdc@kline_1m", "data": {
+        "e": "kline", "E": t + 1234, "s": "BTCUSDC", "k": {
+            "t": t, "T": t + 59_999, "s": "BTCUSDC", "i": "1m", "f": 100, "L": 200, "o": "83280.78000000",
+            "c": "83290.01000000", "h": "83301.55000000", "l": "83270.12000000", "v": "1.52340000", "n": 100,
+            "x": False, "q": "126871.33100000", "V": "0.71000000", "Q": "59136.00000000", "B": "0"}}})
+
+def binance_trade(i):
+    t = 1_743_883_920_000 + i * 7
+    return json.dumps({"e": "trade", "E": t + 3, "s": "BTCUSDC", "t": 1000 + i, "p": "83280.78000000",
+                       "q": "0.00120000", "T": t, "m": i % 2 == 0, "M": True})
+
+def alpaca_trades(i, batch=10):
+    return json.dumps([{"T": "t", "S": "AAPL", "i": i * batch + j, "x": "V", "p": 171.25 + j * 0.01, "s": 100,
+                        "c": ["@"], "z": "C", "t": f"2025-04-05T14:{i // 60 % 60:02d}:{i % 60:02d}.{j * 37:09d}Z"} for j in range(batch)])
+
+def legacy_binance(raw):
+    """What the clients did before feeds: nested dicts, six float() calls and a datetime per frame."""
+    message = json.loads(raw)
+    message = message.get("data", message)
+    if message["e"] == "trade":
+        datetime.fromtimestamp(message["T"] / 1000)
+        return [BarStore.Trade(message["s"], message["T"], float(message["p"]), float(message["q"]))]
+    k = message["k"]
+    datetime.fromtimestamp(k["t"] / 1000)
+    return [BarStore.Bar(k["s"], k["t"], float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"]))]
+
+def legacy_alpaca(raw):
+    records = []
+    for item in json.loads(raw):
+        seconds, _, fraction = item["t"].rstrip("Z").partition(".")
+        ms = int(datetime.fromisoformat(seconds + "+00:00").timestamp()) * 1000 + int((fraction + "000")[:3])
+        records.append(BarStore.Trade(item["S"], ms, float(item["p"]), float(item["s"])))
+    return records
+
+def rate(decode, frames):
+    decode(frames[0])
+    start = time.perf_counter()
+    for raw in frames:
+        decode(raw)
+    return len(frames) / (time.perf_counter() - start)
+
+def backends(adapter):
+    """(label, select) for each decoder available to the adapter; select() switches to it."""
+    typed = adapter.typed
+    yield "json", lambda: (setattr(adapter, "typed", False), setattr(feeds, "loads", json.loads))
+    if feeds.orjson:
+        yield "orjson", lambda: (setattr(adapter, "typed", False), setattr(feeds, "loads", feeds.orjson.loads))
+    if typed:
+        yield "msgspec", lambda: setattr(adapter, "typed", True)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    loads = feeds.loads
+    cases = [
+        ("Binance combined kline", feeds.BinanceAdapter(), [binance_kline(i) for i in range(n)], legacy_binance),
+        ("Binance trade", feeds.BinanceAdapter("trade"), [binance_trade(i) for i in range(n)], legacy_binance),
+        ("Alpaca trades x10", feeds.AlpacaAdapter("key", "secret"), [alpaca_trades(i) for i in range(n // 10)], legacy_alpaca),
+    ]
+    assert cases[0][1].decode(cases[0][2][0]) == legacy_binance(cases[0][2][0])
+
+    print(f"Frames/sec on one core ({n:,} frames per Binance case)")
+    for label, adapter, frames, legacy in cases:
+        print(f"  {label}")
+        print(f"    legacy (json + dicts + datetime) {rate(legacy, frames):12,.0f}")
+        for backend, select in backends(adapter):
+            select()
+            print(f"    feeds / {backend:<24} {rate(adapter.decode, frames):12,.0f}")
+        feeds.loads = loads
+    if not feeds.orjson or not feeds.msgspec:
+        print("  (pip install orjson msgspec for the faster decoders)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmarks the MACD on the live path: the old pandas/ta call, the NumPy batch version
+and the streaming IndicatorEngine update, plus the import cost of each stack.
+
+Run from the repo root:  python infra/bench_indicators.py
+"""
+import subprocess, sys, time
+import numpy as np
+import indicators, IndicatorEngine
+
+WINDOW = 60
+RUNS = 2000
+
+def per_call_us(fn, runs=RUNS):
+    fn()
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+def import_ms(statement, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True, cwd=sys.path[0])
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+def main():
+    prices = 80000 + np.cumsum(np.random.default_rng(0).normal(0, 20, WINDOW))
+
+    engine = IndicatorEngine.IndicatorEngine()
+    for price in prices:
+        engine.append(price)
+
+    def engine_tick():
+        engine.replace_last(prices[-1])
+        engine.macd()
+
+    def engine_incremental():
+        engine.replace_last(prices[-1])
+        engine.macd_components()
+
+    print(f"MACD latency over a {WINDOW}-bar window ({RUNS} runs)")
+    try:
+        import pandas as pd, ta
+        old_macd = lambda: ta.trend.macd_diff(pd.Series(prices)).iloc[-1]
+        print(f"  pandas + ta          {per_call_us(old_macd):10.1f} us")
+        print(f"  max abs diff vs ta   {np.nanmax(np.abs(ta.trend.macd_diff(pd.Series(prices)).values - indicators.macd_series(prices)[2])):.2e}")
+    except ImportError:
+        print("  pandas + ta          (not installed)")
+    print(f"  indicators.macd      {per_call_us(lambda: indicators.macd(prices, 14)):10.1f} us")
+    print(f"  IndicatorEngine      {per_call_us(engine_tick):10.1f} us  (windowed, = indicators.macd)")
+    print(f"  macd_components      {per_call_us(engine_incremental):10.1f} us  (incremental EMAs over the stream)")
+
+    print("Import time (fresh interpreter, best of 5)")
+    print(f"  python -c pass       {import_ms('pass'):10.1f} ms")
+    try:
+        print(f"  pandas + ta          {import_ms('import pandas, ta'):10.1f} ms")
+    except subprocess.CalledProcessError:
+        print("  pandas + ta          (not installed)")
+    print(f"  indicators           {import_ms('import indicators'):10.1f} ms")
+
+if __name__ == "__main__":
+    main()
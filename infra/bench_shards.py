@@ -0,0 +1,112 @@
+"""
+Strategy throughput against the worker count: bar updates/sec through the full TradingBot
+path (window, indicators, signals, paper orders) for a symbol universe, in one process
+(MultiSymbolBot-style routing) and in shards.ShardedRuntime with 1, 2, 4 ... workers.
+
+The parent pushes pre-built kline updates as fast as the rings take them; the clock stops
+when every worker has drained its ring and exited. Scaling is capped by the cores the
+machine has (printed first) and by the parent's push rate (the "ring only" line).
+
+Run from the repo root:  python infra/bench_shards.py [symbols] [updates] [max_workers]
+"""
+import asyncio, os, random, sys, time
+import yaml
+import algo, BarStore, logs, orders, shards
+
+class PaperTrader:
+    """Fills every order immediately, so signals exercise the ACK path without a network."""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def place_buy_order(self, symbol, usdc_amt=10, order_type="market"):
+        return orders.ack(symbol, "buy", True, "1", 1.0, None)
+
+    async def place_sell_order(self, symbol):
+        return orders.ack(symbol, "sell", True, "2", 1.0, None)
+
+def updates(symbols, count, bars=50):
+    """Kline updates round-robin over the symbols: random-walk closes, `bars` one-minute bars ending now."""
+    rng = random.Random(7)
+    per_bar = max(1, count // (len(symbols) * bars))
+    start = (int(time.time() * 1000) // 60_000 - bars) * 60_000
+    prices = {symbol: 100.0 for symbol in symbols}
+    result = []
+    for i in range(count // len(symbols)):
+        t = start + min(i // per_bar, bars) * 60_000
+        for symbol in symbols:
+            price = prices[symbol] = prices[symbol] * (1 + rng.gauss(0, 0.002))
+            result.append(BarStore.Bar(symbol, t, price, price * 1.001, price * 0.999, price, float(i % per_bar)))
+    return result
+
+def config():
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+    config["trading_config"]["ml_model"] = None
+    config["logging"] = {"level": "WARNING", "file": ""}
+    return config
+
+async def single_process(assets, records):
+    bots = {}
+    for asset in assets:
+        bot = algo.TradingBot(asset, trader=PaperTrader(), writer=shards.DiscardWriter(), config=config())
+        bot.snapshot_path = None
+        bots[bot.symbol] = bot
+    started = time.perf_counter()
+    for n, bar in enumerate(records):
+        bots[bar.symbol].on_new_data(bar)
+        if n % 4096 == 0:
+            await asyncio.sleep(0)  # let order tasks finish
+    return time.perf_counter() - started
+
+def ring_only(records, capacity=65536):
+    """The parent's cost alone: put + take on one ring, no bot work."""
+    ring = shards.Ring(capacity)
+    started = time.perf_counter()
+    for n, bar in enumerate(records):
+        ring.put(shards.BAR, 0, bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume)
+        if n % 4096 == 4095:
+            ring.take(4096)
+    elapsed = time.perf_counter() - started
+    ring.close()
+    return elapsed
+
+async def sharded(assets, records, workers):
+    runtime = shards.ShardedRuntime(assets, config(), workers=workers, db_path=None, trader=PaperTrader(), live=False, snapshots=False)
+    runtime.spawn()
+    poller = asyncio.get_running_loop().create_task(runtime.poll_signals())
+    started = time.perf_counter()
+    for n, bar in enumerate(records):
+        runtime.on_new_data(bar)
+        if n % 4096 == 0:
+            await asyncio.sleep(0)  # answer the workers' orders
+    poller.cancel()
+    await runtime.stop()
+    elapsed = time.perf_counter() - started
+    return elapsed, sum(runtime.updates.values()), runtime.stalls
+
+async def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    n_updates = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    logs.get("algo").setLevel("WARNING")
+    logs.get("shards").setLevel("WARNING")
+    assets = [f"S{i:03d}/USDC" for i in range(n_symbols)]
+    records = updates([asset.replace("/", "") for asset in assets], n_updates)
+
+    print(f"{len(records):,} kline updates over {n_symbols} symbols, {os.cpu_count()} CPU core(s)")
+    print(f"  ring only (parent push ceiling)  {len(records) / ring_only(records):12,.0f} /s")
+    baseline = len(records) / await single_process(assets, records)
+    print(f"  single process                   {baseline:12,.0f} /s")
+    workers = 1
+    while workers <= max_workers:
+        elapsed, processed, stalls = await sharded(assets, records, workers)
+        rate = processed / elapsed
+        print(f"  {workers:2d} worker(s)                     {rate:12,.0f} /s  x{rate / baseline:4.2f}  ({stalls:,} records backlogged)")
+        workers *= 2
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,14 @@
 import yaml
 import smtplib
+import threading, queue, time, atexit
 from datetime import datetime
+import latency, logs
 
-# Load YAML file
-with open("infra/config.yaml", "r") as file:
-    config = yaml.safe_load(file)
+CONFIG_PATH = "infra/config.yaml"
 
-# Extract credentials
-sender_email = config["email"]["address"]
-password = config["email"]["password"]
-recipient_sms = config["email"]["recipient_sms"]
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+log = logs.get(__name__)
 
 def connected_message():
     time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -39,10 +38,176 @@ def sell_order_fail(asset, reason):
 
 
 def send_message(message):
-    subject = "Trading Bot"
-    email_body = f"Subject: {subject}\n\n{message}"  # Proper email format
+    """Queues a notification; it is sent by the background dispatcher, never on the caller's thread."""
+    get_dispatcher().submit(message)
 
-    with smtplib.SMTP("smtp.gmail.com", 587) as server:
-        server.starttls()
-        server.login(sender_email, password)
-        server.sendmail(sender_email, sender_email, email_body)
\ No newline at end of file
+def get_dispatcher():
+    """Returns the process-wide dispatcher, reading the config and starting the worker on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = Dispatcher(make_sink(load_config()))
+                atexit.register(shutdown)
+    return _dispatcher
+
+def shutdown(timeout=10.0):
+    """Sends whatever is still queued and stops the dispatcher."""
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.close(timeout)
+        _dispatcher = None
+
+def load_config(config_path=CONFIG_PATH):
+    with open(config_path, "r") as file:
+        return yaml.safe_load(file)
+
+def make_sink(config):
+    """
+    Builds the sink named by email.sink in config.yaml:
+    - smtp (default): Gmail, or email.smtp_host / email.smtp_port
+    - local: plain SMTP without TLS or login, e.g. `python -m aiosmtpd -n` on localhost:1025
+    - file: appends messages to email.file (default notifications.log)
+    """
+    email = config["email"]
+    sink = email.get("sink", "smtp")
+    if sink == "file":
+        return FileSink(email.get("file", "notifications.log"))
+    if sink == "local":
+        return SMTPSink(email.get("smtp_host", "localhost"), email.get("smtp_port", 1025),
+                        email["address"] or "bot@localhost", None, use_tls=False)
+    return SMTPSink(email.get("smtp_host", "smtp.gmail.com"), email.get("smtp_port", 587),
+                    email["address"], email["password"])
+
+
+class SMTPSink:
+    """Sends notifications over one SMTP session that is kept open and reused between messages."""
+
+    def __init__(self, host, port, address, password, use_tls=True):
+        self.host = host
+        self.port = port
+        self.address = address
+        self.password = password
+        self.use_tls = use_tls
+        self.server = None
+
+    def send(self, subject, message):
+        email_body = f"Subject: {subject}\n\n{message}"  # Proper email format
+        if self.server is None:
+            self.connect()
+        try:
+            self.server.sendmail(self.address, self.address, email_body)
+        except smtplib.SMTPServerDisconnected:
+            # idle sessions get dropped by the server; reconnect once before giving up
+            self.connect()
+            self.server.sendmail(self.address, self.address, email_body)
+
+    def connect(self):
+        self.close()
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        if self.password:
+            server.login(self.address, self.password)
+        self.server = server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+
+class FileSink:
+    """Appends notifications to a local file (for dry runs and tests)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, subject, message):
+        with open(self.path, "a") as file:
+            file.write(f"[{datetime.now().isoformat()}] {subject}: {message}\n")
+
+    def close(self):
+        pass
+
+
+_STOP = object()
+
+class Dispatcher:
+    """
+    Background worker that delivers notifications to a sink.
+
+    Messages arriving within coalesce_window seconds of each other are sent as one
+    email, sends are spaced at least min_interval seconds apart (more messages are
+    coalesced while waiting), and failed sends are retried with exponential backoff.
+    submit() never blocks; if the queue is full the message is counted and dropped.
+    """
+
+    def __init__(self, sink, subject="Trading Bot", coalesce_window=2.0, min_interval=5.0,
+                 max_retries=3, retry_delay=2.0, max_queue=1000):
+        self.sink = sink
+        self.subject = subject
+        self.coalesce_window = coalesce_window
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.last_sent = 0.0
+        self.thread = threading.Thread(target=self._run, name="comms-dispatcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=10.0):
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            message = self.queue.get()
+            if message is _STOP:
+                break
+
+            batch = [message]
+            deadline = max(time.monotonic() + self.coalesce_window, self.last_sent + self.min_interval)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if message is _STOP:
+                    stopping = True
+                    break
+                batch.append(message)
+
+            self._deliver("\n".join(batch))
+        self.sink.close()
+
+    def _deliver(self, body):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with latency.span("comms_send"):
+                    self.sink.send(self.subject, body)
+                self.sent += 1
+                self.last_sent = time.monotonic()
+                return
+            except Exception as e:
+                log.warning("❌ Notification send failed (attempt %d): %s", attempt + 1, e)
+                self.sink.close()  # force a fresh session on the next attempt
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+        self.failed += 1
@@ -0,0 +1,165 @@
+"""
+Feature definitions for the entry-filter model, shared by training and the live path.
+
+feature_matrix() builds every column of the notebook's load_stock() (Bollinger bands,
+signal flags, RSI, ADX, MACD, slopes, rolling std max and the buy_result label) as
+vectorized NumPy passes. SignalModel.FeatureTracker computes the same features one
+bar at a time from the constants below, so training and serving cannot drift apart.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import indicators
+
+MEAN_PERIOD = 20
+BOLLINGER_STD = 2.0
+RSI_PERIOD = 14
+ADX_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+STD_MAX_WINDOW = 7
+# Lookback per slope column. "5-p slope" looks back 4 bars, as in the notebook the
+# existing models were trained with.
+SLOPE_LAGS = {"3-p slope": 3, "5-p slope": 4, "9-p slope": 9, "14-p slope": 14}
+
+# Model inputs available on the live path, in the notebook's column names.
+FEATURES = ("volume", "n_std", "RSI", "ADX", "MACD") + tuple(SLOPE_LAGS) + ("diff",)
+
+def wilder(values, period, start):
+    """
+    Wilder's smoothing of values[start:], seeded with the mean of values[start - period + 1:start + 1]
+    at index start. NaN before start.
+    """
+    out = np.full(values.size, np.nan)
+    if values.size > start:
+        seed = values[start - period + 1:start + 1].mean()
+        out[start:] = indicators.ema(np.r_[seed, values[start + 1:]], 2 * period - 1)  # alpha = 1 / period
+    return out
+
+def rolling_std(values, window):
+    """Population std over the trailing window (NaN until the window is full), like np.std in the notebook."""
+    out = indicators.rolling_mean_std(values, window, ddof=0)[1]
+    out[:window - 1] = np.nan
+    return out
+
+def rolling_max(values, window):
+    out = np.full(values.size, np.nan)
+    if values.size >= window:
+        out[window - 1:] = sliding_window_view(values, window).max(axis=1)
+    return out
+
+def rsi(close, period=RSI_PERIOD):
+    """Wilder RSI over the whole series (the notebook's calculate_rsi); NaN for the first `period` bars."""
+    deltas = np.diff(close, prepend=np.nan)
+    avg_gain = wilder(np.clip(deltas, 0, None), period, period)
+    avg_loss = wilder(np.clip(-deltas, 0, None), period, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100 - 100 / (1 + avg_gain / avg_loss)
+    out[(avg_loss == 0)] = 100.0
+    return out
+
+def adx(high, low, close, window=ADX_WINDOW):
+    """ADX as ta.trend.ADXIndicator(...).adx() computes it (0 during warm-up)."""
+    n = close.size
+    out = np.zeros(n)
+    if n < 2 * window:
+        return out
+
+    prev_close = np.r_[np.nan, close[:-1]]
+    true_range = np.fmax(high, prev_close) - np.fmin(low, prev_close)
+    up = np.r_[np.nan, high[1:] - high[:-1]]
+    down = np.r_[np.nan, low[:-1] - low[1:]]
+    plus = np.where((up > down) & (up > 0), up, 0.0)
+    minus = np.where((down > up) & (down > 0), down, 0.0)
+
+    # Wilder sums (sum form = window * Wilder average), first defined at bar `window`
+    trs = wilder(true_range, window, window)
+    dip = wilder(plus, window, window)
+    din = wilder(minus, window, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        di_plus = np.where(trs != 0, 100 * dip / trs, 0.0)
+        di_minus = np.where(trs != 0, 100 * din / trs, 0.0)
+        dx = np.where(di_plus + di_minus != 0, 100 * np.abs((di_plus - di_minus) / (di_plus + di_minus)), 0.0)
+
+    out[2 * window - 1:] = wilder(dx, window, 2 * window - 1)[2 * window - 1:]
+    return out
+
+def slopes(close):
+    """close[i - lag] - close[i] for each slope column; NaN until the lag is available."""
+    out = {}
+    for name, lag in SLOPE_LAGS.items():
+        column = np.full(close.size, np.nan)
+        column[lag:] = close[:-lag] - close[lag:]
+        out[name] = column
+    return out
+
+def labels(close, mean, signal, loss_threshold=0.98):
+    """
+    buy_result from the notebook's simulate2: 1 on each signal bar that opens a trade which
+    later closes at or above the mean for a profit, 0 everywhere else. Jumps from trade
+    to trade with searchsorted instead of looping over bars.
+    """
+    result = np.zeros(close.size, dtype=np.int8)
+    entries = np.flatnonzero(signal)
+    with np.errstate(invalid="ignore"):
+        profits = np.flatnonzero(close >= mean)
+
+    position = 0
+    while True:
+        k = np.searchsorted(entries, position)
+        if k == len(entries):
+            break
+        entry = entries[k]
+        buy_price = close[entry]
+        t = np.searchsorted(profits, entry + 1)
+        target = profits[t] if t < len(profits) else close.size
+        stops = np.flatnonzero(close[entry + 1:target] < loss_threshold * buy_price)
+        if stops.size:
+            position = entry + 1 + stops[0] + 1
+        elif target < close.size:
+            result[entry] = close[target] > buy_price
+            position = target + 1
+        else:
+            break
+    return result
+
+def feature_matrix(bars, mean_period=MEAN_PERIOD, std=BOLLINGER_STD, loss_threshold=0.98, dtype=np.float64):
+    """
+    Builds every load_stock() column for a bar history.
+
+    :param bars: dict (or DataFrame) with open, high, low, close, volume columns.
+    :param dtype: np.float32 halves the memory of the float columns.
+    :return: {column name: np.ndarray}; pd.DataFrame(result) gives the notebook's frame.
+    """
+    close = np.asarray(bars["close"], dtype=np.float64)
+    high = np.asarray(bars["high"], dtype=np.float64)
+    low = np.asarray(bars["low"], dtype=np.float64)
+
+    n_mean = indicators.ema(close, mean_period)
+    n_std = rolling_std(close, mean_period)
+    upper, lower = n_mean + std * n_std, n_mean - std * n_std
+    with np.errstate(invalid="ignore"):
+        under = close < lower
+    signal = under & ~np.r_[False, under[:-1]]
+
+    columns = {
+        "close": close, "volume": np.asarray(bars["volume"], dtype=np.float64),
+        "n_mean": n_mean, "n_std": n_std, "n-BU": upper, "n-BL": lower,
+        "RSI": rsi(close), "ADX": adx(high, low, close),
+        "MACD": indicators.macd_series(close, MACD_FAST, MACD_SLOW, MACD_SIGNAL)[2],
+        **slopes(close),
+        "diff": close - n_mean,
+        "std_max": rolling_max(n_std, STD_MAX_WINDOW),
+    }
+    columns = {name: values.astype(dtype, copy=False) for name, values in columns.items()}
+    columns["under"] = under
+    columns["signal"] = signal
+    columns["buy_result"] = labels(close, n_mean, signal, loss_threshold)
+    return columns
+
+def design_matrix(columns, names=FEATURES, rows=None, dtype=None):
+    """Stacks feature columns into an (n, k) array with NaN filled as 0 (the notebook's fillna(0))."""
+    matrix = np.column_stack([columns[name] for name in names])
+    if rows is not None:
+        matrix = matrix[rows]
+    if dtype is not None:
+        matrix = matrix.astype(dtype, copy=False)
+    return np.nan_to_num(matrix, nan=0.0)
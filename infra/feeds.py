@@ -0,0 +1,492 @@
+"""
+Async market-data feeds with pluggable exchange adapters.
+
+Every adapter turns its exchange's websocket messages into the shared records
+BarStore.Bar and BarStore.Trade (epoch-ms timestamps, exchange symbols without '/').
+A Feed owns the sockets for one adapter: it reconnects with exponential backoff and
+jitter, backfills bars missed while disconnected over REST, and fans each record
+out to every subscriber. FeedHub hands out shared Feeds so several consumers of the
+same exchange stream never open duplicate sockets.
+
+    hub = feeds.FeedHub()
+    hub.subscribe(feeds.BinanceAdapter(), ["BTCUSDC", "ETHUSDC"], bot.on_new_data, backfill=bot.data_prime)
+    hub.subscribe(feeds.BinanceAdapter(), ["BTCUSDC"], recorder.on_bar)  # same socket
+    await hub.start()
+
+Adapters take base URLs, so a Feed can run against a local stand-in websocket server.
+
+Decoding goes straight from the frame to the record with integer epoch-ms timestamps:
+msgspec typed structs when msgspec is installed (Binance, Alpaca), else orjson, else the
+stdlib json module. `python infra/bench_feeds.py` compares the three.
+"""
+import abc, asyncio, json, random, functools, time
+from datetime import datetime
+from typing import Optional, Union
+import websockets
+import BarStore, BarAggregator, HistoricalData, latency, logs, RequestScheduler
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+loads = orjson.loads if orjson else json.loads
+log = logs.get(__name__)
+BAR_KINDS = (BarStore.Bar, BarStore.Trade)  # the records bar consumers want (not Book quotes)
+
+if msgspec:
+    # only the fields the records need; everything else in the frame is skipped without allocation
+    class BinanceKline(msgspec.Struct):
+        s: str
+        t: int
+        o: float
+        h: float
+        l: float
+        c: float
+        v: float
+
+    class BinanceEvent(msgspec.Struct):
+        e: str = ""
+        E: int = 0
+        s: str = ""
+        T: int = 0
+        p: float = 0.0
+        q: float = 0.0
+        k: Optional[BinanceKline] = None
+        u: int = 0  # bookTicker update id; bookTicker frames have no "e"
+        b: float = 0.0
+        B: float = 0.0
+        a: float = 0.0
+        A: float = 0.0
+
+    class BinanceCombined(msgspec.Struct):
+        data: BinanceEvent
+
+    class AlpacaTrade(msgspec.Struct, tag_field="T", tag="t"):
+        S: str
+        t: Union[int, str]
+        p: float
+        s: float
+
+    class AlpacaBar(msgspec.Struct, tag_field="T", tag="b"):
+        S: str
+        t: Union[int, str]
+        o: float
+        h: float
+        l: float
+        c: float
+        v: float
+
+
+def bars_from_arrays(symbol, bars):
+    """HistoricalData arrays -> list of BarStore.Bar."""
+    columns = [bars[name].tolist() for name in ("timestamp", "open", "high", "low", "close", "volume")]
+    return [BarStore.Bar(symbol, *values) for values in zip(*columns)]
+
+
+@functools.lru_cache(maxsize=64)
+def epoch_seconds(text):
+    """'2024-03-01T14:30:05' (UTC) -> epoch seconds; cached, since a burst of trades shares the same second."""
+    return int(datetime.fromisoformat(text + "+00:00").timestamp())
+
+
+class Adapter(abc.ABC):
+    """
+    One exchange stream. Subclasses set `name` and implement urls(), parse() and, when the
+    exchange needs them, handshake() and backfill().
+    """
+    name = ""
+    max_symbols_per_connection = 200
+    event_ms = 0  # exchange event time of the last bar frame, when the exchange sends one
+
+    def key(self):
+        """Adapters with equal keys share a Feed (and its sockets)."""
+        return (self.name, self.base_url)
+
+    @abc.abstractmethod
+    def urls(self, symbols):
+        """Websocket URLs covering the symbols, at most max_symbols_per_connection each."""
+
+    async def handshake(self, ws, symbols):
+        """Auth / subscribe messages sent after connecting."""
+
+    def decode(self, raw):
+        """Raw websocket frame -> list of Bar / Trade records."""
+        return self.parse(loads(raw))
+
+    @abc.abstractmethod
+    def parse(self, message):
+        """Decoded JSON message -> list of Bar / Trade records."""
+
+    def backfill(self, symbol, since_ms):
+        """Bars from since_ms (inclusive) to now, fetched over REST; [] if the stream has no bar history."""
+        return []
+
+
+class BinanceAdapter(Adapter):
+    """
+    Binance.US kline ("kline_1m"), trade ("trade") and/or top-of-book ("bookTicker") streams;
+    `stream` is one name or a tuple of them. Combined when there are several streams.
+    """
+    name = "binance"
+
+    def __init__(self, stream="kline_1m", base_url="wss://stream.binance.us:9443", rest_url=None):
+        self.stream = stream
+        self.streams = (stream,) if isinstance(stream, str) else tuple(stream)
+        self.base_url = base_url
+        self.rest_url = rest_url
+        self.typed = msgspec is not None
+        if self.typed:
+            self.single_decoder = msgspec.json.Decoder(BinanceEvent, strict=False)  # strict=False: "1.5" -> 1.5
+            self.combined_decoder = msgspec.json.Decoder(BinanceCombined, strict=False)
+
+    def key(self):
+        return (self.name, self.base_url, self.streams)
+
+    def urls(self, symbols):
+        if len(symbols) == 1 and len(self.streams) == 1:
+            return [f"{self.base_url}/ws/{symbols[0].lower()}@{self.streams[0]}"]
+        chunk = self.max_symbols_per_connection
+        return [f"{self.base_url}/stream?streams=" + "/".join(f"{symbol.lower()}@{stream}" for symbol in symbols[i:i + chunk] for stream in self.streams)
+                for i in range(0, len(symbols), chunk)]
+
+    def decode(self, raw):
+        if not self.typed:
+            return self.parse(loads(raw))
+        if raw.startswith(b'{"stream"' if isinstance(raw, bytes) else '{"stream"'):
+            event = self.combined_decoder.decode(raw).data
+        else:
+            event = self.single_decoder.decode(raw)
+        self.event_ms = event.E
+        if event.k is not None:
+            k = event.k
+            return [BarStore.Bar(k.s, k.t, k.o, k.h, k.l, k.c, k.v)]
+        if event.e == "trade":
+            return [BarStore.Trade(event.s, event.T, event.p, event.q)]
+        if event.u:
+            return [BarStore.Book(event.s, int(time.time() * 1000), event.b, event.B, event.a, event.A)]
+        return []
+
+    def parse(self, message):
+        message = message.get("data", message)  # combined streams wrap each event as {"stream": ..., "data": ...}
+        event = message.get("e")
+        self.event_ms = message.get("E", 0)
+        if event == "kline":
+            kline = message["k"]
+            return [BarStore.Bar(kline["s"], kline["t"], float(kline["o"]), float(kline["h"]),
+                                 float(kline["l"]), float(kline["c"]), float(kline["v"]))]
+        if event == "trade":
+            return [BarStore.Trade(message["s"], message["T"], float(message["p"]), float(message["q"]))]
+        if event is None and "u" in message:
+            return [BarStore.Book(message["s"], int(time.time() * 1000), float(message["b"]), float(message["B"]),
+                                  float(message["a"]), float(message["A"]))]
+        return []
+
+    def backfill(self, symbol, since_ms):
+        kline = next((stream for stream in self.streams if stream.startswith("kline_")), None)
+        if kline is None:
+            return []
+        data = HistoricalData.HistoricalData("binance", interval=kline[len("kline_"):], base_url=self.rest_url,
+                                             lane=RequestScheduler.DATA)
+        try:
+            return bars_from_arrays(symbol, data.fetch(symbol, since_ms))  # the gap only; no day cache
+        finally:
+            data.close()
+
+
+class AlpacaAdapter(Adapter):
+    """Alpaca market-data stream: trades and/or minute bars for stocks (IEX) or crypto."""
+    name = "alpaca"
+
+    def __init__(self, key, secret, asset_type="stock", channels=("trades",), base_url="wss://stream.data.alpaca.markets", rest_url=None):
+        if asset_type not in ("stock", "crypto"):
+            raise ValueError(f"Invalid asset type '{asset_type}'. Please specify either 'crypto' or 'stock'.")
+        self.api_key = key
+        self.api_secret = secret
+        self.asset_type = asset_type
+        self.channels = tuple(channels)
+        self.base_url = base_url
+        self.rest_url = rest_url
+        self.names = {}  # "BTCUSD" -> "BTC/USD"
+        self.typed = msgspec is not None
+        if self.typed:
+            self.decoder = msgspec.json.Decoder(list[Union[AlpacaTrade, AlpacaBar]], strict=False)
+
+    def urls(self, symbols):
+        return [self.base_url + ("/v1beta3/crypto/us" if self.asset_type == "crypto" else "/v2/iex")]
+
+    async def handshake(self, ws, symbols):
+        await ws.send(json.dumps({"action": "auth", "key": self.api_key, "secret": self.api_secret}))
+        log.info("Auth Response: %s", await ws.recv())
+        self.names.update({symbol.replace("/", ""): symbol for symbol in symbols})
+        await ws.send(json.dumps({"action": "subscribe", **{channel: list(symbols) for channel in self.channels}}))
+
+    def decode(self, raw):
+        if not self.typed:
+            return self.parse(loads(raw))
+        try:
+            items = self.decoder.decode(raw)
+        except msgspec.ValidationError:  # control frames (success, subscription, error)
+            return self.parse(loads(raw))
+        records = []
+        for item in items:
+            if type(item) is AlpacaTrade:
+                records.append(BarStore.Trade(item.S.replace("/", ""), self.timestamp_ms(item.t), item.p, item.s))
+            else:
+                records.append(BarStore.Bar(item.S.replace("/", ""), self.timestamp_ms(item.t), item.o, item.h, item.l, item.c, item.v))
+        return records
+
+    def parse(self, message):
+        records = []
+        for item in message if isinstance(message, list) else [message]:
+            kind = item.get("T")
+            if kind == "t":
+                records.append(BarStore.Trade(item["S"].replace("/", ""), self.timestamp_ms(item["t"]), float(item["p"]), float(item["s"])))
+            elif kind == "b":
+                records.append(BarStore.Bar(item["S"].replace("/", ""), self.timestamp_ms(item["t"]), float(item["o"]), float(item["h"]),
+                                            float(item["l"]), float(item["c"]), float(item["v"])))
+        return records
+
+    @staticmethod
+    def timestamp_ms(t):
+        """RFC-3339 string (JSON frames) or nanoseconds (msgpack frames) -> epoch ms."""
+        if isinstance(t, str):
+            seconds, _, fraction = t.rstrip("Z").partition(".")
+            return epoch_seconds(seconds) * 1000 + int((fraction + "000")[:3])
+        return int(t // 1_000_000)
+
+    def backfill(self, symbol, since_ms):
+        if "bars" not in self.channels:
+            return []
+        data = HistoricalData.HistoricalData("alpaca", base_url=self.rest_url, key=self.api_key, secret=self.api_secret,
+                                             lane=RequestScheduler.DATA)
+        try:
+            return bars_from_arrays(symbol, data.fetch(self.names.get(symbol, symbol), since_ms))
+        finally:
+            data.close()
+
+    def key(self):
+        return (self.name, self.base_url, self.asset_type, self.channels, self.api_key)
+
+
+class KrakenAdapter(Adapter):
+    """Kraken websocket v1 trade channel (pairs like "XBT/USD")."""
+    name = "kraken"
+
+    def __init__(self, base_url="wss://ws.kraken.com/"):
+        self.base_url = base_url
+
+    def urls(self, symbols):
+        return [self.base_url]
+
+    async def handshake(self, ws, symbols):
+        await ws.send(json.dumps({"event": "subscribe", "pair": list(symbols), "subscription": {"name": "trade"}}))
+
+    def parse(self, message):
+        # [channelID, [[price, volume, time, side, orderType, misc], ...], "trade", "XBT/USD"]; events are dicts
+        if not isinstance(message, list) or len(message) < 4 or message[-2] != "trade":
+            return []
+        symbol = message[-1].replace("/", "")
+        return [BarStore.Trade(symbol, int(float(trade[2]) * 1000), float(trade[0]), float(trade[1])) for trade in message[1]]
+
+
+class Feed:
+    """
+    The sockets of one adapter for a set of symbols, shared by any number of subscribers.
+
+    Callbacks run on the event loop for every record whose symbol they subscribed to;
+    an exception in one subscriber is logged and does not affect the others. Bars backfilled
+    after a reconnect are history: a subscriber with a backfill callback gets them there, as
+    one batch per symbol, instead of through its live callback.
+    """
+
+    def __init__(self, adapter, symbols=(), backoff_initial=1.0, backoff_max=60.0, backfill=True, capture=None):
+        """capture: path of a file that receives every raw frame, one per line (replay.py reads it back)."""
+        self.adapter = adapter
+        self.symbols = list(dict.fromkeys(symbols))
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.backfill_enabled = backfill
+        self.subscribers = []  # (callback, symbol set or None, record types or None, backfill callback or None)
+        self.last_bar = {}  # symbol -> timestamp of the last bar delivered
+        self.connections = 0
+        self.capture = open(capture, "a", encoding="utf-8") if capture else None
+
+    def add_symbols(self, symbols):
+        for symbol in symbols:
+            if symbol not in self.symbols:
+                self.symbols.append(symbol)
+
+    def subscribe(self, callback, symbols=None, kinds=None, backfill=None):
+        """
+        Calls callback(record) for each record of `symbols` (all symbols if None) whose type is
+        in `kinds`, e.g. (BarStore.Bar, BarStore.Trade) (all record types if None).
+        backfill(bars), when given, receives the bars backfilled after a reconnect, e.g. a bot's
+        data_prime, so stale prices update the window without acting on signals.
+        """
+        wanted = {symbol.replace("/", "") for symbol in symbols} if symbols is not None else None
+        self.subscribers.append((callback, wanted, tuple(kinds) if kinds is not None else None, backfill))
+
+    def queue(self, symbols=None, maxsize=0, kinds=None):
+        """Subscribes an asyncio.Queue and returns it, for consumers that prefer to await records."""
+        queue = asyncio.Queue(maxsize)
+
+        def put(record):
+            if queue.full():
+                queue.get_nowait()  # drop the oldest rather than stall the socket
+            queue.put_nowait(record)
+
+        self.subscribe(put, symbols, kinds)
+        return queue
+
+    def dispatch(self, record):
+        if type(record) is BarStore.Bar:
+            self.last_bar[record.symbol] = record.timestamp
+        kind = type(record)
+        for callback, wanted, kinds, _ in self.subscribers:
+            if (wanted is None or record.symbol in wanted) and (kinds is None or kind in kinds):
+                try:
+                    callback(record)
+                except Exception:
+                    log.exception("❌ Feed subscriber %s failed", getattr(callback, "__qualname__", callback))
+
+    def dispatch_backfill(self, symbol, bars):
+        """Hands one symbol's backfilled bars to each subscriber: as a batch to its backfill callback, else bar by bar."""
+        self.last_bar[symbol] = bars[-1].timestamp
+        for callback, wanted, kinds, backfill in self.subscribers:
+            if (wanted is not None and symbol not in wanted) or (kinds is not None and BarStore.Bar not in kinds):
+                continue
+            try:
+                if backfill:
+                    backfill(bars)
+                else:
+                    for bar in bars:
+                        callback(bar)
+            except Exception:
+                log.exception("❌ Feed subscriber %s failed", getattr(backfill or callback, "__qualname__", callback))
+
+    async def start(self):
+        urls = self.adapter.urls(self.symbols)
+        chunk = self.adapter.max_symbols_per_connection
+        try:
+            await asyncio.gather(*(self.connect(url, self.symbols[i * chunk:(i + 1) * chunk] if len(urls) > 1 else self.symbols)
+                                   for i, url in enumerate(urls)))
+        finally:
+            self.close()
+
+    def close(self):
+        """Closes the capture file; the sockets close with their tasks."""
+        if self.capture:
+            self.capture.close()
+            self.capture = None
+
+    async def connect(self, url, symbols):
+        """Runs one socket forever: connect, handshake, backfill after a reconnect, then stream."""
+        name = self.adapter.name
+        attempt = 0
+        reconnecting = False
+        while True:
+            try:
+                log.info("🔌 Connecting to %s for %d symbol(s) (%s)", name, len(symbols), url[:120])
+                async with websockets.connect(url) as ws:
+                    await self.adapter.handshake(ws, symbols)
+                    self.connections += 1
+                    log.info("✅ Connected to %s", name)
+                    if reconnecting and self.backfill_enabled:
+                        await self.backfill(symbols)
+                    async for message in ws:
+                        attempt = 0  # healthy again; the next failure starts from the initial delay
+                        if self.capture:
+                            self.capture.write((message.decode() if isinstance(message, bytes) else message) + "\n")
+                        with latency.span("parse"):
+                            records = self.adapter.decode(message)
+                        if latency.enabled and records:
+                            self.observe_lag(records[-1])
+                        for record in records:
+                            self.dispatch(record)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("❌ %s connection error: %r", name, e)
+
+            delay = min(self.backoff_max, self.backoff_initial * 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            reconnecting = True
+            log.info("🔄 Reconnecting to %s in %.1f seconds...", name, delay)
+            await asyncio.sleep(delay)
+
+    def observe_lag(self, record):
+        """Exchange clock -> our clock (includes any skew between the two)."""
+        event_ms = record.timestamp if type(record) is BarStore.Trade else self.adapter.event_ms
+        if event_ms:
+            latency.observe_ms("exchange_to_parse", time.time() * 1000 - event_ms)
+
+    async def backfill(self, symbols):
+        """Re-delivers bars from the last one seen (which may have changed) up to now, per symbol."""
+        loop = asyncio.get_running_loop()
+        for symbol in symbols:
+            since = self.last_bar.get(symbol.replace("/", ""))
+            if since is None:
+                continue
+            try:
+                bars = await loop.run_in_executor(None, self.adapter.backfill, symbol, since)
+            except Exception as e:
+                log.warning("⚠️ Backfill for %s failed: %r", symbol, e)
+                continue
+            if bars:
+                self.dispatch_backfill(symbol.replace("/", ""), bars)
+                log.info("♻️ Backfilled %d %s bar(s) after reconnect", len(bars), symbol)
+
+
+class FeedHub:
+    """Hands out one Feed per adapter key, so subscribers to the same stream share its sockets."""
+
+    def __init__(self, **feed_options):
+        self.feed_options = feed_options
+        self.feeds = {}
+
+    def feed(self, adapter, symbols=()):
+        key = adapter.key()
+        if key not in self.feeds:
+            self.feeds[key] = Feed(adapter, **self.feed_options)
+        feed = self.feeds[key]
+        feed.add_symbols(symbols)
+        return feed
+
+    def subscribe(self, adapter, symbols, callback, kinds=None, backfill=None):
+        feed = self.feed(adapter, symbols)
+        feed.subscribe(callback, symbols, kinds, backfill)
+        return feed
+
+    async def start(self):
+        await asyncio.gather(*(feed.start() for feed in self.feeds.values()))
+
+
+class BarBuilder:
+    """
+    Subscriber that turns a Trade stream into bars with BarAggregator and calls on_bar with
+    each closed bar and then the open bar, like a kline stream. Bars pass straight through.
+    """
+
+    def __init__(self, on_bar, interval="1m"):
+        self.on_bar = on_bar
+        self.interval = interval
+        self.aggregators = {}
+
+    def __call__(self, record):
+        if type(record) is BarStore.Bar:
+            self.on_bar(record)
+            return
+        aggregator = self.aggregators.get(record.symbol)
+        if aggregator is None:
+            aggregator = self.aggregators[record.symbol] = BarAggregator.BarAggregator(record.symbol, self.interval)
+        closed = aggregator.add(record.timestamp, record.price, record.volume)
+        if closed:
+            self.on_bar(closed)
+        current = aggregator.current()
+        if current is not None:  # tick / volume bars have no open bar right after one closes
+            self.on_bar(current)
@@ -1,8 +1,8 @@
-import ta
 import numpy as np
-from collections import deque
-import numpy as np
-import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+_EMA_BLOCK = 64  # rows per block in the vectorized EMA (keeps decay weights well conditioned)
+_ema_kernels = {}
 
 def rsi(trade_prices, period = 14):
     if len(trade_prices) < period + 1:
@@ -80,6 +80,85 @@ def di_minus(trade_prices):
     di_minus = (np.sum(minus_dm) / tr_sum) * 100
     return di_minus
 
+def rolling_mean_std(values, window, ddof=1, chunk=65536):
+    """
+    Mean and standard deviation of the trailing `window` values at every index.
+    The first window-1 entries use the bars seen so far, like the live window while it fills.
+
+    :param values: np.ndarray of prices.
+    :return: (mean, std) np.ndarrays, same length as values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.size
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+
+    for i in range(min(window - 1, n)):
+        mean[i] = values[:i + 1].mean()
+        if i + 1 > ddof:
+            std[i] = values[:i + 1].std(ddof=ddof)
+
+    if n >= window:
+        windows = sliding_window_view(values, window)
+        for start in range(0, len(windows), chunk):  # bounded temporaries for long histories
+            block = windows[start:start + chunk]
+            mean[window - 1 + start:window - 1 + start + len(block)] = block.mean(axis=1)
+            std[window - 1 + start:window - 1 + start + len(block)] = block.std(axis=1, ddof=ddof)
+    return mean, std
+
+def _ema_kernel(alpha, size):
+    """Lower-triangular EMA weights for one block plus the decay applied to the carried value."""
+    key = (alpha, size)
+    if key not in _ema_kernels:
+        decay = 1 - alpha
+        lags = np.arange(size)[:, None] - np.arange(size)[None, :]
+        weights = np.where(lags >= 0, alpha * decay ** np.maximum(lags, 0), 0.0)
+        carry = decay ** np.arange(1, size + 1)
+        _ema_kernels[key] = (weights, carry)
+    return _ema_kernels[key]
+
+def ema(values, span):
+    """
+    Exponential moving average seeded at the first value, equivalent to
+    pd.Series(values).ewm(span=span, adjust=False).mean().
+
+    :param values: np.ndarray of values.
+    :param span: EMA span (alpha = 2 / (span + 1)).
+    :return: np.ndarray of EMA values, same length as values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty_like(values)
+    if values.size == 0:
+        return out
+
+    weights, carry = _ema_kernel(2 / (span + 1), _EMA_BLOCK)
+    prev = values[0]  # carrying x0 into the first block makes y0 = x0
+    for start in range(0, values.size, _EMA_BLOCK):
+        block = values[start:start + _EMA_BLOCK]
+        size = block.size
+        out[start:start + size] = weights[:size, :size] @ block + carry[:size] * prev
+        prev = out[start + size - 1]
+    return out
+
+def macd_series(prices, fast=12, slow=26, signal=9):
+    """
+    Calculate the MACD line, signal line and histogram for a NumPy array of prices.
+    Matches ta.trend.MACD (fillna=False): values are NaN until each EMA has a full window.
+
+    :param prices: np.ndarray of closing prices.
+    :return: (macd_line, signal_line, histogram) np.ndarrays.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    line = ema(prices, fast) - ema(prices, slow)
+    line[:slow - 1] = np.nan
+
+    signal_line = np.full_like(line, np.nan)
+    if prices.size >= slow:
+        signal_line[slow - 1:] = ema(line[slow - 1:], signal)
+        signal_line[:slow + signal - 2] = np.nan
+
+    return line, signal_line, line - signal_line
+
 def macd(prices, macd_period):
     """
     Calculate and return the latest MACD value from a NumPy array of prices.
@@ -92,7 +171,6 @@ def macd(prices, macd_period):
         return None 
 
     # Calculate MACD difference directly
-    macd_values = ta.trend.macd_diff(pd.Series(prices))
-
-    return macd_values.iloc[-1] if not np.isnan(macd_values.iloc[-1]) else None
+    macd_values = macd_series(prices)[2]
 
+    return macd_values[-1] if not np.isnan(macd_values[-1]) else None
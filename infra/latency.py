@@ -0,0 +1,229 @@
+"""
+Per-stage latency of the live path, from the exchange event to the database row.
+
+    with latency.span("indicators"):
+        self.refresh_indicators(bar)
+
+    started = latency.start()
+    ack = await trader.place_buy_order(...)
+    latency.stop("order_ack", started)
+
+    latency.observe_ms("exchange_to_parse", now_ms - event_ms)
+
+Spans use the monotonic time.perf_counter_ns(). Each stage keeps an HDR-style histogram:
+log-linear buckets with 32 sub-buckets per power of two (<= 3% error), a fixed ~1.2k
+counters per stage whatever the traffic. Disabled (the default) span() returns a shared
+no-op context manager and start/stop/observe_ms return at once, so the calls can stay in
+the hot path. Exporter rewrites a Prometheus text file and/or serves it on /metrics.
+"""
+import asyncio, os, time
+import logs
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_US = 1 << 40  # ~12 days; larger values land in the top bucket
+PREFIX = "trading_latency"
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+enabled = False
+histograms = {}
+log = logs.get(__name__)
+
+
+class Histogram:
+    """Microsecond values in log-linear buckets: exact below 64 us, then 32 buckets per doubling."""
+
+    def __init__(self):
+        self.counts = [0] * self.index(MAX_US) + [0]
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def index(us):
+        if us < 2 * SUB_BUCKETS:
+            return us
+        shift = us.bit_length() - SUB_BUCKET_BITS - 1
+        return shift * SUB_BUCKETS + (us >> shift)
+
+    @staticmethod
+    def upper(index):
+        """Largest value that falls in bucket `index`."""
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        top = index - shift * SUB_BUCKETS
+        return ((top + 1) << shift) - 1
+
+    def record(self, us):
+        us = min(max(int(us), 0), MAX_US)
+        self.counts[self.index(us)] += 1
+        self.count += 1
+        self.total += us
+        if self.min is None or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, q):
+        """Value (us) at quantile q in [0, 1]; within one bucket of the exact answer."""
+        if not self.count:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.upper(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+def histogram(name):
+    h = histograms.get(name)
+    if h is None:
+        h = histograms[name] = Histogram()
+    return h
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        histogram(self.name).record((time.perf_counter_ns() - self.started) // 1000)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name):
+    """Context manager timing its block into histogram `name`."""
+    return _Span(name) if enabled else _NO_SPAN
+
+def start():
+    """perf_counter_ns() reading for stop(), or 0 when disabled."""
+    return time.perf_counter_ns() if enabled else 0
+
+def stop(name, started):
+    if enabled and started:
+        histogram(name).record((time.perf_counter_ns() - started) // 1000)
+
+def observe_ms(name, ms):
+    """Records a duration measured elsewhere (e.g. exchange timestamps, order ack timings)."""
+    if enabled:
+        histogram(name).record(ms * 1000)
+
+def reset():
+    histograms.clear()
+
+
+# reporting
+
+def prometheus():
+    """All histograms as Prometheus summaries (seconds), plus a max gauge per stage."""
+    lines = [f"# TYPE {PREFIX}_seconds summary", f"# TYPE {PREFIX}_max_seconds gauge"]
+    for name, h in sorted(histograms.items()):
+        for q in QUANTILES:
+            lines.append(f'{PREFIX}_seconds{{stage="{name}",quantile="{q}"}} {h.percentile(q) / 1e6:.6f}')
+        lines.append(f'{PREFIX}_seconds_sum{{stage="{name}"}} {h.total / 1e6:.6f}')
+        lines.append(f'{PREFIX}_seconds_count{{stage="{name}"}} {h.count}')
+        lines.append(f'{PREFIX}_max_seconds{{stage="{name}"}} {h.max / 1e6:.6f}')
+    return "\n".join(lines) + "\n"
+
+def report():
+    """Human-readable table in milliseconds."""
+    rows = [f"{'stage':<24}{'count':>10}{'p50':>10}{'p99':>10}{'p99.9':>10}{'max':>10}  (ms)"]
+    for name, h in sorted(histograms.items()):
+        rows.append(f"{name:<24}{h.count:>10}{h.percentile(0.5) / 1000:>10.3f}{h.percentile(0.99) / 1000:>10.3f}"
+                    f"{h.percentile(0.999) / 1000:>10.3f}{h.max / 1000:>10.3f}")
+    return "\n".join(rows)
+
+
+class Exporter:
+    """Rewrites `path` every `interval` seconds and/or serves the metrics on http://host:port/metrics."""
+
+    def __init__(self, path=None, port=None, interval=60.0, host="127.0.0.1"):
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.host = host
+        self.server = None
+        self.task = None
+
+    async def start(self):
+        if self.port:
+            self.server = await asyncio.start_server(self._serve, self.host, self.port)
+            log.info("📈 Latency metrics on http://%s:%s/metrics", self.host, self.port)
+        if self.path:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Writes the file one last time and logs the summary."""
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.path:
+            self.write()
+        if histograms:
+            log.info("%s", report())
+
+    def write(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as file:
+            file.write(prometheus())
+        os.replace(tmp, self.path)  # scrapers never see a half-written file
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                log.warning("❌ Could not write latency metrics: %s", e)
+
+    async def _serve(self, reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = prometheus().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def configure(settings):
+    """Applies the config's `latency` section; returns an Exporter when one is configured, else None."""
+    global enabled
+    settings = settings or {}
+    enabled = bool(settings.get("enabled"))
+    if not enabled or not (settings.get("file") or settings.get("port")):
+        return None
+    return Exporter(settings.get("file"), settings.get("port"), float(settings.get("interval") or 60))
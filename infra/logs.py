@@ -0,0 +1,121 @@
+"""
+Structured logging for the live bot.
+
+Modules log through logs.get(__name__) with %-style arguments, so a record is only a tuple
+until a handler needs the text. logs.setup() puts a queue between the callers and the
+handlers: the hot path does a level check and a queue put, and a background
+QueueListener thread formats the records, appending JSON lines to a rotating file and
+plain text to the console.
+
+    log = logs.get(__name__)
+    log.info("Bought %s %s @ %s", qty, asset, price, extra={"order_id": order_id})
+
+RateLimit keeps high-frequency lines (the per-tick status) to one every few seconds.
+"""
+import atexit, json, logging, logging.handlers, queue, sys, time
+from datetime import datetime, timezone
+
+ROOT = "trading"
+STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+
+# until setup() runs (tools, notebooks), records go straight to stdout like the old prints
+_default = logging.StreamHandler(sys.stdout)
+_default.setFormatter(logging.Formatter("%(message)s"))
+logging.getLogger(ROOT).addHandler(_default)
+logging.getLogger(ROOT).setLevel(logging.INFO)
+logging.getLogger(ROOT).propagate = False
+
+
+def get(name):
+    """Logger under the 'trading' tree, e.g. logs.get(__name__) -> trading.algo."""
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues the record as is. The stock QueueHandler formats the message on the caller's
+    thread; here getMessage() runs on the listener thread, off the event loop.
+    Arguments must not be mutated after the call (the live path passes numbers and strings).
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class RateLimit:
+    """ready() is True at most once per `seconds` (monotonic clock)."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.next = 0.0
+
+    def ready(self):
+        now = time.monotonic()
+        if now < self.next:
+            return False
+        self.next = now + self.seconds
+        return True
+
+
+def setup(settings=None):
+    """
+    Applies the config's `logging` section and starts the background listener.
+    Keys: level (INFO), file (trading.log.jsonl; empty = console only), max_mb (50),
+    backups (5), console (true).
+    """
+    global _listener
+    settings = settings or {}
+    shutdown()
+
+    handlers = []
+    if settings.get("file", "trading.log.jsonl"):
+        file_handler = logging.handlers.RotatingFileHandler(
+            settings.get("file", "trading.log.jsonl"), maxBytes=int(float(settings.get("max_mb", 50)) * 1024 * 1024),
+            backupCount=int(settings.get("backups", 5)), encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if settings.get("console", True):
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter("%(message)s"))
+        handlers.append(console)
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger(ROOT)
+    root.handlers = [LazyQueueHandler(records)]
+    root.setLevel(str(settings.get("level", "INFO")).upper())
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+    return _listener
+
+
+def shutdown():
+    """Writes out everything queued and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
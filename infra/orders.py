@@ -0,0 +1,14 @@
+import collections, time
+
+# Result of an order request, returned by the traders' awaitable place_*_order methods.
+# timings maps stage name -> milliseconds (e.g. quote_ms, submit_ms, total_ms).
+# flat marks a sell that failed because there is nothing sellable left (no holding, or dust below
+# the market's minimums): the position is over, and retrying would never succeed.
+OrderAck = collections.namedtuple("OrderAck", ["symbol", "side", "ok", "order_id", "qty", "price", "timestamp", "error", "timings", "flat"])
+
+def ack(symbol, side, ok, order_id=None, qty=0.0, price=None, timestamp=None, error=None, timings=None, flat=False):
+    return OrderAck(symbol, side, ok, order_id, qty, price, timestamp, error, timings or {}, flat)
+
+def elapsed_ms(start):
+    """Milliseconds since a time.perf_counter() reading."""
+    return (time.perf_counter() - start) * 1000
@@ -0,0 +1,261 @@
+"""
+Replays a recorded stream through the real TradingBot code as fast as it will go.
+
+Sources:
+    .db       trades tables written by the bot (kline snapshots) or the older raw-trade tables
+    .csv      OHLCV bars (one update per bar)
+    dir       a BarArchive root
+    .jsonl    a capture of raw websocket frames (feeds.Feed(capture=...)), decoded by the adapter
+
+The bot gets a ReplayClock that follows the recorded timestamps (window eviction and
+snapshots use it instead of the wall clock), a PaperBroker that fills orders at the
+current price, and a RecordingWriter that keeps every trades row it would have written,
+i.e. the indicator outputs per update. Nothing touches the network or the database.
+
+Run from the repo root:  python infra/replay.py btc_MR_trades.db [--asset BTC/USDC] [--rows out.csv]
+"""
+import argparse, asyncio, csv, json, os, sqlite3, time
+import numpy as np
+import yaml
+import algo, backtest, BarStore, BarAggregator, feeds, logs, orders
+
+TRADE_COLUMNS = ("timestamp", "asset", "buy", "sell", "position", "quantity", "price", "volume", "mean", "std",
+                 "buy_line", "sell_line", "rsi", "di_plus", "di_minus", "macd")
+
+
+class ReplayClock:
+    """Callable like time.time(), returning the time of the record being replayed."""
+
+    def __init__(self, now_ms=0):
+        self.now_ms = now_ms
+
+    def __call__(self):
+        return self.now_ms / 1000
+
+
+class PaperBroker:
+    """Trader stand-in: market orders fill at the last replayed price, with optional fee and slippage."""
+
+    def __init__(self, fee=0.0, slippage=0.0):
+        self.fee = fee
+        self.slippage = slippage
+        self.prices = {}  # asset -> last price
+        self.holdings = {}  # asset -> qty
+        self.fills = []
+        self.clock = None
+
+    async def place_buy_order(self, symbol, usdc_amt=10, order_type="market"):
+        price = self.prices[symbol] * (1 + self.slippage)
+        qty = usdc_amt * (1 - self.fee) / price
+        self.holdings[symbol] = self.holdings.get(symbol, 0.0) + qty
+        return self._fill(symbol, "buy", qty, price)
+
+    async def place_sell_order(self, symbol):
+        qty = self.holdings.pop(symbol, 0.0)
+        if qty <= 0:
+            return orders.ack(symbol, "sell", False, error=f"No {symbol} position found.", flat=True)
+        return self._fill(symbol, "sell", qty, self.prices[symbol] * (1 - self.slippage))
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def _fill(self, symbol, side, qty, price):
+        timestamp = int(self.clock() * 1000) if self.clock else None
+        self.fills.append({"timestamp": timestamp, "asset": symbol, "side": side, "qty": qty, "price": price})
+        return orders.ack(symbol, side, True, str(len(self.fills)), qty, price, timestamp)
+
+
+class RecordingWriter:
+    """TradeWriter stand-in that keeps the rows in memory."""
+
+    def __init__(self):
+        self.rows = []
+
+    async def start(self):
+        pass
+
+    def write(self, row, urgent=False):
+        self.rows.append(row)
+
+    async def close(self):
+        pass
+
+
+# readers: each yields BarStore.Bar / BarStore.Trade records in time order
+
+def read_db(path, asset="BTC/USDC", interval_ms=60_000):
+    """
+    Bot-written tables hold kline snapshots (bar-aligned timestamps, cumulative volume); they
+    are replayed as the same forming-bar updates the bot saw. Older raw-trade tables yield Trades.
+    """
+    conn = sqlite3.connect(path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(trades)")]
+    query, params = "SELECT timestamp, price, volume FROM trades", ()
+    if "asset" in columns:
+        query, params = query + " WHERE asset = ?", (asset,)
+    rows = conn.execute(query + " ORDER BY rowid", params).fetchall()
+    conn.close()
+    if not rows:
+        return
+
+    symbol = asset.replace("/", "")
+    timestamps, prices, volumes = zip(*rows)
+    timestamps = np.array(timestamps, dtype="datetime64[ms]").astype(np.int64).tolist()
+    volumes = np.nan_to_num(np.array(volumes, dtype=np.float64)).tolist()
+    if any(t % interval_ms for t in timestamps):
+        for t, price, volume in zip(timestamps, prices, volumes):
+            yield BarStore.Trade(symbol, t, price, volume)
+        return
+
+    bar_start, high, low, first = None, 0.0, 0.0, 0.0
+    for t, price, volume in zip(timestamps, prices, volumes):
+        if t != bar_start:
+            bar_start, first, high, low = t, price, price, price
+        else:
+            high, low = max(high, price), min(low, price)
+        yield BarStore.Bar(symbol, t, first, high, low, price, volume)
+
+def read_bars(path, asset="BTC/USDC"):
+    """CSV files and BarArchive roots, one update per finished bar."""
+    bars = backtest.load_csv(path) if path.lower().endswith(".csv") else backtest.load_archive(path, asset.replace("/", ""))
+    yield from feeds.bars_from_arrays(asset.replace("/", ""), bars)
+
+def read_capture(path, adapter=None):
+    """Raw frames recorded by feeds.Feed(capture=...), decoded by the adapter that received them."""
+    adapter = adapter or feeds.BinanceAdapter()
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield from adapter.decode(line.rstrip("\n"))
+
+def read(path, asset="BTC/USDC", source="auto"):
+    if source == "auto":
+        if os.path.isdir(path) or path.lower().endswith(".csv"):
+            source = "bars"
+        elif path.lower().endswith((".jsonl", ".ndjson", ".capture")):
+            source = "capture"
+        else:
+            source = "db"
+    if source == "db":
+        return read_db(path, asset)
+    if source == "capture":
+        return read_capture(path)
+    return read_bars(path, asset)
+
+
+class Replay:
+    """
+    Drives one TradingBot from a record stream. Orders are awaited before the next record, so
+    a run is deterministic: the same input and config always give the same fills and rows.
+    """
+
+    def __init__(self, config, asset=None, fee=0.0, slippage=0.0):
+        self.clock = ReplayClock()
+        self.broker = PaperBroker(fee, slippage)
+        self.broker.clock = self.clock
+        self.writer = RecordingWriter()
+        self.bot = algo.TradingBot(asset, trader=self.broker, writer=self.writer, config=config, clock=self.clock)
+        self.bot.snapshot_path = None
+        bar_ms = BarAggregator.interval_ms(self.bot.bar_interval)
+        self.bar_ms = bar_ms or 0
+        self.builder = feeds.BarBuilder(self.on_bar, self.bot.bar_interval)
+        self.updates = 0
+        self.elapsed = 0.0
+
+    def on_bar(self, bar):
+        self.updates += 1
+        self.bot.on_new_data(bar)
+
+    async def run(self, records, limit=None):
+        bot, clock, prices = self.bot, self.clock, self.broker.prices
+        asset, symbol = bot.asset, bot.symbol
+        started = time.perf_counter()
+        for n, record in enumerate(records):
+            if limit is not None and n >= limit:
+                break
+            if record.symbol != symbol:
+                continue
+            if type(record) is BarStore.Trade:
+                clock.now_ms = record.timestamp
+                prices[asset] = record.price
+            else:
+                clock.now_ms = max(clock.now_ms, record.timestamp + self.bar_ms - 1)  # an update from within the bar
+                prices[asset] = record.close
+            self.builder(record)
+            if bot.order_task and not bot.order_task.done():
+                await bot.order_task
+        self.elapsed = time.perf_counter() - started
+        return self
+
+    def report(self):
+        rate = self.updates / self.elapsed if self.elapsed else 0.0
+        pnl, entry = 0.0, None
+        for fill in self.broker.fills:
+            if fill["side"] == "buy":
+                entry = fill
+            elif entry:
+                pnl += fill["qty"] * fill["price"] - entry["qty"] * entry["price"]
+                entry = None
+        lines = [
+            f"Replayed {self.updates:,} bar updates in {self.elapsed:.2f} s ({rate:,.0f}/s, {rate * 60 / 1e6:.2f}M/min)",
+            f"Orders: {len(self.broker.fills)} fills, closed round-trip P&L {pnl:+.4f} quote",
+        ]
+        return "\n".join(lines)
+
+    def save_rows(self, path):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(TRADE_COLUMNS)
+            writer.writerows(self.writer.rows)
+
+    def save_fills(self, path):
+        with open(path, "w") as file:
+            json.dump(self.broker.fills, file, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded stream through TradingBot")
+    parser.add_argument("path", help=".db trades table, OHLCV .csv, BarArchive directory or .jsonl frame capture")
+    parser.add_argument("--asset", help="defaults to trading_config.asset")
+    parser.add_argument("--source", default="auto", choices=["auto", "db", "bars", "capture"])
+    parser.add_argument("--config", default="infra/config.yaml")
+    parser.add_argument("--bar-interval", help="override trading_config.bar_interval")
+    parser.add_argument("--fee", type=float, default=0.0)
+    parser.add_argument("--slippage", type=float, default=0.0)
+    parser.add_argument("--limit", type=int, help="stop after this many records")
+    parser.add_argument("--rows", help="write the recorded trades rows (indicator outputs) to this CSV")
+    parser.add_argument("--fills", help="write the fills to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="keep the bot's INFO logs")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and print the top functions")
+    args = parser.parse_args()
+
+    with open(args.config, "r") as file:
+        config = yaml.safe_load(file)
+    if args.bar_interval:
+        config["trading_config"]["bar_interval"] = args.bar_interval
+    if not args.verbose:
+        logs.get("algo").setLevel("WARNING")
+
+    replay = Replay(config, args.asset, args.fee, args.slippage)
+    records = read(args.path, replay.bot.asset, args.source)
+    if args.profile:
+        import cProfile, pstats
+        profiler = cProfile.Profile()
+        profiler.runcall(asyncio.run, replay.run(records, args.limit))
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    else:
+        asyncio.run(replay.run(records, args.limit))
+
+    print(replay.report())
+    if args.rows:
+        replay.save_rows(args.rows)
+        print(f"💾 {len(replay.writer.rows):,} rows -> {args.rows}")
+    if args.fills:
+        replay.save_fills(args.fills)
+        print(f"💾 {len(replay.broker.fills)} fills -> {args.fills}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Multiprocess runtime: network I/O in this process, strategy work sharded over worker processes.
+
+The parent runs the websocket feed, the REST primer and the trader. Each symbol belongs to
+one worker (crc32 of the symbol mod the worker count), which runs its TradingBots:
+indicators, signals, snapshots and its own SQLite file (<db>_shard<n>.db).
+
+Bars go to the workers through multiprocessing.shared_memory ring buffers. Each ring has a
+single producer and a single consumer: the producer owns the head index and the consumer
+owns the tail, so neither side takes a lock. A second ring per worker carries buy/sell
+signals back; the parent places the order and answers with an ACK record on the bar ring,
+which resolves the order the bot is awaiting. When a worker falls behind and its ring is
+full, the parent queues records in a per-worker backlog that a task drains in order, so
+the event loop never waits on a worker and bars are never dropped.
+
+Enable with trading_config.shards (worker count) together with trading_config.symbols.
+infra/bench_shards.py measures throughput against the worker count.
+"""
+import asyncio, collections, multiprocessing, os, time, zlib
+from multiprocessing import shared_memory
+import numpy as np
+import algo, BarStore, BinanceUSPrimer, BinanceUSTrader, BinanceUSWebsocketClient, QuoteCache, TradeWriter, logs, orders
+
+log = logs.get(__name__)
+
+# record kinds; parent -> worker
+BAR, PRIME, PRIMED, ACK, STOP = 0, 1, 2, 3, 4
+# worker -> parent
+BUY, SELL, READY, DONE = 10, 11, 12, 13
+
+RECORD = np.dtype([("kind", "<i4"), ("symbol", "<i4"), ("timestamp", "<i8"),
+                   ("a", "<f8"), ("b", "<f8"), ("c", "<f8"), ("d", "<f8"), ("e", "<f8")])
+HEADER = 128  # head and tail on separate cache lines
+BATCH = 4096  # records a worker takes per read
+
+
+def shard_of(symbol, shards):
+    """Stable across processes and runs, unlike hash() on str."""
+    return zlib.crc32(symbol.encode()) % shards
+
+
+class Ring:
+    """Single-producer / single-consumer ring of RECORDs in shared memory."""
+
+    def __init__(self, capacity=65536, name=None):
+        size = HEADER + capacity * RECORD.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.owner = name is None
+        self.name = self.shm.name
+        self.capacity = capacity
+        buf = self.shm.buf
+        self.head = np.ndarray(1, np.uint64, buf, 0)  # next slot to write; producer only
+        self.tail = np.ndarray(1, np.uint64, buf, 64)  # next slot to read; consumer only
+        self.slots = np.ndarray(capacity, RECORD, buf, HEADER)
+        if self.owner:
+            self.head[0] = self.tail[0] = 0
+
+    def put(self, kind, symbol, timestamp, a=0.0, b=0.0, c=0.0, d=0.0, e=0.0):
+        """Writes one record; False when the ring is full."""
+        head = int(self.head[0])
+        if head - int(self.tail[0]) >= self.capacity:
+            return False
+        self.slots[head % self.capacity] = (kind, symbol, timestamp, a, b, c, d, e)
+        self.head[0] = head + 1  # publish after the slot is written
+        return True
+
+    def take(self, limit=BATCH):
+        """Reads up to limit records as a list of tuples and frees their slots."""
+        tail = int(self.tail[0])
+        count = min(int(self.head[0]) - tail, limit)
+        if count <= 0:
+            return []
+        start = tail % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            records = self.slots[start:end].tolist()
+        else:
+            records = self.slots[start:].tolist() + self.slots[:end - self.capacity].tolist()
+        self.tail[0] = tail + count
+        return records
+
+    def close(self):
+        del self.head, self.tail, self.slots  # views must go before the mapping closes
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class ShardTrader:
+    """Worker-side trader: sends the order as a signal record and waits for the parent's ACK."""
+
+    def __init__(self, outbox, ids):
+        self.outbox = outbox
+        self.ids = ids  # asset -> symbol id
+        self.assets = {sid: asset for asset, sid in ids.items()}
+        self.pending = {}  # symbol id -> (side, Future)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def place_buy_order(self, symbol, usdc_amt=10, order_type="market"):
+        return await self.send(BUY, "buy", symbol, usdc_amt)
+
+    async def place_sell_order(self, symbol):
+        return await self.send(SELL, "sell", symbol, 0.0)
+
+    async def send(self, kind, side, asset, amount):
+        sid = self.ids[asset]
+        future = asyncio.get_running_loop().create_future()
+        self.pending[sid] = (side, future)
+        while not self.outbox.put(kind, sid, int(time.time() * 1000), amount):
+            await asyncio.sleep(0.001)
+        return await future
+
+    def resolve(self, sid, ok, qty, price, total_ms):
+        side, future = self.pending.pop(sid, (None, None))
+        if future and not future.done():
+            ack = orders.ack(self.assets[sid], side, ok > 0, None, qty, price or None, timings={"total_ms": total_ms}, flat=ok < 0)
+            future.set_result(ack)
+
+
+class DiscardWriter:
+    """TradeWriter stand-in for runs that do not keep the trades rows (benchmarks)."""
+
+    async def start(self):
+        pass
+
+    def write(self, row, urgent=False):
+        pass
+
+    async def close(self):
+        pass
+
+
+class ShardWorker:
+    def __init__(self, index, assets, inbox, outbox, config, db_path=None, snapshots=True):
+        self.index = index
+        self.inbox = inbox
+        self.outbox = outbox
+        shards = config["trading_config"]["shards"]
+        ids = {asset: sid for sid, asset in enumerate(assets)}
+        mine = {asset: sid for asset, sid in ids.items() if shard_of(asset.replace("/", ""), shards) == index}
+        self.trader = ShardTrader(outbox, mine)
+        self.writer = TradeWriter.TradeWriter(db_path) if db_path else DiscardWriter()
+        self.bots = {sid: algo.TradingBot(asset, trader=self.trader, writer=self.writer, config=config) for asset, sid in mine.items()}
+        if not snapshots:
+            for bot in self.bots.values():
+                bot.snapshot_path = None
+        self.updates = 0
+
+    async def run(self):
+        await self.writer.start()
+        for bot in self.bots.values():
+            bot.load_snapshot()
+        self.outbox.put(READY, self.index, 0)
+        bots, take, idle = self.bots, self.inbox.take, 0
+        try:
+            while True:
+                records = take()
+                if not records:
+                    idle += 1
+                    await asyncio.sleep(0 if idle < 100 else 0.0005)  # spin briefly, then back off
+                    continue
+                idle = 0
+                for kind, sid, timestamp, a, b, c, d, e in records:
+                    bot = bots.get(sid)
+                    if kind == BAR:
+                        self.updates += 1
+                        bot.on_new_data(BarStore.Bar(bot.symbol, timestamp, a, b, c, d, e))
+                    elif kind == ACK:
+                        self.trader.resolve(sid, a, b, c, d)
+                    elif kind == PRIME:
+                        if not bot.bars or timestamp >= bot.bars.last_timestamp:  # a restored window may already hold it
+                            bot.push_bar(BarStore.Bar(bot.symbol, timestamp, a, b, c, d, e))
+                    elif kind == PRIMED:
+                        if bot.bars:
+                            bot.refresh_indicators(bot.bars.bar())
+                    elif kind == STOP:
+                        return
+                await asyncio.sleep(0)  # let order tasks run between batches
+        finally:
+            pending = [bot.order_task for bot in bots.values() if bot.order_task and not bot.order_task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*(bot.flush_snapshot() for bot in bots.values()))
+            await self.writer.close()
+            self.outbox.put(DONE, self.index, 0, float(self.updates))
+
+
+def run_worker(index, assets, inbox_name, outbox_name, capacity, config, db_path, snapshots):
+    """Worker process entry point (must be importable for the spawn start method)."""
+    settings = dict(config.get("logging") or {})
+    if settings.get("file", "trading.log.jsonl"):
+        settings["file"] = f"{settings.get('file', 'trading.log.jsonl')}.shard{index}"
+    logs.setup(settings)
+    inbox, outbox = Ring(capacity, inbox_name), Ring(capacity, outbox_name)
+    try:
+        asyncio.run(ShardWorker(index, assets, inbox, outbox, config, db_path, snapshots).run())
+    finally:
+        inbox.close()
+        outbox.close()
+        logs.shutdown()
+
+
+class ShardedRuntime:
+    """
+    Parent process: owns the feed, the primer and the trader, routes bars to the shard
+    workers and turns their signals into orders.
+    """
+
+    def __init__(self, assets, config, workers=None, db_path="btc_MR_trades.db", capacity=65536, trader=None, live=True, snapshots=True):
+        """
+        :param db_path: each worker writes <db>_shard<n>.db; None keeps no trades rows
+        :param live: False skips the websocket client and default trader (benchmarks drive on_new_data directly)
+        """
+        self.assets = list(assets)
+        self.workers = workers or config["trading_config"].get("shards") or os.cpu_count()
+        self.config = {**config, "trading_config": {**config["trading_config"], "shards": self.workers}}
+        self.ids = {asset.replace("/", ""): sid for sid, asset in enumerate(self.assets)}
+        self.route = [shard_of(asset.replace("/", ""), self.workers) for asset in self.assets]
+        self.db_path = db_path
+        self.snapshots = snapshots
+        self.capacity = capacity
+        self.inboxes = [Ring(capacity) for _ in range(self.workers)]
+        self.outboxes = [Ring(capacity) for _ in range(self.workers)]
+        self.processes = []
+        self.backlogs = [collections.deque() for _ in range(self.workers)]  # records waiting for room in a full ring
+        self.drainers = [None] * self.workers  # task moving each backlog into its ring
+        self.stalls = 0  # puts that found a worker's ring full
+        self.updates = {}  # worker -> bar updates processed, reported on exit
+        self.order_tasks = set()
+
+        self.quotes = QuoteCache.QuoteCache(config["trading_config"].get("quote_max_age", 5))
+        self.trader = trader or (BinanceUSTrader.BinanceUSTrader(quotes=self.quotes) if live else None)
+        self.data_stream = None
+        if live:
+            bar_interval = config["trading_config"].get("bar_interval") or "1m"
+            self.data_stream = BinanceUSWebsocketClient.BinanceUSWebsocketClient(self, symbols=list(self.ids), bar_interval=None if bar_interval == "1m" else bar_interval,
+                                                                                 quotes=self.quotes)
+
+    def spawn(self):
+        """Starts the workers and waits until each has built its bots."""
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            db_path = self.db_path.replace(".db", f"_shard{index}.db") if self.db_path else None
+            process = context.Process(target=run_worker, name=f"shard-{index}", daemon=True,
+                                      args=(index, self.assets, self.inboxes[index].name, self.outboxes[index].name,
+                                            self.capacity, self.config, db_path, self.snapshots))
+            process.start()
+            self.processes.append(process)
+        waiting = set(range(self.workers))
+        while waiting:
+            for index in list(waiting):
+                if any(record[0] == READY for record in self.outboxes[index].take()):
+                    waiting.discard(index)
+                elif not self.processes[index].is_alive():
+                    raise RuntimeError(f"shard worker {index} exited during startup (code {self.processes[index].exitcode})")
+            time.sleep(0.01)
+        log.info("🧩 %d shard worker(s) ready for %d symbol(s)", self.workers, len(self.assets))
+
+    def push(self, shard, kind, sid, timestamp, a=0.0, b=0.0, c=0.0, d=0.0, e=0.0):
+        """Sends a record to the worker without blocking; behind a full ring it waits in the shard's backlog."""
+        backlog = self.backlogs[shard]
+        if not backlog and self.inboxes[shard].put(kind, sid, timestamp, a, b, c, d, e):
+            return
+        self.stalls += 1
+        backlog.append((kind, sid, timestamp, a, b, c, d, e))  # after anything already waiting, to keep the order
+        if self.drainers[shard] is None or self.drainers[shard].done():
+            self.drainers[shard] = asyncio.get_running_loop().create_task(self.drain(shard))
+
+    async def drain(self, shard):
+        """Moves the backlog into the ring as the worker frees slots."""
+        ring, backlog = self.inboxes[shard], self.backlogs[shard]
+        while backlog:
+            if ring.put(*backlog[0]):
+                backlog.popleft()
+            else:
+                await asyncio.sleep(0.0005)
+
+    def on_new_data(self, bar):
+        """Feed callback: routes the bar to its symbol's worker."""
+        sid = self.ids.get(bar.symbol)
+        if sid is not None:
+            self.push(self.route[sid], BAR, sid, bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume)
+
+    async def prime(self):
+        """
+        Fetches the recent bars per symbol here (network stays in this process) and ships them to the
+        workers. The REST calls run on worker threads; the records are pushed from the event loop.
+        """
+        async def prime_symbol(symbol):
+            self.data_prime(await asyncio.to_thread(BinanceUSPrimer.BinanceUSPrimer(symbol=symbol).fetch))
+
+        await asyncio.gather(*(prime_symbol(symbol) for symbol in self.ids))
+
+    def data_prime(self, bars):
+        """Ships a batch of one symbol's historical bars (prime or reconnect backfill) as PRIME records: no signals."""
+        sid = self.ids.get(bars[0].symbol) if bars else None
+        if sid is None:
+            return
+        for bar in bars:
+            self.push(self.route[sid], PRIME, sid, bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume)
+        self.push(self.route[sid], PRIMED, sid, 0)
+
+    def poll(self):
+        """Drains the signal rings: starts orders, collects exit reports. Returns the number of records."""
+        count = 0
+        for index, outbox in enumerate(self.outboxes):
+            for kind, sid, timestamp, amount, *_ in outbox.take():
+                count += 1
+                if kind in (BUY, SELL):
+                    task = asyncio.get_running_loop().create_task(self.order(index, kind, sid, amount))
+                    self.order_tasks.add(task)
+                    task.add_done_callback(self.order_tasks.discard)
+                elif kind == DONE:
+                    self.updates[index] = int(amount)
+        return count
+
+    async def order(self, shard, kind, sid, amount):
+        asset = self.assets[sid]
+        try:
+            if kind == BUY:
+                ack = await self.trader.place_buy_order(asset, amount)
+            else:
+                ack = await self.trader.place_sell_order(asset)
+        except Exception as e:
+            log.error("Order for %s failed: %r", asset, e, extra={"symbol": asset})
+            ack = orders.ack(asset, "buy" if kind == BUY else "sell", False, error=str(e))
+        outcome = 1.0 if ack.ok else -1.0 if ack.flat else 0.0
+        self.push(shard, ACK, sid, 0, outcome, ack.qty or 0.0, ack.price or 0.0, ack.timings.get("total_ms", 0.0))
+
+    async def poll_signals(self):
+        while True:
+            if not self.poll():
+                await asyncio.sleep(0.001)
+
+    async def stop(self):
+        """Sends STOP, waits for every worker to save and exit, then frees the rings."""
+        for index in range(self.workers):
+            self.push(index, STOP, 0, 0)
+        while len(self.updates) < self.workers and any(process.is_alive() for process in self.processes):
+            if not self.poll():
+                await asyncio.sleep(0.001)
+        for process in self.processes:
+            await asyncio.to_thread(process.join, 10)
+        for drainer in self.drainers:
+            if drainer:
+                drainer.cancel()
+        for ring in self.inboxes + self.outboxes:
+            ring.close()
+
+    async def start(self):
+        self.spawn()
+        await self.trader.start()
+        poller = asyncio.get_running_loop().create_task(self.poll_signals())
+        try:
+            await self.prime()
+            await self.data_stream.start()
+        finally:
+            poller.cancel()
+            if self.order_tasks:  # their ACKs reach the workers ahead of STOP
+                await asyncio.gather(*self.order_tasks, return_exceptions=True)
+            await self.stop()
+            await self.trader.close()
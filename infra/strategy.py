@@ -0,0 +1,24 @@
+"""
+Mean-reversion entry/exit rules shared by the live bot (scalars) and the backtester (arrays).
+Every function works on floats and on NumPy arrays alike.
+"""
+
+def bands(mean, std, bollinger_std_width, sell_std):
+    """Returns (buy_line, sell_line): buy below mean - width*std, sell above mean + sell_std*std."""
+    buy_line = mean - std * bollinger_std_width
+    sell_line = mean + std * sell_std
+    return buy_line, sell_line
+
+def entry_signal(price, buy_line):
+    return price < buy_line
+
+def take_profit(price, sell_line):
+    """Hold condition no longer met."""
+    return price > sell_line
+
+def stop_loss(price, buy_price, loss_threshold):
+    """Price dropped more than (1 - loss_threshold) below the buy price."""
+    return price < loss_threshold * buy_price
+
+def exit_signal(price, sell_line, buy_price, loss_threshold):
+    return take_profit(price, sell_line) | stop_loss(price, buy_price, loss_threshold)
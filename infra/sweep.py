@@ -0,0 +1,139 @@
+"""
+Parallel parameter sweep over the backtester.
+
+Price history for every source is loaded once in the parent and copied into
+multiprocessing.shared_memory blocks; worker processes attach to those blocks at
+start-up, so tasks only carry parameter tuples and no price data is pickled. Tasks
+are grouped by (source, window) and each worker caches the rolling mean/std for a
+window, so the indicator pass is reused by every parameter combo that shares it.
+
+Run from the repo root:
+    python infra/sweep.py data_collection/btc_MR_trades.db data_collection/btc_trades.db \
+        --std 1.5 1.75 2 2.25 --sell-std -0.5 -0.35 0 --loss 0.97 0.98 0.99 --out sweep_results.csv
+"""
+import argparse, csv, itertools, os, random, time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import backtest, indicators
+
+PARAMS = ("window", "bollinger_std_width", "sell_std", "loss_threshold", "fee", "slippage")
+RESULT_COLUMNS = ("source",) + PARAMS + ("growth", "trades", "win_rate", "max_drawdown")
+
+# worker state: source -> {"timestamp": array, "close": array}, and (source, window) -> (mean, std)
+_arrays = {}
+_blocks = []
+_bands = {}
+
+def cartesian(grid):
+    """All combinations of a {param: [values]} grid, as dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def sample(grid, count, seed=0):
+    """`count` random combinations from a {param: [values]} grid."""
+    combos = cartesian(grid)
+    return random.Random(seed).sample(combos, min(count, len(combos)))
+
+def share(bars):
+    """Copies timestamp/close arrays into shared memory. Returns (descriptor, blocks)."""
+    descriptor, blocks = {}, []
+    for name in ("timestamp", "close"):
+        array = np.ascontiguousarray(bars[name])
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+        descriptor[name] = (block.name, array.shape, array.dtype.str)
+        blocks.append(block)
+    return descriptor, blocks
+
+def _attach(descriptors):
+    for source, descriptor in descriptors.items():
+        arrays = {}
+        for name, (block_name, shape, dtype) in descriptor.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            _blocks.append(block)  # keep the mapping alive for the life of the worker
+            arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        _arrays[source] = arrays
+
+def _evaluate(source, window, combos):
+    bars = _arrays[source]
+    key = (source, window)
+    if key not in _bands:
+        _bands[key] = indicators.rolling_mean_std(bars["close"], window)
+
+    rows = []
+    for combo in combos:
+        result = backtest.run(bars, combo["bollinger_std_width"], combo["sell_std"], combo["loss_threshold"],
+                              window, combo["fee"], combo["slippage"], bands=_bands[key])
+        trades = result.trades
+        win_rate = float(np.mean(trades["ratio"] > 1)) if len(trades) else 0.0
+        rows.append((source,) + tuple(combo[p] for p in PARAMS) +
+                    (result.growth, len(trades), win_rate, result.max_drawdown))
+    return rows
+
+def run_sweep(sources, combos, processes=None, chunk=32, out="sweep_results.csv"):
+    """
+    Evaluates every combo on every source in a process pool and writes one CSV row per result.
+
+    :param sources: {name: bars dict}, e.g. {path: backtest.load(path)}.
+    :param combos: list of dicts with the keys in PARAMS (missing fee/slippage default to 0).
+    :return: list of result rows, best growth first.
+    """
+    combos = [{"fee": 0.0, "slippage": 0.0, **combo} for combo in combos]
+    by_window = {}
+    for combo in combos:
+        by_window.setdefault(combo["window"], []).append(combo)
+
+    descriptors, blocks = {}, []
+    try:
+        for name, bars in sources.items():
+            descriptors[name], owned = share(bars)
+            blocks.extend(owned)
+
+        tasks = [(source, window, window_combos[i:i + chunk])
+                 for source in sources
+                 for window, window_combos in by_window.items()
+                 for i in range(0, len(window_combos), chunk)]
+
+        rows = []
+        with ProcessPoolExecutor(max_workers=processes or os.cpu_count(), initializer=_attach, initargs=(descriptors,)) as pool:
+            futures = [pool.submit(_evaluate, *task) for task in tasks]
+            for future in futures:
+                rows.extend(future.result())
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    rows.sort(key=lambda row: row[RESULT_COLUMNS.index("growth")], reverse=True)
+    if out:
+        with open(out, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(RESULT_COLUMNS)
+            writer.writerows(rows)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid / random search over the strategy parameters.")
+    parser.add_argument("paths", nargs="+", help="trades .db, OHLCV .csv or BarArchive directories")
+    parser.add_argument("--window", type=int, nargs="+", default=[60])
+    parser.add_argument("--std", type=float, nargs="+", default=[1.5, 1.75, 2.0, 2.25, 2.5])
+    parser.add_argument("--sell-std", type=float, nargs="+", default=[-0.5, -0.35, -0.2, 0.0])
+    parser.add_argument("--loss", type=float, nargs="+", default=[0.97, 0.98, 0.99])
+    parser.add_argument("--fee", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--slippage", type=float, nargs="+", default=[0.0])
+    parser.add_argument("--random", type=int, default=0, help="sample this many combos instead of the full grid")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    grid = {"window": args.window, "bollinger_std_width": args.std, "sell_std": args.sell_std,
+            "loss_threshold": args.loss, "fee": args.fee, "slippage": args.slippage}
+    combos = sample(grid, args.random) if args.random else cartesian(grid)
+    sources = {path: backtest.load(path) for path in args.paths}
+
+    started = time.perf_counter()
+    rows = run_sweep(sources, combos, args.processes, out=args.out)
+    print(f"Evaluated {len(rows)} runs ({len(combos)} combos x {len(sources)} sources) in {time.perf_counter() - started:.2f} s -> {args.out}")
+    for row in rows[:10]:
+        print("  " + "  ".join(f"{name}={value:.4g}" if isinstance(value, float) else f"{name}={value}" for name, value in zip(RESULT_COLUMNS, row)))
@@ -1,8 +1,10 @@
-import websocket
-import json
+import asyncio
 import datetime
+import os, sys
 import sqlite3
-import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "infra"))
+import feeds
 
 # Initialize SQLite database
 conn = sqlite3.connect('xrp_trades.db')
@@ -18,54 +20,20 @@ cursor.execute('''
 ''')
 conn.commit()
 
-# WebSocket URL
-socket = "wss://ws.kraken.com/"
-
-def on_message(ws, message):
-    data = json.loads(message)
-    if isinstance(data, list) and len(data) > 1:
-        price = 0
-        volume = 0.0
-        timestamp = datetime.datetime.fromtimestamp(float(data[1][0][2])).strftime('%Y-%m-%d %H:%M:%S')
-
-        for trade in data[1]:
-            price = float(trade[0])
-            volume += float(trade[1])
-
-        print(f"Price: {price}, Volume: {volume}, Timestamp: {timestamp}\n{trade}")
-        cursor.execute("INSERT INTO trades (timestamp, price, volume) VALUES (?, ?, ?)", (timestamp, price, volume))
-        conn.commit()
-
-def on_error(ws, error):
-    print(f"Error: {error}")
-
-def on_close(ws, close_status_code, close_msg):
-    print("WebSocket closed. Reconnecting in 5 seconds...")
-
-def on_open(ws):
-    payload = {
-        "event": "subscribe",
-        "pair": ["XRP/USD"],
-        "subscription": {"name": "trade"}
-    }
-    ws.send(json.dumps(payload))
-
-def start_websocket():
-    """Keeps trying to reconnect to WebSocket on failure."""
-    while True:
-        try:
-            print("Connecting to WebSocket...")
-            ws = websocket.WebSocketApp(socket, 
-                                        on_message=on_message, 
-                                        on_error=on_error, 
-                                        on_close=on_close)
-            ws.on_open = on_open
-            ws.run_forever()
-        except Exception as e:
-            print(f"WebSocket error: {e}")
-        
-        print("Reconnecting in 5 seconds...")
-        time.sleep(5)  # Delay before attempting to reconnect
-
-# Start the WebSocket connection with auto-reconnect
-start_websocket()
+def on_trade(trade):
+    """One row per trade (BarStore.Trade from the Kraken adapter)."""
+    timestamp = datetime.datetime.fromtimestamp(trade.timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
+    print(f"Price: {trade.price}, Volume: {trade.volume}, Timestamp: {timestamp}")
+    cursor.execute("INSERT INTO trades (timestamp, price, volume) VALUES (?, ?, ?)", (timestamp, trade.price, trade.volume))
+    conn.commit()
+
+async def main():
+    """Streams XRP/USD trades; feeds.Feed reconnects with exponential backoff."""
+    feed = feeds.Feed(feeds.KrakenAdapter("wss://ws.kraken.com/"), ["XRP/USD"])
+    feed.subscribe(on_trade)
+    try:
+        await feed.start()
+    finally:
+        conn.close()
+
+asyncio.run(main())
@@ -0,0 +1,12 @@
+import os, sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "infra"))  # the modules import each other by bare name, as when run from infra/
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """Scripts read "infra/config.yaml" relative to the repo root."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
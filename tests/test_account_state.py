@@ -0,0 +1,140 @@
+import asyncio, json, time
+import pytest
+import websockets
+import AccountState
+
+T0 = 1_700_000_040_000
+
+
+def position(time_ms, **free):
+    return {"e": "outboundAccountPosition", "E": time_ms, "u": time_ms,
+            "B": [{"a": asset, "f": str(qty), "l": "0"} for asset, qty in free.items()]}
+
+
+class StubSource(AccountState.BinanceAccountSource):
+    """Binance's message format, with the snapshots and the stream URL supplied by the test."""
+    name = "stub"
+    keepalive_interval = None
+
+    def __init__(self, snapshots, url=None):
+        super().__init__(exchange=None, api_key=None)
+        self.snapshots = list(snapshots)
+        self.snapshots_read = 0
+        self.stream_url = url
+
+    async def snapshot(self):
+        self.snapshots_read += 1
+        return self.snapshots[min(self.snapshots_read, len(self.snapshots)) - 1]
+
+    async def url(self):
+        return self.stream_url
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+def test_adjustments_older_than_the_last_absolute_value_are_skipped():
+    account = AccountState.AccountState(StubSource([]))
+    source = account.source
+    for update in source.parse(position(T0, BTC=1.0)):
+        account.apply(update)
+    for update in source.parse({"e": "balanceUpdate", "a": "BTC", "d": "0.5", "T": T0 - 1}):
+        account.apply(update)  # already part of the position sent at T0
+    assert account.balance("BTC") == 1.0
+
+    account.adjust("BTC", 0.25, T0 + 1)
+    assert account.balance("BTC") == 1.25
+    account.apply(("set", "BTC", 2.0, T0 + 2))
+    account.on_fill("BTC", "USDC", "sell", 0.5, 100.0, T0 + 1, "order-1")  # sent before BTC's value was stamped
+    assert account.balance("BTC") == 2.0  # already in the position
+    assert account.balance("USDC") == 50.0  # no absolute value yet, so the proceeds count
+
+
+def test_fills_count_once_per_order_id():
+    account = AccountState.AccountState(StubSource([]))
+    account.on_fill("BTC", "USDC", "buy", 0.5, 100.0, order_id="order-1", fee=0.1, fee_key="USDC")
+    account.on_fill("BTC", "USDC", "buy", 0.5, 100.0, order_id="order-1", fee=0.1, fee_key="USDC")  # the ack after the stream
+    account.adjust("USDC", -50.0, order_id="order-1")
+    assert account.balance("BTC") == 0.5
+    assert account.balance("USDC") == pytest.approx(-50.1)  # fill and fee each once
+
+    account.on_fill("BTC", "USDC", "sell", 0.5, 110.0, order_id="order-2")
+    assert account.balance("BTC") == 0.0 and account.balance("USDC") == pytest.approx(4.9)
+
+
+def test_stream_updates_and_reload_on_reconnect():
+    async def run():
+        first_seen = asyncio.Event()
+        connections = []
+
+        async def serve(ws):
+            connections.append(ws)
+            if len(connections) == 1:
+                await ws.send(json.dumps(position(int(time.time() * 1000), BTC=1.5)))
+                await first_seen.wait()
+                return  # drop the first connection
+            await ws.send(json.dumps(position(int(time.time() * 1000) + 1000, BTC=2.5)))
+            await ws.wait_closed()
+
+        async with websockets.serve(serve, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            source = StubSource([{"BTC": 1.0, "USDC": 10.0}, {"BTC": 2.0, "USDC": 20.0}], f"ws://127.0.0.1:{port}")
+            account = AccountState.AccountState(source, reconcile_interval=60, backoff_initial=0.01, backoff_max=0.02)
+            await account.start()
+            try:
+                assert account.ready and account.balances == {"BTC": 1.0, "USDC": 10.0}
+                await wait_for(lambda: account.balance("BTC") == 1.5)
+                assert source.snapshots_read == 1
+                first_seen.set()
+
+                await wait_for(lambda: account.balance("BTC") == 2.5)
+                assert len(connections) == 2
+                assert source.snapshots_read == 2  # re-read after the reconnect
+                assert account.balance("USDC") == 20.0
+            finally:
+                await account.stop()
+            assert account.tasks == []
+
+    asyncio.run(run())
+
+
+class FakeExchange:
+    def __init__(self):
+        self.orders = []
+
+    async def fetch_balance(self):
+        raise AssertionError("sells are sized from the account state")
+
+    async def create_market_order(self, symbol, side, amount):
+        self.orders.append((symbol, side, amount))
+        return {"id": "order-1", "average": 100.0, "price": None, "filled": amount,
+                "fee": {"cost": 0.01, "currency": "USDC"}, "info": {"transactTime": T0}}
+
+
+def test_trader_sizes_sells_from_the_account_state(monkeypatch):
+    pytest.importorskip("ccxt")
+    import BinanceUSTrader, MarketMetadata, comms
+    messages = []
+    monkeypatch.setattr(comms, "send_message", messages.append)
+
+    trader = BinanceUSTrader.BinanceUSTrader()
+    trader.exchange = FakeExchange()
+    trader.markets.markets = {"BTCUSDC": MarketMetadata.Market("BTC/USDC", step="0.0001", min_notional="10", tick="0.01")}
+    trader.markets.loaded_at = time.time()
+    trader.account = AccountState.AccountState(StubSource([{"BTC": 0.12345, "USDC": 5.0}]))
+
+    async def run():
+        await trader.account.load()
+        await asyncio.sleep(0.01)  # the order goes out after the snapshot's stamp
+        return await trader.place_sell_order("BTC/USDC")
+
+    ack = asyncio.run(run())
+    assert ack.ok and ack.qty == 0.1234  # rounded down to the lot step
+    assert trader.exchange.orders == [("BTC/USDC", "sell", 0.1234)]
+    assert trader.account.balance("BTC") == pytest.approx(0.00005)
+    assert trader.account.balance("USDC") == pytest.approx(5.0 + 12.34 - 0.01)
+    assert messages and messages[0].startswith("SELL 0.1234 BTC/USDC")
@@ -0,0 +1,42 @@
+import sqlite3
+from datetime import datetime, timedelta
+import numpy as np
+import backtest
+
+START = datetime(2025, 4, 5, 20, 0)
+MINUTE = 60_000
+
+
+def write_trades(path, rows):
+    """rows: (minute offset, price, cumulative volume) in insertion order, as the bot writes them."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE trades (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, asset TEXT, price REAL, volume REAL)")
+    conn.executemany("INSERT INTO trades (timestamp, asset, price, volume) VALUES (?, 'BTC/USDC', ?, ?)",
+                     [((START + timedelta(minutes=minute)).isoformat(), price, volume) for minute, price, volume in rows])
+    conn.commit()
+    conn.close()
+
+
+def test_reprimed_rows_collapse_into_time_ordered_bars(tmp_path):
+    live = []
+    for minute in range(6):  # three kline snapshots per minute
+        live += [(minute, 100.0 + minute, 0.0), (minute, 100.5 + minute, 0.1), (minute, 100.2 + minute, 0.2)]
+    reprimed = [(minute, 100.2 + minute, 0.2) for minute in range(6)]  # a restart primes the window again
+    after = [(6, 106.0, 0.0), (6, 106.3, 0.3)]
+    path = str(tmp_path / "trades.db")
+    write_trades(path, live + reprimed + after)
+
+    bars = backtest.load(path, "BTC/USDC")
+    assert np.array_equal(bars["timestamp"], bars["timestamp"][0] + np.arange(7) * MINUTE)  # one bar per minute, in order
+    assert np.allclose(bars["open"], [100.0 + m for m in range(6)] + [106.0])
+    assert np.allclose(bars["high"], [100.5 + m for m in range(6)] + [106.3])
+    assert np.allclose(bars["close"], [100.2 + m for m in range(6)] + [106.3])
+    assert np.allclose(bars["volume"], [0.2] * 6 + [0.3])
+
+
+def test_later_rows_for_a_minute_give_its_close(tmp_path):
+    path = str(tmp_path / "trades.db")
+    write_trades(path, [(0, 100.0, 0.1), (1, 101.0, 0.1), (0, 100.7, 0.4)])  # the re-primed kline for minute 0 comes last
+    bars = backtest.load(path)
+    assert len(bars["timestamp"]) == 2
+    assert np.allclose(bars["close"], [100.7, 101.0]) and np.allclose(bars["volume"], [0.4, 0.1])
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import BarAggregator, BarStore
+
+T0 = 1_743_883_200_000  # 2025-04-05 20:00 UTC
+FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+
+
+def ticks(count, seed):
+    """A trade stream with bursts in the same millisecond and quiet gaps longer than a bar."""
+    rng = np.random.default_rng(seed)
+    gaps = rng.choice([0, 0, 1, 250, 900, 4000, 70_000], size=count)
+    timestamps = T0 + np.cumsum(gaps)
+    prices = 100.0 * np.cumprod(1 + rng.normal(0, 0.001, count))
+    volumes = rng.exponential(3.0, count)
+    return timestamps, prices, volumes
+
+
+def by_add(aggregator, timestamps, prices, volumes):
+    closed = [aggregator.add(int(t), float(p), float(v)) for t, p, v in zip(timestamps, prices, volumes)]
+    return [bar for bar in closed if bar]
+
+
+def as_bars(symbol, arrays):
+    return [BarStore.Bar(symbol, int(t), o, h, l, c, v) for t, o, h, l, c, v in zip(*(arrays[name] for name in FIELDS))]
+
+
+def assert_same(expected, actual):
+    assert [bar.timestamp for bar in actual] == [bar.timestamp for bar in expected]
+    np.testing.assert_allclose([bar[2:] for bar in actual], [bar[2:] for bar in expected], rtol=1e-12)
+
+
+def assert_open(expected, actual):
+    """Both carry the same open bar into the next batch."""
+    if expected.current() is None:
+        assert actual.current() is None
+    else:
+        assert_same([expected.current()], [actual.current()])
+        assert (actual.count, actual.level, actual.last_emitted) == (expected.count, expected.level, expected.last_emitted)
+
+
+@pytest.mark.parametrize("interval", ["1s", "5s", "1m", "10v", "25.5v", "1t", "7t"])
+def test_add_arrays_builds_the_same_bars_as_add(interval):
+    timestamps, prices, volumes = ticks(3000, seed=3)
+    one_by_one = BarAggregator.BarAggregator("BTCUSDC", interval)
+    batched = BarAggregator.BarAggregator("BTCUSDC", interval)
+
+    expected, actual = [], []
+    cuts = [0, 1, 2, 17, 400, 401, 1333, 2999, 3000]  # batches of one tick, empty ones and a long one
+    for start, stop in zip(cuts, cuts[1:] + [3000]):
+        expected += by_add(one_by_one, timestamps[start:stop], prices[start:stop], volumes[start:stop])
+        actual += as_bars("BTCUSDC", batched.add_arrays(timestamps[start:stop], prices[start:stop], volumes[start:stop]))
+        assert_open(one_by_one, batched)
+
+    assert len(expected) > 10
+    assert_same(expected, actual)
+    assert all(b.timestamp > a.timestamp for a, b in zip(actual, actual[1:]))
+    assert_open(one_by_one, batched)
+    assert one_by_one.flush() == batched.flush()
+
+
+def test_add_trades_matches_add():
+    timestamps, prices, volumes = ticks(500, seed=4)
+    trades = [BarStore.Trade("BTCUSDC", int(t), float(p), float(v)) for t, p, v in zip(timestamps, prices, volumes)]
+    expected = by_add(BarAggregator.BarAggregator("BTCUSDC", "5s"), timestamps, prices, volumes)
+    assert_same(expected, BarAggregator.BarAggregator("BTCUSDC", "5s").add_trades(trades))
+
+
+def test_flush_waits_for_the_end_of_a_time_bar():
+    aggregator = BarAggregator.BarAggregator("BTCUSDC", "1m")
+    assert aggregator.flush() is None
+    aggregator.add(T0 + 1_000, 100.0, 1.0)
+    aggregator.add(T0 + 30_000, 101.0, 2.0)
+    assert aggregator.flush(T0 + 59_999) is None  # the minute has not ended
+    bar = aggregator.flush(T0 + 60_000)
+    assert bar == BarStore.Bar("BTCUSDC", T0, 100.0, 101.0, 100.0, 101.0, 3.0)
+    assert aggregator.current() is None
+
+    ticks_ = BarAggregator.BarAggregator("BTCUSDC", "5t")
+    ticks_.add(T0, 100.0, 1.0)
+    assert ticks_.flush(T0 + 3_600_000) is None  # only a plain flush() closes volume / tick bars
+    assert ticks_.flush().volume == 1.0
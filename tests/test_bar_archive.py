@@ -0,0 +1,34 @@
+import numpy as np
+import BarArchive
+
+MINUTE = 60_000
+T0 = 1_743_883_200_000  # 2025-04-05 20:00 UTC
+
+
+def bars(timestamps, closes):
+    closes = np.asarray(closes, dtype=np.float64)
+    return {"timestamp": np.asarray(timestamps, dtype=np.int64), "open": closes, "high": closes + 1,
+            "low": closes - 1, "close": closes, "volume": np.ones(len(closes))}
+
+
+def test_duplicates_within_a_batch_keep_the_last(tmp_path):
+    archive = BarArchive.BarArchive(str(tmp_path))
+    minutes = [0, 1, 2, 1, 0, 3]  # a re-primed segment: minutes 0 and 1 arrive again later
+    written = archive.write("BTCUSDC", bars([T0 + m * MINUTE for m in minutes], [10, 11, 12, 21, 20, 13]))
+
+    read = archive.read("BTCUSDC", T0, T0 + 3600_000)
+    assert written == 4
+    assert np.array_equal(read["timestamp"], T0 + np.arange(4) * MINUTE)
+    assert np.array_equal(read["close"], [20, 21, 12, 13])
+    assert archive.index("BTCUSDC")["days"]["2025-04-05"]["rows"] == 4
+
+
+def test_batch_overrides_the_stored_day(tmp_path):
+    archive = BarArchive.BarArchive(str(tmp_path))
+    archive.write("BTCUSDC", bars(T0 + np.arange(3) * MINUTE, [10, 11, 12]))
+    archive.write("BTCUSDC", bars([T0 + MINUTE, T0 + 3 * MINUTE, T0 + MINUTE], [31, 13, 41]))
+
+    read = BarArchive.BarArchive(str(tmp_path)).read("BTCUSDC")
+    assert np.array_equal(read["timestamp"], T0 + np.arange(4) * MINUTE)
+    assert np.array_equal(read["close"], [10, 41, 12, 13])
+    assert np.all(np.diff(read["timestamp"]) > 0)
@@ -0,0 +1,334 @@
+import asyncio, json, time
+from datetime import datetime, timezone
+import pytest
+import websockets
+import BarStore, BinanceUSWebsocketClient, feeds
+
+MINUTE = 60_000
+T0 = 1_700_000_040_000  # a minute boundary
+
+
+def kline(symbol, t, close=1.0, combined=False):
+    event = {"e": "kline", "E": t + 1, "s": symbol,
+             "k": {"s": symbol, "t": t, "o": "1.0", "h": "2.0", "l": "0.5", "c": str(close), "v": "3.0"}}
+    return json.dumps({"stream": f"{symbol.lower()}@kline_1m", "data": event} if combined else event)
+
+def trade(symbol, t, price, qty):
+    return json.dumps({"stream": f"{symbol.lower()}@trade",
+                       "data": {"e": "trade", "E": t, "s": symbol, "T": t, "p": str(price), "q": str(qty)}})
+
+def utc_ms(text):
+    return int(datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+async def run_feed(feed, handler, until, timeout=5.0):
+    """Serves `handler` on a local port, runs feed.start() until until() holds, then cancels it."""
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        feed.adapter.base_url = f"ws://127.0.0.1:{port}"
+        task = asyncio.get_running_loop().create_task(feed.start())
+        deadline = time.monotonic() + timeout
+        try:
+            while not until():
+                if task.done():
+                    task.result()
+                assert time.monotonic() < deadline, "feed timed out"
+                await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.parametrize("interval, closed", [
+    ("3t", [(100.0, 102.0, 3), (103.0, 105.0, 3)]),
+    ("2v", [(100.0, 101.0, 2), (102.0, 103.0, 2), (104.0, 105.0, 2)]),
+])
+def test_bar_builder_count_bars_never_emit_none(interval, closed):
+    bars = []
+    builder = feeds.BarBuilder(bars.append, interval)
+    for i in range(7):
+        builder(BarStore.Trade("BTCUSDC", T0 + i * 1000, 100.0 + i, 1.0))
+    assert None not in bars
+    assert len(bars) == 7  # one update per trade: the bar it closed, or the open bar
+    last = {}
+    for bar in bars:
+        last[bar.timestamp] = bar
+    assert [(bar.open, bar.close, bar.volume) for bar in last.values()][:-1] == closed
+    assert bars[-1] == BarStore.Bar("BTCUSDC", T0 + 6000, 106.0, 106.0, 106.0, 106.0, 1.0)
+
+
+def test_bar_builder_passes_bars_through():
+    bars = []
+    bar = BarStore.Bar("BTCUSDC", T0, 1.0, 2.0, 0.5, 1.5, 3.0)
+    feeds.BarBuilder(bars.append, "3t")(bar)
+    assert bars == [bar]
+
+
+def test_reconnect_backs_off_exponentially(monkeypatch):
+    monkeypatch.setattr(feeds.random, "uniform", lambda low, high: 1.0)  # no jitter
+    connected = []
+
+    async def handler(ws):
+        connected.append(time.monotonic())
+        await ws.close()
+
+    feed = feeds.Feed(feeds.BinanceAdapter(), ["BTCUSDC"], backoff_initial=0.05, backoff_max=0.15, backfill=False)
+    asyncio.run(run_feed(feed, handler, lambda: len(connected) >= 5))
+    gaps = [later - earlier for earlier, later in zip(connected, connected[1:])]
+    for gap, delay in zip(gaps, (0.05, 0.1, 0.15, 0.15)):  # doubles, capped at backoff_max
+        assert delay <= gap < delay + 0.1
+    assert feed.connections >= 4  # the last handshake may still be in flight
+
+
+def test_backoff_resets_after_a_healthy_connection(monkeypatch):
+    monkeypatch.setattr(feeds.random, "uniform", lambda low, high: 1.0)
+    connected = []
+
+    async def handler(ws):
+        connected.append(time.monotonic())
+        if len(connected) == 3:
+            await ws.send(kline("BTCUSDC", T0))
+        await ws.close()
+
+    feed = feeds.Feed(feeds.BinanceAdapter(), ["BTCUSDC"], backoff_initial=0.05, backoff_max=1.0, backfill=False)
+    asyncio.run(run_feed(feed, handler, lambda: len(connected) >= 4))
+    assert connected[3] - connected[2] < 0.1  # back to the initial delay, not 0.2
+
+
+class StubBackfillAdapter(feeds.BinanceAdapter):
+    def __init__(self, bars):
+        super().__init__()
+        self.bars = bars
+        self.calls = []
+
+    def backfill(self, symbol, since_ms):
+        self.calls.append((symbol, since_ms))
+        return [bar for bar in self.bars if bar.timestamp >= since_ms]
+
+
+def test_backfill_after_reconnect_covers_the_gap():
+    connections = []
+
+    async def handler(ws):
+        connections.append(ws.request.path)
+        if len(connections) == 1:
+            await ws.send(kline("BTCUSDC", T0, 1.0))
+            await ws.send(kline("BTCUSDC", T0 + MINUTE, 2.0))  # still open when the socket drops
+            await ws.close()
+            return
+        await ws.send(kline("BTCUSDC", T0 + 3 * MINUTE, 4.0))
+        await asyncio.sleep(1)
+
+    history = [BarStore.Bar("BTCUSDC", T0 + i * MINUTE, 1.0, 2.0, 0.5, 1.0 + i, 3.0) for i in range(3)]
+    adapter = StubBackfillAdapter(history)
+    feed = feeds.Feed(adapter, ["BTCUSDC"], backoff_initial=0.01)
+    received = []
+    feed.subscribe(received.append)
+    asyncio.run(run_feed(feed, handler, lambda: len(received) >= 5))
+
+    assert connections == ["/ws/btcusdc@kline_1m"] * 2
+    assert adapter.calls == [("BTCUSDC", T0 + MINUTE)]  # once, from the last bar seen
+    assert [(bar.timestamp - T0) // MINUTE for bar in received] == [0, 1, 1, 2, 3]
+    assert [bar.close for bar in received] == [1.0, 2.0, 2.0, 3.0, 4.0]
+    assert feed.last_bar["BTCUSDC"] == T0 + 3 * MINUTE
+
+
+class RecordingBot:
+    def __init__(self):
+        self.live, self.primed = [], []
+
+    def on_new_data(self, bar):
+        self.live.append(bar)
+
+    def data_prime(self, bars):
+        self.primed.append(list(bars))
+
+
+def reconnecting_handler():
+    connections = []
+
+    async def handler(ws):
+        connections.append(1)
+        if len(connections) == 1:
+            await ws.send(kline("BTCUSDC", T0, 1.0))
+            await ws.send(kline("BTCUSDC", T0 + MINUTE, 2.0))
+            await ws.close()
+            return
+        await ws.send(kline("BTCUSDC", T0 + 3 * MINUTE, 4.0))
+        await asyncio.sleep(1)
+    return handler
+
+
+def test_backfilled_bars_go_to_the_backfill_callback():
+    history = [BarStore.Bar("BTCUSDC", T0 + i * MINUTE, 1.0, 2.0, 0.5, 1.0 + i, 3.0) for i in range(3)]
+    feed = feeds.Feed(StubBackfillAdapter(history), ["BTCUSDC"], backoff_initial=0.01)
+    live, batches, others = [], [], []
+    feed.subscribe(live.append, ["BTCUSDC"], backfill=batches.append)
+    feed.subscribe(others.append, ["ETHUSDC"], backfill=others.append)
+    asyncio.run(run_feed(feed, reconnecting_handler(), lambda: len(live) >= 3))
+
+    assert [bar.close for bar in live] == [1.0, 2.0, 4.0]  # stale prices never reach the live callback
+    assert batches == [history[1:]] and others == []
+    assert feed.last_bar["BTCUSDC"] == T0 + 3 * MINUTE
+
+
+def test_client_primes_the_bot_with_backfilled_bars():
+    history = [BarStore.Bar("BTCUSDC", T0 + i * MINUTE, 1.0, 2.0, 0.5, 1.0 + i, 3.0) for i in range(3)]
+    bot = RecordingBot()
+    client = BinanceUSWebsocketClient.BinanceUSWebsocketClient(bot, symbol="BTCUSDC")
+    feed = client.subscribe(feeds.Feed(StubBackfillAdapter(history), client.symbols, backoff_initial=0.01))
+    asyncio.run(run_feed(feed, reconnecting_handler(), lambda: len(bot.live) >= 3))
+
+    assert [bar.close for bar in bot.live] == [1.0, 2.0, 4.0]
+    assert [[bar.close for bar in batch] for batch in bot.primed] == [[2.0, 3.0]]
+
+
+def test_capture_file_is_closed_when_the_feed_stops(tmp_path):
+    async def handler(ws):
+        await ws.send(kline("BTCUSDC", T0))
+        await asyncio.sleep(1)
+
+    path = tmp_path / "frames.jsonl"
+    feed = feeds.Feed(StubBackfillAdapter([]), ["BTCUSDC"], capture=str(path))
+    capture = feed.capture
+    received = []
+    feed.subscribe(received.append)
+    asyncio.run(run_feed(feed, handler, lambda: received))
+
+    assert capture.closed and feed.capture is None
+    assert json.loads(path.read_text().splitlines()[0])["k"]["t"] == T0
+
+
+def test_no_backfill_when_disabled():
+    connections = []
+
+    async def handler(ws):
+        connections.append(1)
+        await ws.send(kline("BTCUSDC", T0))
+        await ws.close()
+
+    adapter = StubBackfillAdapter([])
+    feed = feeds.Feed(adapter, ["BTCUSDC"], backoff_initial=0.01, backfill=False)
+    asyncio.run(run_feed(feed, handler, lambda: len(connections) >= 3))
+    assert adapter.calls == []
+
+
+def test_hub_fans_one_socket_out_to_subscribers():
+    paths = []
+
+    async def handler(ws):
+        paths.append(ws.request.path)
+        await ws.send(kline("BTCUSDC", T0, 1.0, combined=True))
+        await ws.send(kline("ETHUSDC", T0, 2.0, combined=True))
+        await ws.send(trade("BTCUSDC", T0 + 5, 1.5, 0.25))
+        await asyncio.sleep(1)
+
+    hub = feeds.FeedHub(backoff_initial=0.01)
+    everything, btc, trades = [], [], []
+
+    def broken(record):
+        raise RuntimeError("subscriber bug")
+
+    streams = ("kline_1m", "trade")
+    hub.subscribe(feeds.BinanceAdapter(streams), ["BTCUSDC", "ETHUSDC"], everything.append)
+    hub.subscribe(feeds.BinanceAdapter(streams), ["BTCUSDC"], broken)
+    feed = hub.feed(feeds.BinanceAdapter(streams))
+    feed.subscribe(btc.append, ["BTC/USDC"])  # filters match with or without the slash
+    feed.subscribe(trades.append, kinds=(BarStore.Trade,))
+    eth = feed.queue(["ETHUSDC"])
+    assert len(hub.feeds) == 1
+
+    asyncio.run(run_feed(feed, handler, lambda: len(everything) >= 3))
+    assert paths == ["/stream?streams=btcusdc@kline_1m/btcusdc@trade/ethusdc@kline_1m/ethusdc@trade"]
+    assert [type(record).__name__ for record in everything] == ["Bar", "Bar", "Trade"]
+    assert [record.symbol for record in btc] == ["BTCUSDC", "BTCUSDC"]
+    assert trades == [BarStore.Trade("BTCUSDC", T0 + 5, 1.5, 0.25)]
+    assert eth.qsize() == 1 and eth.get_nowait().close == 2.0
+
+
+def test_symbols_are_split_over_connections():
+    adapter = feeds.BinanceAdapter()
+    adapter.max_symbols_per_connection = 2
+    urls = adapter.urls(["A", "B", "C"])
+    assert urls == [adapter.base_url + "/stream?streams=a@kline_1m/b@kline_1m", adapter.base_url + "/stream?streams=c@kline_1m"]
+
+
+@pytest.mark.parametrize("typed", [True, False])
+def test_binance_records(typed):
+    frames = [
+        kline("BTCUSDC", T0, 1.5),
+        kline("BTCUSDC", T0, 1.75, combined=True),
+        trade("BTCUSDC", T0 + 7, 64000.5, 0.002),
+        json.dumps({"u": 400900217, "s": "BTCUSDC", "b": "63999.5", "B": "1.25", "a": "64000.5", "A": "0.5"}),
+        json.dumps({"result": None, "id": 1}),
+    ]
+
+    async def handler(ws):
+        for frame in frames:
+            await ws.send(frame)
+        await asyncio.sleep(1)
+
+    adapter = feeds.BinanceAdapter(("kline_1m", "trade", "bookTicker"))
+    adapter.typed = typed and adapter.typed
+    feed = feeds.Feed(adapter, ["BTCUSDC"])
+    records = []
+    feed.subscribe(records.append)
+    asyncio.run(run_feed(feed, handler, lambda: len(records) >= 4))
+
+    assert records[:3] == [BarStore.Bar("BTCUSDC", T0, 1.0, 2.0, 0.5, 1.5, 3.0),
+                           BarStore.Bar("BTCUSDC", T0, 1.0, 2.0, 0.5, 1.75, 3.0),
+                           BarStore.Trade("BTCUSDC", T0 + 7, 64000.5, 0.002)]
+    book = records[3]
+    assert type(book) is BarStore.Book
+    assert (book.symbol, book.bid, book.bid_qty, book.ask, book.ask_qty) == ("BTCUSDC", 63999.5, 1.25, 64000.5, 0.5)
+    assert all(type(value) is float for value in records[0][2:] + records[2][2:])
+
+
+@pytest.mark.parametrize("typed", [True, False])
+def test_alpaca_records(typed):
+    received = []
+
+    async def handler(ws):
+        received.append(ws.request.path)
+        received.append(json.loads(await ws.recv()))
+        await ws.send(json.dumps([{"T": "success", "msg": "authenticated"}]))
+        received.append(json.loads(await ws.recv()))
+        await ws.send(json.dumps([{"T": "subscription", "trades": ["BTC/USD"], "bars": ["BTC/USD"]}]))
+        await ws.send(json.dumps([
+            {"T": "t", "S": "BTC/USD", "p": 64000.5, "s": 0.01, "t": "2024-03-01T14:30:05.123456789Z", "i": 1},
+            {"T": "b", "S": "BTC/USD", "o": 1, "h": 2, "l": 0.5, "c": 1.5, "v": 3, "t": "2024-03-01T14:30:00Z"},
+        ]))
+        await asyncio.sleep(1)
+
+    adapter = feeds.AlpacaAdapter("key", "secret", "crypto", channels=("trades", "bars"))
+    adapter.typed = typed and adapter.typed
+    feed = feeds.Feed(adapter, ["BTC/USD"])
+    records = []
+    feed.subscribe(records.append, ["BTC/USD"])
+    asyncio.run(run_feed(feed, handler, lambda: len(records) >= 2))
+
+    assert received == ["/v1beta3/crypto/us", {"action": "auth", "key": "key", "secret": "secret"},
+                        {"action": "subscribe", "trades": ["BTC/USD"], "bars": ["BTC/USD"]}]
+    assert records == [BarStore.Trade("BTCUSD", utc_ms("2024-03-01T14:30:05.123"), 64000.5, 0.01),
+                       BarStore.Bar("BTCUSD", utc_ms("2024-03-01T14:30:00"), 1.0, 2.0, 0.5, 1.5, 3.0)]
+    assert adapter.names == {"BTCUSD": "BTC/USD"}
+
+
+def test_kraken_records():
+    received = []
+
+    async def handler(ws):
+        received.append(json.loads(await ws.recv()))
+        await ws.send(json.dumps({"event": "systemStatus", "status": "online"}))
+        await ws.send(json.dumps([0, {"a": ["64000.5", 0, "0.1"]}, "ticker", "XBT/USD"]))
+        await ws.send(json.dumps([337, [["64000.50000", "0.01000000", "1709303405.123456", "b", "m", ""],
+                                        ["64001.00000", "0.50000000", "1709303406.5", "s", "l", ""]], "trade", "XBT/USD"]))
+        await asyncio.sleep(1)
+
+    feed = feeds.Feed(feeds.KrakenAdapter(), ["XBT/USD"])
+    records = []
+    feed.subscribe(records.append)
+    asyncio.run(run_feed(feed, handler, lambda: len(records) >= 2))
+
+    assert received == [{"event": "subscribe", "pair": ["XBT/USD"], "subscription": {"name": "trade"}}]
+    assert records == [BarStore.Trade("XBTUSD", 1709303405123, 64000.5, 0.01),
+                       BarStore.Trade("XBTUSD", 1709303406500, 64001.0, 0.5)]
@@ -0,0 +1,171 @@
+import json, threading, time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
+import pytest
+import HistoricalData, RequestScheduler
+
+MINUTE = 60_000
+DAY = HistoricalData.DAY_MS
+DAY0 = int(datetime(2024, 3, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class Exchange(BaseHTTPRequestHandler):
+    """Binance /api/v3/klines and Alpaca /v2/stocks/bars over a synthetic minute series (close = minute index)."""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        server = self.server
+        with server.lock:
+            server.requests.append((url.path, params, time.monotonic()))
+            throttled = server.throttle > 0
+            server.throttle -= throttled
+        if throttled:
+            self.reply(429, {"code": -1003, "msg": "Too many requests"}, {"Retry-After": "0.2"})
+        elif url.path == "/api/v3/klines":
+            start, end, limit = int(params["startTime"]), int(params["endTime"]), int(params["limit"])
+            first = -(-start // MINUTE) * MINUTE
+            rows = [[t, str(t / MINUTE), str(t / MINUTE + 1), str(t / MINUTE - 1), str(t / MINUTE), "2.5", t + MINUTE - 1]
+                    for t in range(first, end + 1, MINUTE)][:limit]
+            self.reply(200, rows, {"X-MBX-USED-WEIGHT-1M": "0"})
+        elif url.path == "/v2/stocks/bars":
+            offset = int(params.get("page_token", 0))
+            start = int(datetime.fromisoformat(params["start"].rstrip("Z")).replace(tzinfo=timezone.utc).timestamp() * 1000)
+            end = int(datetime.fromisoformat(params["end"].rstrip("Z")).replace(tzinfo=timezone.utc).timestamp() * 1000)
+            times = list(range(start, end, MINUTE))
+            page = times[offset:offset + server.alpaca_page]
+            bars = [{"t": datetime.fromtimestamp(t / 1000, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                     "o": 1.0, "h": 2.0, "l": 0.5, "c": t / MINUTE, "v": 100} for t in page]
+            token = str(offset + len(page)) if offset + len(page) < len(times) else None
+            self.reply(200, {"bars": {params["symbols"]: bars}, "next_page_token": token})
+        else:
+            self.reply(404, {"msg": "not found"})
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def exchange():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Exchange)
+    server.requests, server.lock, server.throttle, server.alpaca_page = [], threading.Lock(), 0, 1000
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(exchange, tmp_path, source="binance", limits=None, **options):
+    data = HistoricalData.HistoricalData(source, cache_dir=str(tmp_path / "cache"), base_url=exchange.url, **options)
+    data.scheduler = RequestScheduler.RequestScheduler(limits)  # not the process-wide bucket
+    return data
+
+
+def test_pages_through_a_range(exchange, tmp_path):
+    data = client(exchange, tmp_path)
+    bars = data.load("BTCUSDC", DAY0, DAY0 + 2 * DAY)
+
+    assert len(bars["timestamp"]) == 2880
+    assert np.array_equal(bars["timestamp"], np.arange(DAY0, DAY0 + 2 * DAY, MINUTE))
+    assert np.array_equal(bars["close"], bars["timestamp"] / MINUTE)
+    assert data.requests_made == 3  # 1000 + 1000 + 880
+    assert [int(params["startTime"]) for _, params, _ in exchange.requests] == [DAY0, DAY0 + 1000 * MINUTE, DAY0 + 2000 * MINUTE]
+    assert {params["limit"] for _, params, _ in exchange.requests} == {"1000"}
+
+
+def test_second_call_downloads_only_missing_days(exchange, tmp_path):
+    data = client(exchange, tmp_path)
+    data.load("BTCUSDC", DAY0 + DAY, DAY0 + 3 * DAY)
+    exchange.requests.clear()
+
+    bars = data.load("BTCUSDC", DAY0, DAY0 + 4 * DAY)
+    assert np.array_equal(bars["timestamp"], np.arange(DAY0, DAY0 + 4 * DAY, MINUTE))
+    ranges = sorted({(int(params["startTime"]) - DAY0) // DAY for _, params, _ in exchange.requests})
+    assert ranges == [0, 3]  # days 1 and 2 came from the cache
+    assert all(int(params["endTime"]) - int(params["startTime"]) < DAY for _, params, _ in exchange.requests)
+
+    exchange.requests.clear()
+    again = data.load("BTCUSDC", DAY0 + 30 * MINUTE, DAY0 + 4 * DAY - 30 * MINUTE)
+    assert exchange.requests == []  # fully cached
+    assert again["timestamp"][0] == DAY0 + 30 * MINUTE and len(again["timestamp"]) == 4 * 1440 - 60
+
+
+def test_unsettled_days_are_not_cached(exchange, tmp_path):
+    data = client(exchange, tmp_path, settle_ms=10 * 365 * DAY)
+    data.load("BTCUSDC", DAY0, DAY0 + DAY)
+    data.load("BTCUSDC", DAY0, DAY0 + DAY)
+    assert data.requests_made == 4
+
+
+def test_requests_wait_for_the_shared_bucket(exchange, tmp_path):
+    # 10 weight / s; a page weighs 2 and the backfill lane keeps 3 back: 3 pages at once, then one per 0.2 s
+    data = client(exchange, tmp_path, limits={"binance": (10, 1)})
+    started = time.monotonic()
+    data.load("BTCUSDC", DAY0, DAY0 + 8 * 1000 * MINUTE)
+    assert data.requests_made == 8
+    assert time.monotonic() - started >= 0.7
+    times = [at for _, _, at in exchange.requests]
+    assert times[2] - times[0] < 0.2  # a burst; paced, the third page would wait 0.4 s
+    assert times[-1] - times[2] >= 0.7  # five more pages at one per 0.2 s, less what refilled during the burst
+
+
+def test_rate_option_caps_requests_per_second(exchange, tmp_path):
+    data = client(exchange, tmp_path, rate=20)
+    started = time.monotonic()
+    data.load_many(["BTCUSDC", "ETHUSDC"], DAY0, DAY0 + 15 * DAY)  # 2 x 21600 bars = 44 pages, 20 of them the initial burst
+    assert data.requests_made == 44
+    assert time.monotonic() - started >= (44 - 20) / 20 * 0.9
+
+
+def test_429_pauses_and_retries(exchange, tmp_path):
+    exchange.throttle = 1
+    data = client(exchange, tmp_path, limits={"binance": (100, 1)})  # after the pause the backfill lane waits for its reserve
+    bars = data.load("BTCUSDC", DAY0, DAY0 + DAY)
+    assert len(bars["timestamp"]) == 1440
+    first, retry = exchange.requests[0][2], exchange.requests[1][2]
+    assert retry - first >= 0.15  # Retry-After: 0.2 paused the group
+
+
+def test_alpaca_follows_page_tokens(exchange, tmp_path):
+    exchange.alpaca_page = 500
+    data = client(exchange, tmp_path, source="alpaca", key="key", secret="secret")
+    bars = data.load("AAPL", DAY0, DAY0 + DAY)
+    assert np.array_equal(bars["timestamp"], np.arange(DAY0, DAY0 + DAY, MINUTE))
+    assert [params.get("page_token") for _, params, _ in exchange.requests] == [None, "500", "1000"]
+
+
+def test_fetch_pages_one_range_without_the_cache(exchange, tmp_path):
+    data = client(exchange, tmp_path)
+    bars = data.fetch("BTCUSDC", DAY0 + 10 * MINUTE, DAY0 + 1500 * MINUTE)
+    assert np.array_equal(bars["timestamp"], np.arange(DAY0 + 10 * MINUTE, DAY0 + 1500 * MINUTE, MINUTE))
+    assert [int(params["startTime"]) for _, params, _ in exchange.requests] == [DAY0 + 10 * MINUTE, DAY0 + 1010 * MINUTE]
+    assert not (tmp_path / "cache").exists()  # nothing written, even for the settled day
+
+
+def test_live_backfill_fetches_only_the_gap(exchange, tmp_path, monkeypatch):
+    import feeds
+    monkeypatch.chdir(tmp_path)
+    now_ms = DAY0 + 2 * DAY + 30 * MINUTE
+    monkeypatch.setattr(HistoricalData.time, "time", lambda: now_ms / 1000)
+    adapter = feeds.BinanceAdapter(rest_url=exchange.url)
+    adapter_scheduler = RequestScheduler.RequestScheduler()
+    monkeypatch.setattr(RequestScheduler, "shared", lambda: adapter_scheduler)
+
+    bars = adapter.backfill("BTCUSDC", now_ms - 5 * MINUTE)
+    assert [bar.timestamp for bar in bars] == [now_ms - i * MINUTE for i in range(5, 0, -1)]
+    assert len(exchange.requests) == 1
+    assert not (tmp_path / "hist_cache").exists()
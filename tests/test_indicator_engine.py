@@ -0,0 +1,129 @@
+import random
+import numpy as np
+import pytest
+import indicators, IndicatorEngine
+
+WINDOW = 60
+
+
+def batch(closes):
+    prices = np.array(closes)
+    return {
+        "mean": np.mean(prices),
+        "std": np.std(prices, ddof=1) if prices.size > 1 else np.nan,
+        "rsi": indicators.rsi(prices, 14),
+        "di_plus": indicators.di_plus(prices),
+        "di_minus": indicators.di_minus(prices),
+        "macd": indicators.macd(prices, 14),
+    }
+
+def streamed(engine):
+    return {name: getattr(engine, name)() for name in ("mean", "std", "rsi", "di_plus", "di_minus", "macd")}
+
+def assert_matches(engine, closes):
+    expected, actual = batch(closes), streamed(engine)
+    for name, value in expected.items():
+        if value is None:
+            assert actual[name] is None, name
+        elif np.isnan(value):
+            assert np.isnan(actual[name]), name
+        else:
+            assert actual[name] == pytest.approx(value, rel=1e-9, abs=1e-9), name
+
+
+@pytest.mark.parametrize("resync_every", [1000, 7])
+def test_matches_batch_functions_through_append_replace_and_evict(resync_every):
+    rng = random.Random(3)
+    engine = IndicatorEngine.IndicatorEngine(resync_every=resync_every)
+    closes = []
+    price = 100.0
+    for _ in range(400):
+        price *= 1 + rng.gauss(0, 0.003)
+        closes.append(price)
+        engine.append(price)
+        if len(closes) > WINDOW:
+            assert engine.popleft() == closes.pop(0)
+        assert_matches(engine, closes)
+        for _ in range(rng.randrange(3)):  # kline updates within the same minute
+            price *= 1 + rng.gauss(0, 0.001)
+            closes[-1] = price
+            engine.replace_last(price)
+            assert_matches(engine, closes)
+
+
+def test_macd_is_none_until_the_signal_line_exists():
+    engine = IndicatorEngine.IndicatorEngine()
+    for i in range(40):
+        engine.append(100.0 + (i % 5))
+        assert (engine.macd() is None) == (indicators.macd(np.array(list(engine.closes)), 14) is None)
+    assert engine.macd() is not None
+
+
+def test_flat_and_repeated_prices():
+    engine = IndicatorEngine.IndicatorEngine()
+    closes = [50.0] * 20 + [51.0, 51.0, 50.5] * 15
+    for close in closes:
+        engine.append(close)
+    assert_matches(engine, closes)
+
+
+def test_restore_rebuilds_every_indicator():
+    rng = random.Random(5)
+    engine = IndicatorEngine.IndicatorEngine()
+    closes = [100 + rng.uniform(-1, 1) for _ in range(WINDOW)]
+    for close in closes:
+        engine.append(close)
+    restored = IndicatorEngine.IndicatorEngine()
+    restored.restore(engine.snapshot())
+    assert_matches(restored, closes)
+    restored.replace_last(closes[-1] + 0.5)
+    assert_matches(restored, closes[:-1] + [closes[-1] + 0.5])
+
+
+def test_restore_accepts_snapshots_with_macd_ema_state():
+    engine = IndicatorEngine.IndicatorEngine()
+    closes = [100.0 + i % 7 for i in range(WINDOW)]
+    engine.restore({"closes": closes, "macd_state": [60, 1.0, 2.0, 3.0], "macd_prev": [59, 1.0, 2.0, 3.0]})
+    assert_matches(engine, closes)
+
+
+@pytest.mark.parametrize("n", [34, 35, 61, 256])
+def test_macd_kernel_matches_the_batch_histogram(n):
+    rng = random.Random(n)
+    closes = np.cumsum([100.0] + [rng.gauss(0, 1) for _ in range(n - 1)])
+    kernel = IndicatorEngine.IndicatorEngine()._macd_kernel(n)
+    assert len(kernel) == n
+    assert float(np.dot(kernel, closes)) == pytest.approx(indicators.macd(closes, 14), rel=1e-9, abs=1e-9)
+    assert sum(kernel) == pytest.approx(0.0, abs=1e-12)  # a constant window has no MACD
+
+
+def test_macd_components_follow_the_whole_stream():
+    rng = random.Random(11)
+    engine = IndicatorEngine.IndicatorEngine()
+    stream, price = [], 100.0
+    for i in range(300):
+        price *= 1 + rng.gauss(0, 0.003)
+        stream.append(price)
+        engine.append(price)
+        if len(engine) > WINDOW:
+            engine.popleft()  # evictions do not reset the EMAs
+        if rng.random() < 0.5:
+            price *= 1 + rng.gauss(0, 0.001)
+            stream[-1] = price
+            engine.replace_last(price)
+        line, signal, histogram = (series[-1] for series in indicators.macd_series(np.array(stream)))
+        fast, slow, *components = engine.macd_components()
+        for actual, expected in zip(components, (line, signal, histogram)):
+            if np.isnan(expected):
+                assert actual is None
+            else:
+                assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9)
+        if i >= 11:
+            assert fast == pytest.approx(indicators.ema(np.array(stream), 12)[-1], rel=1e-12)
+        else:
+            assert fast is None
+
+    restored = IndicatorEngine.IndicatorEngine()
+    restored.restore(engine.snapshot())
+    assert restored.macd_components() == engine.macd_components()
+    assert restored.macd() == pytest.approx(engine.macd(), rel=1e-12)
@@ -0,0 +1,81 @@
+import asyncio, threading, time
+import pytest
+import yaml
+
+pytest.importorskip("ccxt")
+import algo, BarStore, BinanceUSPrimer
+
+T0 = 1_700_000_040_000
+
+
+def config():
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+    config["trading_config"]["ml_model"] = None
+    return config
+
+
+@pytest.fixture
+def primer(monkeypatch):
+    """BinanceUSPrimer.fetch without the network: 60 bars per symbol, after a short blocking wait."""
+    calls = []
+
+    def fetch(self, start_time=None):
+        calls.append((self.symbol, start_time, threading.current_thread()))
+        time.sleep(0.05)
+        return [BarStore.Bar(self.symbol, T0 + i * 60_000, 1.0, 2.0, 0.5, 1.0 + i % 3, 3.0) for i in range(60)]
+
+    monkeypatch.setattr(BinanceUSPrimer.BinanceUSPrimer, "fetch", fetch)
+    return calls
+
+
+def test_bots_share_the_stream_and_quotes():
+    multi = algo.MultiSymbolBot(["BTC/USDC", "ETH/USDC"], config())
+    assert multi.data_stream.symbols == ["BTCUSDC", "ETHUSDC"]
+    for bot in multi.bots.values():
+        assert bot.data_stream is multi.data_stream
+        assert bot.quotes is multi.quotes
+        assert bot.trader is multi.trader
+
+
+def test_bot_with_an_injected_trader_builds_no_quotes_or_stream():
+    bot = algo.TradingBot("BTC/USDC", trader=object(), config=config())
+    assert bot.quotes is None and bot.data_stream is None
+
+
+def test_warm_start_primes_off_the_event_loop(primer, monkeypatch):
+    multi = algo.MultiSymbolBot(["BTC/USDC", "ETH/USDC"], config())
+    for bot in multi.bots.values():
+        monkeypatch.setattr(bot, "clock", lambda: T0 / 1000 + 3600)
+        bot.snapshot_path = None
+
+    async def run():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        beat = asyncio.get_running_loop().create_task(heartbeat())
+        await asyncio.gather(*(bot.warm_start() for bot in multi.bots.values()))
+        beat.cancel()
+        return ticks
+
+    ticks = asyncio.run(run())
+    assert sorted(symbol for symbol, _, _ in primer) == ["BTCUSDC", "ETHUSDC"]
+    assert all(thread is not threading.main_thread() for _, _, thread in primer)
+    assert ticks >= 5  # the loop kept running while the klines were fetched
+    for bot in multi.bots.values():
+        assert len(bot.bars) == 60 and bot.cache_price == bot.bars.bar().close
+
+
+def test_backfilled_bars_prime_their_symbol_without_signals(monkeypatch):
+    multi = algo.MultiSymbolBot(["BTC/USDC", "ETH/USDC"], config())
+    for bot in multi.bots.values():
+        monkeypatch.setattr(bot, "clock", lambda: T0 / 1000 + 3600)
+        monkeypatch.setattr(bot, "check_entry_conditions", lambda: pytest.fail("signal on a backfilled bar"))
+    multi.data_prime([BarStore.Bar("ETHUSDC", T0 + i * 60_000, 1.0, 2.0, 0.5, 1.0 + i, 3.0) for i in range(5)])
+    assert len(multi.bots["ETHUSDC"].bars) == 5 and not multi.bots["BTCUSDC"].bars
+    assert multi.bots["ETHUSDC"].cache_price == 5.0
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+import yaml
+
+pytest.importorskip("ccxt")
+import algo, BarStore, MarketMetadata, comms, orders
+
+T0 = 1_700_000_040_000
+
+
+class ScriptedTrader:
+    """Answers each sell with the next ack in the script."""
+
+    def __init__(self, *acks):
+        self.acks = list(acks)
+        self.sells = 0
+
+    async def place_sell_order(self, symbol):
+        self.sells += 1
+        return self.acks.pop(0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = T0 / 1000 + 120
+
+    def __call__(self):
+        return self.now
+
+
+def bot(trader, clock):
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+    config["trading_config"].update(ml_model=None, sell_retry=5, sell_attempts=3)
+    trading_bot = algo.TradingBot("BTC/USDC", trader=trader, config=config, clock=clock)
+    trading_bot.snapshot_path = None
+    trading_bot.save_trade_data = lambda *args: None
+    trading_bot.push_bar(BarStore.Bar("BTCUSDC", T0, 1.0, 2.0, 0.5, 1.0, 3.0))
+    trading_bot.active_position = True
+    trading_bot.buy_price = 100.0
+    trading_bot.cache_price = 50.0  # far below the stop loss, so every update wants to sell
+    return trading_bot
+
+
+def update(trading_bot):
+    """One market update while in a position; returns once any sell it started has been acked."""
+    async def run():
+        if trading_bot.active_position:  # on_new_data's routing
+            trading_bot.check_exit_conditions()
+        if trading_bot.order_task:
+            await trading_bot.order_task
+            trading_bot.order_task = None
+    asyncio.run(run())
+
+
+def failed():
+    return orders.ack("BTC/USDC", "sell", False, error="Error placing sell order: timeout")
+
+
+def test_flat_ack_closes_the_position():
+    trader = ScriptedTrader(orders.ack("BTC/USDC", "sell", False, error="No BTC/USDC position found.", flat=True))
+    trading_bot = bot(trader, Clock())
+    update(trading_bot)
+    update(trading_bot)
+    assert trader.sells == 1
+    assert not trading_bot.active_position and trading_bot.sell_failures == 0
+
+
+def test_failed_sells_back_off_then_stop(monkeypatch):
+    alerts = []
+    monkeypatch.setattr(comms, "send_message", alerts.append)
+    clock = Clock()
+    trader = ScriptedTrader(failed(), failed(), failed())
+    trading_bot = bot(trader, clock)
+
+    update(trading_bot)
+    assert trader.sells == 1 and trading_bot.active_position
+    clock.now += 4.9
+    update(trading_bot)
+    assert trader.sells == 1  # still inside the 5 s backoff
+    clock.now += 0.2
+    update(trading_bot)
+    assert trader.sells == 2
+    clock.now += 9.9
+    update(trading_bot)
+    assert trader.sells == 2  # the second wait is 10 s
+    clock.now += 0.2
+    update(trading_bot)
+    assert trader.sells == 3 and trading_bot.active_position
+    assert len(alerts) == 1 and "3 sells failed in a row" in alerts[0]
+
+    clock.now += 3600
+    update(trading_bot)
+    assert trader.sells == 3  # capped: no more attempts
+
+
+def test_success_resets_the_failure_count():
+    clock = Clock()
+    trader = ScriptedTrader(failed(), orders.ack("BTC/USDC", "sell", True, "1", 0.1, 50.0))
+    trading_bot = bot(trader, clock)
+    update(trading_bot)
+    clock.now += 5.1
+    update(trading_bot)
+    assert trader.sells == 2
+    assert not trading_bot.active_position and trading_bot.sell_failures == 0 and trading_bot.sell_retry_at == 0.0
+
+
+def test_dust_is_below_the_market_minimums():
+    market = MarketMetadata.Market("BTC/USDC", step="0.0001", min_qty="0.0001", tick="0.01", min_notional="10")
+    assert market.dust(0.00005, 50_000.0)  # rounds to 0
+    assert market.dust(0.0001, 50_000.0)  # 5 USDC < 10
+    assert not market.dust(0.0003, 50_000.0)
+    assert not market.dust(0.0003)  # no price: only the lot rules apply
+
+
+def test_trader_reports_a_dust_holding_as_flat(monkeypatch):
+    import AccountState, BinanceUSTrader, QuoteCache
+    monkeypatch.setattr(comms, "send_message", lambda message: None)
+    quotes = QuoteCache.QuoteCache()
+    quotes.update("BTCUSDC", 49_999.0, 50_000.0)
+    trader = BinanceUSTrader.BinanceUSTrader(quotes=quotes)
+    trader.markets.markets = {"BTCUSDC": MarketMetadata.Market("BTC/USDC", step="0.0001", min_notional="10", tick="0.01")}
+    trader.markets.loaded_at = 1e12
+    trader.account = AccountState.AccountState(None)
+    trader.account.ready = True
+
+    trader.account.balances = {"BTC": 0.00015}  # 0.0001 BTC = 5 USDC after rounding
+    ack = asyncio.run(trader.place_sell_order("BTC/USDC"))
+    assert not ack.ok and ack.flat
+
+    trader.account.balances = {}
+    ack = asyncio.run(trader.place_sell_order("BTC/USDC"))
+    assert not ack.ok and ack.flat
@@ -0,0 +1,94 @@
+import asyncio, threading, time
+import pytest
+import yaml
+
+pytest.importorskip("ccxt")
+import BarStore, BinanceUSPrimer, shards
+
+T0 = 1_700_000_040_000
+
+
+@pytest.fixture
+def runtime():
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+    config["trading_config"]["ml_model"] = None
+    runtime = shards.ShardedRuntime(["BTC/USDC", "ETH/USDC"], config, workers=1, db_path=None, capacity=8, live=False)
+    yield runtime
+    for ring in runtime.inboxes + runtime.outboxes:
+        ring.close()
+
+
+def test_ring_round_trip():
+    ring = shards.Ring(4)
+    try:
+        assert all(ring.put(shards.BAR, i, T0 + i, 1.0, 2.0, 0.5, 1.5, 3.0) for i in range(4))
+        assert not ring.put(shards.BAR, 4, T0)  # full
+        assert ring.take(2) == [(shards.BAR, 0, T0, 1.0, 2.0, 0.5, 1.5, 3.0), (shards.BAR, 1, T0 + 1, 1.0, 2.0, 0.5, 1.5, 3.0)]
+        assert ring.put(shards.BAR, 4, T0 + 4)  # wraps around
+        assert [record[1] for record in ring.take()] == [2, 3, 4]
+    finally:
+        ring.close()
+
+
+def test_full_ring_backlogs_without_blocking_the_loop(runtime):
+    async def run():
+        inbox = runtime.inboxes[0]
+        started = time.perf_counter()
+        for i in range(20):
+            runtime.on_new_data(BarStore.Bar("BTCUSDC", T0 + i, 1.0, 2.0, 0.5, float(i), 3.0))
+        assert time.perf_counter() - started < 0.1
+        assert runtime.stalls == 12 and len(runtime.backlogs[0]) == 12
+
+        received = []
+        while len(received) < 20:  # the worker side: free slots, let the drain task refill them
+            received.extend(inbox.take(5))
+            await asyncio.sleep(0.002)
+        return received
+
+    received = asyncio.run(run())
+    assert [record[6] for record in received] == [float(i) for i in range(20)]  # in order, none dropped
+    assert not runtime.backlogs[0]
+
+
+def test_new_records_queue_behind_the_backlog(runtime):
+    async def run():
+        inbox = runtime.inboxes[0]
+        for i in range(10):
+            runtime.push(0, shards.BAR, 0, T0 + i)
+        inbox.take(1)  # one free slot, but two records are already waiting
+        runtime.push(0, shards.STOP, 0, 0)
+        records = []
+        while len(records) < 10:
+            records.extend(inbox.take())
+            await asyncio.sleep(0.002)
+        return records
+
+    records = asyncio.run(run())
+    assert records[-1][0] == shards.STOP
+    assert [record[2] - T0 for record in records[:-1]] == list(range(1, 10))
+
+
+def test_prime_fetches_on_worker_threads(runtime, monkeypatch):
+    threads = []
+
+    def fetch(self, start_time=None):
+        threads.append(threading.current_thread())
+        return [BarStore.Bar(self.symbol, T0 + i * 60_000, 1.0, 2.0, 0.5, 1.5, 3.0) for i in range(3)]
+
+    monkeypatch.setattr(BinanceUSPrimer.BinanceUSPrimer, "fetch", fetch)
+
+    async def run():
+        prime = asyncio.get_running_loop().create_task(runtime.prime())
+        records = []
+        while not prime.done() or runtime.backlogs[0] or len(records) < 8:
+            records.extend(runtime.inboxes[0].take())
+            await asyncio.sleep(0.002)
+        await prime
+        return records
+
+    records = asyncio.run(run())
+    assert len(threads) == 2 and threading.main_thread() not in threads
+    for sid in runtime.ids.values():
+        kinds = [kind for kind, symbol, *_ in records if symbol == sid]
+        assert kinds == [shards.PRIME] * 3 + [shards.PRIMED]
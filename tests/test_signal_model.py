@@ -0,0 +1,84 @@
+import random, types
+import numpy as np
+import pytest
+import yaml
+from features import FEATURES
+import BarStore, SignalModel, features
+
+T0 = 1_700_000_040_000
+
+
+def model_file(tmp_path, threshold):
+    model = types.SimpleNamespace(coef_=[[0.5, -0.25]], intercept_=[0.1])
+    path = tmp_path / "model.json"
+    SignalModel.export_model(model, FEATURES[:2], str(path), threshold=threshold)
+    return str(path)
+
+
+def test_threshold_comes_from_the_model_file(tmp_path):
+    assert SignalModel.SignalModel(model_file(tmp_path, 0.62)).threshold == 0.62
+
+
+def test_config_threshold_overrides_the_model_file(tmp_path):
+    assert SignalModel.SignalModel(model_file(tmp_path, 0.62), 0.4).threshold == 0.4
+
+
+def test_default_config_keeps_the_model_threshold(tmp_path):
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+    threshold = config["trading_config"].get("ml_threshold")
+    assert SignalModel.SignalModel(model_file(tmp_path, 0.62), threshold).threshold == 0.62
+
+
+def random_bars(count, seed):
+    rng = random.Random(seed)
+    price, bars = 100.0, []
+    for i in range(count):
+        open_ = price
+        price *= 1 + rng.gauss(0, 0.004)
+        bars.append(BarStore.Bar("BTCUSDC", T0 + i * 60_000, open_, max(open_, price) * (1 + rng.random() * 0.002),
+                                 min(open_, price) * (1 - rng.random() * 0.002), price, rng.uniform(0.1, 5.0)))
+    return bars
+
+
+def batch_row(bars):
+    """The last row of the training features for the same bars."""
+    columns = features.feature_matrix({name: [getattr(bar, name) for bar in bars] for name in ("open", "high", "low", "close", "volume")})
+    return features.design_matrix(columns)[-1]
+
+
+def assert_tracker_matches(tracker, bars):
+    values = tracker.values()
+    live = np.array([values[name] for name in FEATURES])
+    np.testing.assert_allclose(live, batch_row(bars), rtol=1e-9, atol=1e-9)
+
+
+def test_tracker_matches_feature_matrix_through_append_and_replace_last():
+    rng = random.Random(7)
+    tracker = SignalModel.FeatureTracker()
+    stream = []
+    for bar in random_bars(120, seed=1):
+        stream.append(bar)
+        tracker.append(bar)
+        assert_tracker_matches(tracker, stream)
+        for _ in range(rng.randrange(3)):  # kline updates within the same minute
+            close = bar.close * (1 + rng.gauss(0, 0.001))
+            bar = bar._replace(close=close, high=max(bar.high, close), low=min(bar.low, close), volume=bar.volume + 0.5)
+            stream[-1] = bar
+            tracker.replace_last(bar)
+            assert_tracker_matches(tracker, stream)
+
+
+def test_tracker_is_unaffected_by_window_eviction(tmp_path):
+    import algo
+    pytest.importorskip("ccxt")
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+    config["trading_config"].update(ml_model=model_file(tmp_path, 0.5), ml_threshold=None)
+    bars = random_bars(150, seed=2)
+    bot = algo.TradingBot("BTC/USDC", trader=object(), config=config, clock=lambda: bars[-1].timestamp / 1000)
+    bot.snapshot_path = None
+    for bar in bars:
+        bot.push_bar(bar)
+    assert len(bot.bars) < len(bars)  # the oldest bars were evicted from the window
+    assert_tracker_matches(bot.signal_model.tracker, bars)  # the features still cover the whole stream, like training
@@ -0,0 +1,77 @@
+import asyncio, json, threading
+import pytest
+import yaml
+
+pytest.importorskip("ccxt")
+import algo, BarStore
+
+T0 = 1_700_000_040_000
+
+
+class NoTrader:
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def bot(tmp_path):
+    with open("infra/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+    config["trading_config"]["ml_model"] = None
+    trading_bot = algo.TradingBot("BTC/USDC", trader=NoTrader(), config=config, clock=lambda: T0 / 1000 + 120)
+    trading_bot.snapshot_path = str(tmp_path / "bot_state_BTCUSDC.json")
+    for i in range(3):
+        trading_bot.push_bar(BarStore.Bar("BTCUSDC", T0 + i * 60_000, 1.0, 2.0, 0.5, 1.0 + i, 3.0))
+    return trading_bot
+
+
+def test_snapshot_is_written_off_the_calling_thread(tmp_path, monkeypatch):
+    trading_bot = bot(tmp_path)
+    threads = []
+    dump = json.dump
+    monkeypatch.setattr(algo.json, "dump", lambda *args, **kwargs: (threads.append(threading.current_thread()), dump(*args, **kwargs)))
+    trading_bot.save_snapshot().result(timeout=5)
+    assert threads and threads[0] is not threading.current_thread()
+
+    restored = bot(tmp_path)
+    restored.bars.clear()
+    assert restored.load_snapshot()
+    assert [restored.bars.bar(i).close for i in range(len(restored.bars))] == [1.0, 2.0, 3.0]
+
+
+def test_queued_snapshots_coalesce_to_the_latest(tmp_path, monkeypatch):
+    trading_bot = bot(tmp_path)
+    writes = []
+    replace = algo.os.replace
+    monkeypatch.setattr(algo.os, "replace", lambda src, dst: (writes.append(dst), replace(src, dst)))
+
+    gate = threading.Event()
+    algo.snapshot_writer.submit(gate.wait, 5)  # hold the writer thread while snapshots queue up
+    futures = []
+    for buy_price in (1.0, 2.0, 3.0):
+        trading_bot.buy_price = buy_price
+        futures.append(trading_bot.save_snapshot())
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert len(writes) == 1
+    with open(trading_bot.snapshot_path) as file:
+        assert json.load(file)["buy_price"] == 3.0
+
+
+def test_flush_snapshot_waits_for_the_file(tmp_path):
+    trading_bot = bot(tmp_path)
+    trading_bot.active_position = True
+    asyncio.run(trading_bot.flush_snapshot())
+    with open(trading_bot.snapshot_path) as file:
+        assert json.load(file)["active_position"] is True
+
+
+def test_nothing_to_save_without_bars_or_path(tmp_path):
+    trading_bot = bot(tmp_path)
+    trading_bot.snapshot_path = None
+    assert trading_bot.save_snapshot() is None
+    asyncio.run(trading_bot.flush_snapshot())
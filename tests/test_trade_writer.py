@@ -0,0 +1,100 @@
+import asyncio, json, sqlite3
+import TradeWriter
+
+
+def row(i):
+    return (f"2024-03-01 14:{i:02d}:00", "BTC/USDC", 0, 0, False, -1, 64000.0 + i, 1.5, 64000.0, 12.5,
+            63975.0, 64025.0, 51.0, 48.0, 52.0, None)
+
+def saved(path):
+    with sqlite3.connect(path) as conn:
+        return [r[0] for r in conn.execute("SELECT price FROM trades ORDER BY id")]
+
+def fail_inserts(writer, times):
+    """Makes the next `times` inserts raise, as a locked or full database would."""
+    insert = writer._insert
+    failures = [times]
+
+    def flaky(rows):
+        if failures[0]:
+            failures[0] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        insert(rows)
+
+    writer._insert = flaky
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    async def run():
+        writer = TradeWriter.TradeWriter(str(tmp_path / "trades.db"), batch_size=3)
+        await writer.start()
+        for i in range(7):
+            writer.write(row(i))
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.rows_written == 7
+    assert saved(tmp_path / "trades.db") == [64000.0 + i for i in range(7)]
+
+
+def test_failed_batch_is_retried_on_the_next_flush(tmp_path):
+    async def run():
+        # batch_size above the row count: only the explicit flushes below write
+        writer = TradeWriter.TradeWriter(str(tmp_path / "trades.db"), batch_size=10, flush_interval=60)
+        await writer.start()
+        fail_inserts(writer, 2)
+        for i in range(3):
+            writer.write(row(i))
+        await writer.flush()
+        assert writer.retry == [row(0), row(1), row(2)] and writer.failures == 1
+        writer.write(row(3))
+        writer.write(row(4))
+        await writer.flush()
+        assert writer.rows_written == 0 and writer.queue.qsize() == 2
+        await writer.flush()
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.rows_written == 5 and writer.rows_spilled == 0
+    assert saved(tmp_path / "trades.db") == [64000.0 + i for i in range(5)]  # order kept
+    assert not (tmp_path / "trades.db.unsaved.jsonl").exists()
+
+
+def test_batch_goes_to_the_fallback_file_after_max_retries(tmp_path):
+    async def run():
+        writer = TradeWriter.TradeWriter(str(tmp_path / "trades.db"), batch_size=10, flush_interval=60, max_retries=2)
+        await writer.start()
+        fail_inserts(writer, 3)
+        for i in range(2):
+            writer.write(row(i))
+        for _ in range(3):
+            await writer.flush()
+        assert writer.retry == [] and writer.rows_spilled == 2
+        writer.write(row(2))
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert saved(tmp_path / "trades.db") == [64002.0]
+    lines = (tmp_path / "trades.db.unsaved.jsonl").read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [list(row(0)), list(row(1))]
+
+
+def test_close_spills_what_the_database_will_not_take(tmp_path):
+    fallback = tmp_path / "unsaved.jsonl"
+
+    async def run():
+        writer = TradeWriter.TradeWriter(str(tmp_path / "trades.db"), batch_size=2, flush_interval=60,
+                                         fallback_path=str(fallback))
+        await writer.start()
+        fail_inserts(writer, 100)
+        for i in range(5):
+            writer.write(row(i), urgent=i == 4)
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.rows_written == 0 and writer.rows_spilled == 5 and writer.dropped == 0
+    assert [json.loads(line)[6] for line in fallback.read_text().splitlines()] == [64000.0 + i for i in range(5)]